@@ -0,0 +1,284 @@
+"""
+Plutus - Audit Trail Integrity
+Verifies the audit hash chain and seals it into signed checkpoints: every
+AUDIT_CHECKPOINT_BLOCK entries form a block whose Merkle root (audit_merkle.py)
+is stored with an HMAC signature. Incremental verification trusts signed
+checkpoints and only replays entries after the last one; full verification
+re-checks every block, in parallel across processes. Also verifies inclusion
+proofs for single entries.
+"""
+
+import hashlib
+import hmac
+import multiprocessing
+import os
+import secrets
+import sqlite3
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from audit_merkle import leaf_hash, merkle_root, verify_inclusion
+from audit_store import COLUMNS, GENESIS_HASH, generate_audit_hash, hashed_fields, row_to_entry
+
+AUDIT_CHECKPOINT_BLOCK = int(os.environ.get("AUDIT_CHECKPOINT_BLOCK", "1024"))
+AUDIT_VERIFY_WORKERS = int(os.environ.get("AUDIT_VERIFY_WORKERS", str(os.cpu_count() or 1)))
+AUDIT_CHECKPOINT_KEY = os.environ.get("AUDIT_CHECKPOINT_KEY", "")
+
+
+# ---------------------- BLOCK VERIFICATION ------------------------ #
+def verify_block(rows: List[tuple], prev_seq: int, prev_hash: str) -> Dict[str, Any]:
+    """
+    Replay the chain over one block of rows (COLUMNS order), starting from the
+    entry before it. Runs in worker processes, so it only takes plain data.
+    """
+    leaves = []
+    for row in rows:
+        entry = row_to_entry(row)
+        broken = None
+        if entry["seq"] != prev_seq + 1:
+            broken = f"entries {prev_seq + 1}..{entry['seq'] - 1} are missing"
+        elif entry["prev_hash"] != prev_hash:
+            broken = "prev_hash does not match the previous entry's audit_hash"
+        elif generate_audit_hash(hashed_fields(entry), prev_hash) != entry["audit_hash"]:
+            broken = "audit_hash does not match the entry contents"
+        if broken:
+            return {"broken": {"seq": entry["seq"], "id": entry["id"], "reason": broken}}
+        leaves.append(leaf_hash(entry["audit_hash"]))
+        prev_seq, prev_hash = entry["seq"], entry["audit_hash"]
+    return {"broken": None, "root": merkle_root(leaves).hex(), "last_seq": prev_seq, "last_hash": prev_hash}
+
+
+class AuditVerifier:
+    """Checkpointing verifier for an AuditStore database."""
+
+    def __init__(self, db_path: str, block_size: int = AUDIT_CHECKPOINT_BLOCK,
+                 workers: int = AUDIT_VERIFY_WORKERS, key: str = AUDIT_CHECKPOINT_KEY):
+        self.db_path = db_path
+        self.block_size = block_size
+        self.workers = max(1, workers)
+        self._executor: Optional[Executor] = None
+        conn = self._connect()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS audit_checkpoints (
+                block INTEGER PRIMARY KEY,
+                first_seq INTEGER NOT NULL,
+                last_seq INTEGER NOT NULL,
+                last_hash TEXT NOT NULL,
+                merkle_root TEXT NOT NULL,
+                signature TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS audit_settings (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+        """)
+        self._key = (key or self._local_key(conn)).encode()
+        conn.commit()
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _connect_readonly(self) -> sqlite3.Connection:
+        """
+        Reader for a verification run. In WAL mode its snapshot never blocks the
+        audit writer, however long the run takes.
+        """
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        return sqlite3.connect(uri, uri=True, timeout=30, isolation_level=None)
+
+    @staticmethod
+    def _local_key(conn: sqlite3.Connection) -> str:
+        """Fallback signing key kept in the database itself (set AUDIT_CHECKPOINT_KEY in production)."""
+        row = conn.execute("SELECT value FROM audit_settings WHERE name = 'checkpoint_key'").fetchone()
+        if row:
+            return row[0]
+        print("AUDIT_CHECKPOINT_KEY is not set; signing audit checkpoints with a key stored in the database")
+        key = secrets.token_hex(32)
+        conn.execute("INSERT OR IGNORE INTO audit_settings (name, value) VALUES ('checkpoint_key', ?)", (key,))
+        return conn.execute("SELECT value FROM audit_settings WHERE name = 'checkpoint_key'").fetchone()[0]
+
+    def sign(self, block: int, first_seq: int, last_seq: int, last_hash: str, root: str) -> str:
+        return self._mac(f"{block}|{first_seq}|{last_seq}|{last_hash}|{root}")
+
+    def sign_root(self, tree_size: int, root: str) -> str:
+        """Signature over a whole-log Merkle root, returned with inclusion proofs."""
+        return self._mac(f"tree|{tree_size}|{root}")
+
+    def _mac(self, message: str) -> str:
+        return hmac.new(self._key, message.encode(), hashlib.sha256).hexdigest()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    # ---------------------- VERIFICATION ------------------------ #
+    def verify(self, full: bool = False) -> Dict[str, Any]:
+        """
+        Verify the chain and seal newly verified complete blocks into checkpoints.
+        Incremental mode checks checkpoint signatures and the boundary entry, then
+        replays only entries after the last checkpoint. Everything is read from
+        one snapshot; each new checkpoint is committed on its own, so the write
+        lock is only held for a single INSERT at a time.
+        """
+        started = time.perf_counter()
+        conn = self._connect_readonly()
+        writer: Optional[sqlite3.Connection] = None
+        try:
+            conn.execute("BEGIN")
+            total, max_seq = conn.execute("SELECT COUNT(*), COALESCE(MAX(seq), 0) FROM audit_entries").fetchone()
+            checkpoints = conn.execute(
+                "SELECT block, first_seq, last_seq, last_hash, merkle_root, signature "
+                "FROM audit_checkpoints ORDER BY block"
+            ).fetchall()
+
+            broken = self._check_checkpoints(conn, checkpoints)
+            start_block, prev_seq, prev_hash = 0, 0, GENESIS_HASH
+            if not full and checkpoints and broken is None:
+                last = checkpoints[-1]
+                start_block, prev_seq, prev_hash = last[0] + 1, last[2], last[3]
+
+            sealed = {cp[0]: cp[4] for cp in checkpoints}
+            checked, created = 0, 0
+            if broken is None:
+                for block, rows, result in self._verify_blocks(conn, start_block, prev_seq, prev_hash, max_seq):
+                    if result["broken"]:
+                        broken = result["broken"]
+                        break
+                    checked += len(rows)
+                    complete = len(rows) == self.block_size
+                    if block in sealed and sealed[block] != result["root"]:
+                        broken = {"seq": rows[0][0], "id": rows[0][1],
+                                  "reason": f"block {block} no longer matches its signed checkpoint"}
+                        break
+                    if complete and block not in sealed:
+                        if writer is None:
+                            writer = self._connect()
+                        self._seal(writer, block, rows[0][0], result)
+                        created += 1
+            conn.execute("ROLLBACK")
+        finally:
+            conn.close()
+            if writer is not None:
+                writer.close()
+
+        return {
+            "valid": broken is None,
+            "mode": "full" if full else "incremental",
+            "entries_total": total,
+            "entries_checked": checked,
+            "checkpoints": len(checkpoints) + created,
+            "checkpoints_created": created,
+            "first_broken": broken,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    def _check_checkpoints(self, conn: sqlite3.Connection, checkpoints: List[tuple]) -> Optional[Dict[str, Any]]:
+        """Signature check for every checkpoint, plus the boundary entry of the latest one."""
+        for block, first_seq, last_seq, last_hash, root, signature in checkpoints:
+            if not hmac.compare_digest(signature, self.sign(block, first_seq, last_seq, last_hash, root)):
+                return {"seq": first_seq, "id": None, "reason": f"checkpoint {block} has an invalid signature"}
+        if checkpoints:
+            block, _, last_seq, last_hash = checkpoints[-1][:4]
+            row = conn.execute("SELECT id, audit_hash FROM audit_entries WHERE seq = ?", (last_seq,)).fetchone()
+            if row is None or row[1] != last_hash:
+                return {"seq": last_seq, "id": row[0] if row else None,
+                        "reason": f"entry sealed by checkpoint {block} was modified or removed"}
+        return None
+
+    def _seal(self, conn: sqlite3.Connection, block: int, first_seq: int, result: Dict[str, Any]):
+        signature = self.sign(block, first_seq, result["last_seq"], result["last_hash"], result["root"])
+        conn.execute(
+            "INSERT OR REPLACE INTO audit_checkpoints "
+            "(block, first_seq, last_seq, last_hash, merkle_root, signature, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (block, first_seq, result["last_seq"], result["last_hash"], result["root"], signature, time.time()),
+        )
+        conn.commit()
+
+    def _read_blocks(self, conn: sqlite3.Connection, start_block: int, max_seq: int) -> Iterator[Tuple[int, List[tuple]]]:
+        cursor = conn.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM audit_entries WHERE seq > ? AND seq <= ? ORDER BY seq",
+            (start_block * self.block_size, max_seq),
+        )
+        block = start_block
+        while True:
+            rows = cursor.fetchmany(self.block_size)
+            if not rows:
+                return
+            yield block, rows
+            block += 1
+
+    def _verify_blocks(self, conn, start_block: int, prev_seq: int, prev_hash: str, max_seq: int):
+        """
+        Yield (block, rows, result) in order. Blocks are independent given the hash
+        of the entry before them, so multiple blocks are verified in parallel.
+        """
+        pending = []  # (block, rows, future or result)
+        window = self.workers * 2
+        for block, rows in self._read_blocks(conn, start_block, max_seq):
+            if self.workers > 1 and (pending or len(rows) == self.block_size):
+                pending.append((block, rows, self._pool().submit(verify_block, rows, prev_seq, prev_hash)))
+            else:
+                pending.append((block, rows, verify_block(rows, prev_seq, prev_hash)))
+            # The next block starts from this block's last row as stored; links are still
+            # checked because each block verifies its first entry against that hash.
+            prev_seq, prev_hash = rows[-1][0], rows[-1][COLUMNS.index("audit_hash")]
+            while len(pending) >= window:
+                yield _resolve(pending.pop(0))
+        while pending:
+            yield _resolve(pending.pop(0))
+
+    def _pool(self) -> Executor:
+        if self._executor is None:
+            # Not fork: the server already runs threads (audit writer, storage flusher, trace exporter)
+            # that may hold locks at fork time
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+
+def _resolve(item: tuple) -> tuple:
+    block, rows, outcome = item
+    return block, rows, outcome if isinstance(outcome, dict) else outcome.result()
+
+
+# ---------------------- INCLUSION PROOFS ------------------------ #
+def verify_entry_proof(document: Dict[str, Any], trusted_root: Optional[str] = None) -> bool:
+    """
+    Standalone check of a /api/audit/proof response: the entry's fields must hash
+    to its audit_hash, and its leaf must lead to the root along the proof path.
+    Pass trusted_root (e.g. a root published earlier) to pin the expected root.
+    """
+    entry = dict(document["entry"])
+    if isinstance(entry.get("timestamp"), str):
+        entry["timestamp"] = datetime.fromisoformat(entry["timestamp"])
+    entry.pop("seq", None)
+    if generate_audit_hash(hashed_fields(entry), entry.get("prev_hash") or "") != entry["audit_hash"]:
+        return False
+    root = document["root"]
+    if trusted_root is not None and not hmac.compare_digest(root, trusted_root):
+        return False
+    return verify_inclusion(
+        leaf_hash(entry["audit_hash"]),
+        document["leaf_index"],
+        document["tree_size"],
+        [bytes.fromhex(node) for node in document["proof"]],
+        bytes.fromhex(root),
+    )
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    # python audit_integrity.py proof.json [trusted_root]
+    with open(sys.argv[1]) as f:
+        proof_document = json.load(f)
+    ok = verify_entry_proof(proof_document, sys.argv[2] if len(sys.argv) > 2 else None)
+    print("inclusion proof valid" if ok else "inclusion proof INVALID")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,131 @@
+"""
+Plutus - Audit Merkle Tree
+Incremental Merkle tree (RFC 6962 / 9162 hashing) over audit entries in log
+order. Every complete, aligned subtree is stored as a node row when its last
+leaf is appended, so appends cost O(log n) writes and inclusion proofs need
+O(log n) node lookups instead of replaying the hash chain.
+"""
+
+import hashlib
+import sqlite3
+from typing import Callable, Dict, Iterable, List, Tuple
+
+
+def leaf_hash(audit_hash: str) -> bytes:
+    return hashlib.sha256(b"\x00" + audit_hash.encode()).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def merkle_root(leaves: List[bytes]) -> bytes:
+    """Root over leaf hashes. Pairing left to right and carrying the odd node up matches the RFC 6962 split."""
+    if not leaves:
+        return hashlib.sha256(b"").digest()
+    level = list(leaves)
+    while len(level) > 1:
+        paired = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            paired.append(level[-1])
+        level = paired
+    return level[0]
+
+
+def _split(size: int) -> int:
+    """Largest power of two strictly less than size (size > 1)."""
+    return 1 << ((size - 1).bit_length() - 1)
+
+
+# ---------------------- NODE STORAGE ------------------------ #
+def create_tables(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS audit_merkle_nodes (
+            level INTEGER NOT NULL,
+            idx INTEGER NOT NULL,
+            hash BLOB NOT NULL,
+            PRIMARY KEY (level, idx)
+        ) WITHOUT ROWID
+    """)
+
+
+def leaf_count(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT MAX(idx) FROM audit_merkle_nodes WHERE level = 0").fetchone()
+    return 0 if row[0] is None else row[0] + 1
+
+
+def append_leaves(conn: sqlite3.Connection, start: int, audit_hashes: Iterable[str]):
+    """
+    Add leaves at indexes start, start+1, ... and every subtree they complete.
+    Must run inside the transaction that commits the corresponding entries.
+    """
+    written: Dict[Tuple[int, int], bytes] = {}
+
+    def node(level: int, idx: int) -> bytes:
+        if (level, idx) in written:
+            return written[(level, idx)]
+        return conn.execute(
+            "SELECT hash FROM audit_merkle_nodes WHERE level = ? AND idx = ?", (level, idx)
+        ).fetchone()[0]
+
+    for offset, audit_hash in enumerate(audit_hashes):
+        level, idx, value = 0, start + offset, leaf_hash(audit_hash)
+        written[(level, idx)] = value
+        while idx % 2 == 1:  # right child completes its parent
+            value = node_hash(node(level, idx - 1), value)
+            level, idx = level + 1, idx // 2
+            written[(level, idx)] = value
+    conn.executemany(
+        "INSERT INTO audit_merkle_nodes (level, idx, hash) VALUES (?, ?, ?)",
+        [(level, idx, value) for (level, idx), value in written.items()],
+    )
+
+
+# ---------------------- PROOFS ------------------------ #
+def subtree_root(get_node: Callable[[int, int], bytes], start: int, size: int) -> bytes:
+    """MTH of leaves [start, start+size), built from stored complete subtrees."""
+    if size & (size - 1) == 0 and start % size == 0:
+        return get_node(size.bit_length() - 1, start // size)
+    k = _split(size)
+    return node_hash(subtree_root(get_node, start, k), subtree_root(get_node, start + k, size - k))
+
+
+def inclusion_path(get_node: Callable[[int, int], bytes], index: int, size: int) -> List[bytes]:
+    """Audit path for leaf `index` in the tree of the first `size` leaves (RFC 6962 PATH)."""
+    path: List[bytes] = []
+    start = 0
+    while size > 1:
+        k = _split(size)
+        if index < k:
+            path.append(subtree_root(get_node, start + k, size - k))
+            size = k
+        else:
+            path.append(subtree_root(get_node, start, k))
+            start, index, size = start + k, index - k, size - k
+    path.reverse()  # leaf to root
+    return path
+
+
+def root_for_size(get_node: Callable[[int, int], bytes], size: int) -> bytes:
+    return subtree_root(get_node, 0, size) if size else merkle_root([])
+
+
+def verify_inclusion(leaf: bytes, index: int, size: int, path: List[bytes], root: bytes) -> bool:
+    """Check an audit path (RFC 9162 section 2.1.3.2). Needs nothing but hashlib."""
+    if index >= size:
+        return False
+    fn, sn, r = index, size - 1, leaf
+    for p in path:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            r = node_hash(p, r)
+            if not fn & 1:
+                while not fn & 1 and fn != 0:
+                    fn >>= 1
+                    sn >>= 1
+        else:
+            r = node_hash(r, p)
+        fn >>= 1
+        sn >>= 1
+    return sn == 0 and r == root
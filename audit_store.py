@@ -0,0 +1,377 @@
+"""
+Plutus - Persistent Audit Log Store
+Append-only audit trail in SQLite (WAL mode). Appends are queued and written by
+a single background thread that group-commits everything queued at once; the
+hash chain (prev_hash -> audit_hash) is extended inside the write transaction,
+so it stays linear even with several processes writing to the same file.
+A batch that fails to commit is rolled back and retried in place (a busy or
+locked database is transient), so nothing queued behind it can overtake it;
+an entry the database rejects outright is logged and reported by flush().
+Reads use indexed, cursor-based pagination (cursor = entry sequence number).
+The same transaction extends a Merkle tree over the entries (audit_merkle.py)
+for O(log n) inclusion proofs.
+"""
+
+import hashlib
+import json
+import logging
+import queue
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import audit_merkle
+
+AUDIT_BATCH_SIZE = 512
+AUDIT_RETRY_MAX_DELAY = 2.0  # cap on the backoff between attempts at a failing batch
+GENESIS_HASH = "genesis"
+
+COLUMNS = ("seq", "id", "action", "timestamp", "details", "actor", "audit_hash", "prev_hash", "trace_id")
+
+logger = logging.getLogger(__name__)
+
+
+def generate_audit_hash(data: dict, prev_hash: str) -> str:
+    """Generate SHA256 hash for audit trail."""
+    content = json.dumps(data, sort_keys=True, default=str) + prev_hash
+    return hashlib.sha256(content.encode()).hexdigest()[:16]
+
+
+def hashed_fields(entry: dict) -> dict:
+    """
+    The part of an entry covered by its audit_hash (everything but seq and the
+    hash itself). trace_id is covered only when set, so entries written before
+    the column existed (or outside a traced request) keep their original hash.
+    """
+    return {k: v for k, v in entry.items()
+            if k not in ("seq", "audit_hash") and not (k == "trace_id" and v is None)}
+
+
+class AuditStore:
+    """Durable append-only audit log with group commit and indexed queries."""
+
+    def __init__(self, db_path: str, hash_fn: Callable[[dict, str], str] = generate_audit_hash,
+                 batch_size: int = AUDIT_BATCH_SIZE):
+        self.db_path = db_path
+        self.hash_fn = hash_fn
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue()
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._writer: Optional[threading.Thread] = None
+        self._read_lock = threading.Lock()
+        self.batches = 0
+        self.committed = 0
+        self.retries = 0
+        self.rejected = 0  # entries the database refused (e.g. a duplicate id); never committed
+        self.last_error: Optional[str] = None
+        self._unreported = 0  # rejected or lost since the last flush()
+        self._closing = threading.Event()
+
+        conn = self._connect()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS audit_entries (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT NOT NULL UNIQUE,
+                action TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                details TEXT,
+                actor TEXT,
+                audit_hash TEXT NOT NULL,
+                prev_hash TEXT,
+                trace_id TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_audit_timestamp ON audit_entries (timestamp);
+            CREATE INDEX IF NOT EXISTS idx_audit_action ON audit_entries (action, seq);
+            CREATE INDEX IF NOT EXISTS idx_audit_actor ON audit_entries (actor, seq);
+        """)
+        audit_merkle.create_tables(conn)
+        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")  # other workers may be starting at the same time
+        if "trace_id" not in {row[1] for row in conn.execute("PRAGMA table_info(audit_entries)")}:
+            conn.execute("ALTER TABLE audit_entries ADD COLUMN trace_id TEXT")
+        self._backfill_merkle(conn)
+        conn.execute("COMMIT")
+        conn.close()
+        self._reader = self._connect()
+
+    @staticmethod
+    def _backfill_merkle(conn: sqlite3.Connection):
+        """Add tree leaves for entries written before the Merkle tree existed."""
+        start = audit_merkle.leaf_count(conn)
+        hashes = [row[0] for row in conn.execute(
+            "SELECT audit_hash FROM audit_entries WHERE seq > ? ORDER BY seq", (start,)
+        )]
+        if hashes:
+            audit_merkle.append_leaves(conn, start, hashes)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ---------------------- WRITES ------------------------ #
+    def append(self, entry: dict) -> dict:
+        """
+        Queue an entry (id, action, timestamp, details, actor, optional trace_id). prev_hash and
+        audit_hash are filled in on the same dict when the entry is committed.
+        """
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._run_writer, name="audit-writer", daemon=True)
+            self._writer.start()
+        with self._cond:
+            self._pending += 1
+        self._queue.put(entry)
+        return entry
+
+    def seed(self, entries: List[dict]) -> bool:
+        """
+        Commit entries synchronously, but only if the log is empty. The check
+        and insert share one write transaction, so concurrent workers seed once.
+        """
+        conn = self._connect()
+        try:
+            return self._commit(conn, entries, only_if_empty=True)
+        finally:
+            conn.close()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def flush(self, timeout: Optional[float] = 10.0) -> bool:
+        """
+        Block until every queued entry has been written. Returns False on timeout
+        (the database stayed unavailable) or if any entry since the previous
+        flush() was rejected or lost instead of committed.
+        """
+        with self._cond:
+            done = self._cond.wait_for(lambda: self._pending == 0, timeout)
+            if not done:
+                return False
+            lost, self._unreported = self._unreported, 0
+            return lost == 0
+
+    def close(self):
+        """Commit outstanding entries and stop the writer thread."""
+        if self._writer is not None and self._writer.is_alive():
+            self._closing.set()
+            self._queue.put(None)
+            self._writer.join(timeout=10)
+        self._writer = None
+        self._closing.clear()
+
+    def _run_writer(self):
+        conn = self._connect()
+        try:
+            while True:
+                entry = self._queue.get()
+                if entry is None:
+                    return
+                # Group commit: take everything already queued, up to batch_size
+                batch = [entry]
+                stop = False
+                while len(batch) < self.batch_size:
+                    try:
+                        nxt = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if nxt is None:
+                        stop = True
+                        break
+                    batch.append(nxt)
+                failed = self._write(conn, batch)
+                with self._cond:
+                    self._pending -= len(batch)
+                    self._unreported += failed
+                    self._cond.notify_all()
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _write(self, conn: sqlite3.Connection, batch: List[dict]) -> int:
+        """
+        Commit a batch, retrying with backoff while the database is busy or
+        locked. Returns how many entries were not committed.
+        """
+        delay = 0.05
+        while True:
+            try:
+                self._commit(conn, batch)
+                return 0
+            except sqlite3.OperationalError as e:
+                self.last_error = str(e)
+                if self._closing.is_set():
+                    logger.error("Audit store: %d entries lost at shutdown: %s", len(batch), e)
+                    return len(batch)
+                self.retries += 1
+                logger.warning("Audit store: commit of %d entries failed (%s); retrying in %.2fs", len(batch), e, delay)
+                # Waiting on _closing rather than sleeping lets close() cut the backoff short
+                self._closing.wait(delay)
+                delay = min(delay * 2, AUDIT_RETRY_MAX_DELAY)
+            except sqlite3.Error as e:
+                self.last_error = str(e)
+                if len(batch) == 1:
+                    self.rejected += 1
+                    logger.error("Audit store: entry %s rejected: %s", batch[0].get("id"), e)
+                    return 1
+                # Something in the batch is invalid (e.g. a duplicate id): commit entries one by one,
+                # in order, so only the offending ones are left out of the chain
+                return sum(self._write(conn, [entry]) for entry in batch)
+
+    def _commit(self, conn: sqlite3.Connection, batch: List[dict], only_if_empty: bool = False) -> bool:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT audit_hash FROM audit_entries ORDER BY seq DESC LIMIT 1").fetchone()
+            if only_if_empty and row is not None:
+                conn.execute("ROLLBACK")
+                return False
+            prev_hash = row[0] if row else GENESIS_HASH
+            rows = []
+            for entry in batch:
+                entry["prev_hash"] = prev_hash
+                entry["audit_hash"] = self.hash_fn(hashed_fields(entry), prev_hash)
+                prev_hash = entry["audit_hash"]
+                rows.append((
+                    entry["id"], entry["action"], _format_timestamp(entry["timestamp"]),
+                    entry.get("details"), entry.get("actor"), entry["audit_hash"], entry["prev_hash"],
+                    entry.get("trace_id"),
+                ))
+            conn.executemany(
+                "INSERT INTO audit_entries (id, action, timestamp, details, actor, audit_hash, prev_hash, trace_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            audit_merkle.append_leaves(conn, audit_merkle.leaf_count(conn), [entry["audit_hash"] for entry in batch])
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:  # SQLite may already have rolled back (e.g. disk full)
+                conn.execute("ROLLBACK")
+            raise
+        self.batches += 1
+        self.committed += len(batch)
+        return True
+
+    # ---------------------- READS ------------------------ #
+    def query(
+        self,
+        limit: int = 50,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+        action: Optional[str] = None,
+        actor: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        newest_first: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        One page of entries. `before`/`after` are exclusive sequence-number cursors.
+        Pages are read from the newest (default) or oldest end via the primary key
+        or the action/actor indexes, so cost is proportional to the page size.
+        """
+        rows = self.query_rows(limit, before, after, action, actor, since, until, newest_first)
+        return [row_to_entry(row) for row in rows]
+
+    def query_rows(
+        self,
+        limit: int = 50,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+        action: Optional[str] = None,
+        actor: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        newest_first: bool = True,
+    ) -> List[tuple]:
+        """query() as raw COLUMNS tuples (timestamp as the stored ISO string), for direct encoding."""
+        clauses, params = [], []
+        if before is not None:
+            clauses.append("seq < ?")
+            params.append(before)
+        if after is not None:
+            clauses.append("seq > ?")
+            params.append(after)
+        if action:
+            clauses.append("action = ?")
+            params.append(action)
+        if actor:
+            clauses.append("actor = ?")
+            params.append(actor)
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(_format_timestamp(since))
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(_format_timestamp(until))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        order = "DESC" if newest_first else "ASC"
+        sql = f"SELECT {', '.join(COLUMNS)} FROM audit_entries {where} ORDER BY seq {order} LIMIT ?"
+        params.append(limit)
+        with self._read_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def inclusion_proof(self, entry_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Entry plus its Merkle audit path against the current tree. The entry's
+        leaf index is seq - 1; returns None if the ID is unknown.
+        """
+        with self._read_lock:
+            row = self._reader.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM audit_entries WHERE id = ?", (entry_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            entry = row_to_entry(row)
+            size = audit_merkle.leaf_count(self._reader)
+
+            def get_node(level: int, idx: int) -> bytes:
+                return self._reader.execute(
+                    "SELECT hash FROM audit_merkle_nodes WHERE level = ? AND idx = ?", (level, idx)
+                ).fetchone()[0]
+
+            index = entry["seq"] - 1
+            path = audit_merkle.inclusion_path(get_node, index, size)
+            root = audit_merkle.root_for_size(get_node, size)
+        return {
+            "entry": entry,
+            "leaf_index": index,
+            "tree_size": size,
+            "leaf_hash": audit_merkle.leaf_hash(entry["audit_hash"]).hex(),
+            "proof": [node.hex() for node in path],
+            "root": root.hex(),
+        }
+
+    def latest_hash(self) -> str:
+        with self._read_lock:
+            row = self._reader.execute("SELECT audit_hash FROM audit_entries ORDER BY seq DESC LIMIT 1").fetchone()
+        return row[0] if row else GENESIS_HASH
+
+    def count(self) -> int:
+        with self._read_lock:
+            return self._reader.execute("SELECT COUNT(*) FROM audit_entries").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": self.count(),
+            "pending": self._pending,
+            "batches": self.batches,
+            "committed": self.committed,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+            "avg_batch_size": round(self.committed / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+def _format_timestamp(value: Any) -> str:
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def row_to_entry(row: tuple) -> Dict[str, Any]:
+    """Convert a SELECT of COLUMNS into an entry dict."""
+    entry = dict(zip(COLUMNS, row))
+    entry["timestamp"] = datetime.fromisoformat(entry["timestamp"])
+    return entry
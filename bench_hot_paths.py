@@ -0,0 +1,401 @@
+"""
+Micro-benchmarks: in-process hot paths at realistic sizes, no network.
+Imports server.py against a scratch database and times the CPU work a request
+pays for beyond upstream I/O:
+
+  audit      10k-row SQLite read, AuditLog model construction, chain hashing
+  snapshot   get_stock_details / search_ticker on cached Alpaca snapshots (x500)
+  portfolio  /api/portfolio/ and /api/get_portfolio on a 500-position account
+  news       decoding and prompt building for a 200-article news payload
+  encode     response_model validation + JSON rendering of /api/audit and
+             portfolio responses, against the FAST_SERIALIZATION path
+  route      whole requests through the app and its middleware (TestClient)
+
+Each benchmark is calibrated to run at least --min-time per round, then timed
+for --rounds rounds; min/median/mean/stddev are per call. Upstream responses
+come from an in-process httpx MockTransport serving upstream_stub.py data (the
+portfolio routes then reuse them from the positions cache).
+
+--compare fails (exit status 1) if a benchmark's minimum is more than
+--tolerance slower than the baseline's; a flagged benchmark is measured once
+more first, so a single burst of noise does not fail the run. Every round is
+paired with a round of a fixed reference workload, and baseline figures are
+scaled by how much slower that workload ran than in the baseline's run, which
+absorbs machine speed drift.
+bench_baseline.json next to this script is the committed baseline, recorded on
+the machine described in its "machine" field. On very different hardware the
+scaling is only approximate; record your own with --save before comparing.
+
+Usage:
+    python bench_hot_paths.py --compare bench_baseline.json --tolerance 0.15
+    python bench_hot_paths.py --save bench_baseline.json
+    python bench_hot_paths.py --filter audit,encode
+"""
+
+import os
+import tempfile
+
+_SCRATCH = tempfile.mkdtemp(prefix="plutus-bench-")
+os.environ["PLUTUS_DB_PATH"] = os.path.join(_SCRATCH, "bench.db")
+os.environ.setdefault("SNAPSHOT_CACHE_TTL", "3600")  # snapshots stay cached for the whole run
+os.environ.setdefault("SNAPSHOT_CACHE_MAX_ENTRIES", "10000")
+os.environ.setdefault("POSITIONS_CACHE_TTL", "3600")
+for _credential in ("ALPACA", "FINNHUB", "DEEPSEEK"):
+    os.environ[f"{_credential}_RATE_LIMIT"] = "0"
+
+import argparse
+import asyncio
+import contextlib
+import csv
+import functools
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+import httpx
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from pydantic import BaseModel, TypeAdapter
+from starlette.requests import Request
+
+import http_clients
+import serialization
+import server
+import upstream_stub
+from audit_store import AuditStore, generate_audit_hash, hashed_fields
+from serialization import FastJSONResponse, ndjson, records
+from symbols import SYMBOL_DIRECTORY_PATH
+
+AUDIT_ROWS = 10_000
+PORTFOLIO_POSITIONS = 500
+NEWS_ARTICLES = 200
+
+LOOP = asyncio.new_event_loop()
+REQUEST = Request({"type": "http", "method": "GET", "path": "/", "headers": [], "query_string": b""})
+RESOURCES = contextlib.ExitStack()  # closed when main() ends
+
+
+def run(coro):
+    return LOOP.run_until_complete(coro)
+
+
+def listed_symbols() -> List[tuple]:
+    with open(SYMBOL_DIRECTORY_PATH, newline="") as f:
+        return [(row["symbol"], row["name"]) for row in csv.DictReader(f)]
+
+
+def portfolio_symbols(count: int) -> List[str]:
+    # Same numbering as the stub's portfolio once the listed symbols run out
+    listed = [s for s, _ in listed_symbols()]
+    return [listed[i % len(listed)] + (str(i // len(listed)) if i >= len(listed) else "") for i in range(count)]
+
+
+def route(path: str, method: str = "GET") -> APIRoute:
+    for r in server.app.routes:
+        if isinstance(r, APIRoute) and r.path == path and method in r.methods:
+            return r
+    raise LookupError(path)
+
+
+def response_adapter(path: str) -> TypeAdapter:
+    return TypeAdapter(route(path).response_model)
+
+
+def encode(adapter: TypeAdapter, content: Any) -> bytes:
+    """
+    What FastAPI does with an endpoint's return value, through public APIs:
+    models are dumped, validated against the response_model, then rendered by JSONResponse.
+    """
+    if isinstance(content, list):
+        content = [item.model_dump() if isinstance(item, BaseModel) else item for item in content]
+    return JSONResponse(adapter.dump_python(adapter.validate_python(content), mode="json")).body
+
+
+def model_path(fn: Callable[[], Any]) -> Callable[[], Any]:
+    """fn run with FAST_SERIALIZATION off, i.e. through the handlers' pydantic models."""
+    def call():
+        fast = serialization.FAST_SERIALIZATION
+        serialization.FAST_SERIALIZATION = False
+        try:
+            return fn()
+        finally:
+            serialization.FAST_SERIALIZATION = fast
+    return call
+
+
+@functools.lru_cache(maxsize=None)
+def audit_store() -> AuditStore:
+    """Scratch audit log with AUDIT_ROWS entries."""
+    store = AuditStore(os.path.join(_SCRATCH, "audit.db"))
+    for i in range(AUDIT_ROWS):
+        store.append({"id": f"log_bench_{i}", "action": ("AGENT_RUN", "TRADE_EXECUTED", "LOGIN")[i % 3],
+                      "timestamp": datetime.now(), "details": f"Agent analyzed {i % 50} stocks", "actor": "Agent"})
+    store.flush()
+    return store
+
+
+@functools.lru_cache(maxsize=None)
+def mock_positions():
+    """Serve a PORTFOLIO_POSITIONS-position account from the trading client, in process."""
+    body = json.dumps(upstream_stub.positions(portfolio_symbols(PORTFOLIO_POSITIONS))).encode()
+    transport = httpx.MockTransport(lambda request: httpx.Response(
+        200, content=body, headers={"Content-Type": "application/json"}))
+    http_clients.get_client(server.ALPACA_TRADING)._client = httpx.AsyncClient(transport=transport)
+
+
+# ---------------------- BENCHMARKS ------------------------ #
+# Each setup function returns {name: zero-argument callable doing one operation}
+
+def audit_benchmarks() -> Dict[str, Callable[[], Any]]:
+    store = audit_store()
+    rows = store.query(limit=AUDIT_ROWS)
+    return {
+        "audit.query_10k": lambda: store.query(limit=AUDIT_ROWS),
+        "audit.models_10k": lambda: [server.AuditLog(**row) for row in rows],
+        "audit.hash_10k": lambda: [generate_audit_hash(hashed_fields(row), row["prev_hash"]) for row in rows],
+    }
+
+
+def snapshot_benchmarks() -> Dict[str, Callable[[], Any]]:
+    tickers = portfolio_symbols(PORTFOLIO_POSITIONS)
+    for ticker in tickers:
+        server.SNAPSHOT_CACHE.set(ticker, upstream_stub.snapshot(ticker))
+    if not server.SYMBOL_DIRECTORY.listings:
+        server.SYMBOL_DIRECTORY.load()  # normally done at startup
+    # Names the local index resolves; the rest would go to the LLM
+    names = [name for _, name in listed_symbols()
+             if server.SYMBOL_DIRECTORY.lookup_name(name) or server._resolve_from_index(name)]
+
+    async def stock_details():
+        return [await server.get_stock_details(t) for t in tickers]
+
+    async def search_ticker():
+        return [await server.search_ticker(names[i % len(names)]) for i in range(PORTFOLIO_POSITIONS)]
+
+    return {
+        "snapshot.stock_details_500": lambda: run(stock_details()),
+        "snapshot.search_ticker_500": lambda: run(search_ticker()),
+    }
+
+
+def portfolio_benchmarks() -> Dict[str, Callable[[], Any]]:
+    mock_positions()
+    return {
+        "portfolio.portfolio_api_500": lambda: run(server.get_portfolio_api(REQUEST)),
+        "portfolio.get_portfolio_500": lambda: run(server.get_portfolio()),
+    }
+
+
+def news_benchmarks() -> Dict[str, Callable[[], Any]]:
+    articles = upstream_stub.company_news("AAPL", NEWS_ARTICLES)
+    body = json.dumps(articles).encode()
+    market = upstream_stub.snapshot("AAPL")
+    return {
+        "news.decode_200": lambda: json.loads(body),
+        "news.analysis_request_200": lambda: server._build_analysis_request(market, articles, "AAPL"),
+        "news.verdict_key_200": lambda: server.verdict_cache_key("AAPL", market, articles),
+    }
+
+
+def encode_benchmarks() -> Dict[str, Callable[[], Any]]:
+    store = audit_store()
+    mock_positions()
+    page_50 = [server.AuditLog(**row) for row in store.query(limit=50)]
+    page_1000 = [server.AuditLog(**row) for row in store.query(limit=1000)]
+    rows_1000 = [row[1:] for row in store.query_rows(limit=1000)]
+    audit_adapter = response_adapter("/api/audit")
+    get_portfolio_adapter = response_adapter("/api/get_portfolio")
+    portfolio_adapter = response_adapter("/api/portfolio/")
+    # The handlers' pydantic results, for the response_model path
+    positions = model_path(lambda: run(server.get_portfolio()))()
+    portfolio = json.loads(model_path(lambda: run(server.get_portfolio_api(REQUEST)).body)())
+    position_dicts = [p.model_dump() for p in positions]
+    return {
+        "encode.audit_50": lambda: encode(audit_adapter, page_50),
+        "encode.audit_1000": lambda: encode(audit_adapter, page_1000),
+        "encode.audit_1000_fast": lambda: FastJSONResponse(records(server.AUDIT_FIELDS, rows_1000)).body,
+        "encode.audit_10k_ndjson": lambda: ndjson(server.AUDIT_FIELDS,
+                                                  (row[1:] for row in store.query_rows(limit=AUDIT_ROWS))),
+        "encode.get_portfolio_500": lambda: encode(get_portfolio_adapter, positions),
+        "encode.get_portfolio_500_fast": lambda: FastJSONResponse(position_dicts).body,
+        "encode.portfolio_api_500": lambda: encode(portfolio_adapter, portfolio),
+        "encode.portfolio_api_500_fast": lambda: FastJSONResponse(portfolio).body,
+    }
+
+
+def route_benchmarks() -> Dict[str, Callable[[], Any]]:
+    mock_positions()
+    for i in range(server.AUDIT_PAGE_MAX):
+        server.add_audit_entry(("AGENT_RUN", "TRADE_EXECUTED", "LOGIN")[i % 3], f"Agent analyzed {i % 50} stocks")
+    server.AUDIT_STORE.flush()
+    client = RESOURCES.enter_context(TestClient(server.app))  # runs the lifespan, like a served worker
+    gzip = {"Accept-Encoding": "gzip"}
+
+    def get(path: str, headers: Dict[str, str] = None):
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200, (path, response.status_code)
+        return response.content
+
+    return {
+        "route.audit_1000": lambda: get(f"/api/audit?limit={server.AUDIT_PAGE_MAX}"),
+        "route.audit_1000_model": model_path(lambda: get(f"/api/audit?limit={server.AUDIT_PAGE_MAX}")),
+        "route.audit_1000_gzip": lambda: get(f"/api/audit?limit={server.AUDIT_PAGE_MAX}", gzip),
+        "route.get_portfolio_500": lambda: get("/api/get_portfolio"),
+        "route.portfolio_api_500": lambda: get("/api/portfolio/"),
+    }
+
+
+SUITES = [audit_benchmarks, snapshot_benchmarks, portfolio_benchmarks, news_benchmarks, encode_benchmarks,
+          route_benchmarks]
+
+
+# ---------------------- TIMING ------------------------ #
+def reference_workload():
+    """Fixed pure-Python work (dicts, strings, JSON) that none of the code under test touches."""
+    rows = [{"symbol": f"SYM{i}", "qty": i, "price": i * 1.25} for i in range(200)]
+    json.loads(json.dumps(rows))
+    sorted(rows, key=lambda row: (row["price"], row["symbol"]))
+
+
+def calibrate(fn: Callable[[], Any], min_time: float) -> int:
+    """Iterations of fn that take at least min_time."""
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return iterations
+        iterations *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+
+def measure(fn: Callable[[], Any], rounds: int, min_time: float) -> Dict[str, Any]:
+    """
+    Per-call timings: calibrate iterations per round to reach min_time, then time
+    `rounds` rounds. Each round is followed by a shorter round of reference_workload,
+    whose minimum ("reference") tells compare() how fast the machine was meanwhile.
+    """
+    fn()  # warm-up
+    iterations = calibrate(fn, min_time)
+    reference_iterations = calibrate(reference_workload, min_time / 4)
+
+    samples, reference = [], []
+    gc_was_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()  # collections would land on arbitrary rounds
+    try:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                fn()
+            samples.append((time.perf_counter() - start) / iterations)
+            start = time.perf_counter()
+            for _ in range(reference_iterations):
+                reference_workload()
+            reference.append((time.perf_counter() - start) / reference_iterations)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "stddev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "rounds": rounds,
+        "iterations": iterations,
+        "reference": min(reference),
+    }
+
+
+def compare(baseline: Dict[str, Any], results: Dict[str, Dict[str, Any]], tolerance: float,
+            stat: str = "min") -> Dict[str, str]:
+    """
+    Benchmarks whose `stat` got slower than the baseline's by more than `tolerance`.
+    The minimum is the default: noise from other processes only ever adds time,
+    so it is the most repeatable figure on a shared machine. The baseline figure
+    is first scaled by how much slower the reference workload ran alongside it
+    this time; virtual machines drift by 2x over minutes, which would otherwise
+    read as a regression of everything measured during a slow spell.
+    """
+    regressions = {}
+    for name, current in results.items():
+        before = baseline["benchmarks"].get(name)
+        if before is None:
+            continue
+        speed = current["reference"] / before["reference"] if before.get("reference") else 1.0
+        expected = before[stat] * speed
+        if current[stat] > expected * (1 + tolerance):
+            regressions[name] = (f"{name}: {stat} {expected * 1000:.3f} -> {current[stat] * 1000:.3f} ms "
+                                 f"(+{current[stat] / expected - 1:.0%}, baseline scaled x{speed:.2f})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", default="", help="Comma-separated substrings; only matching benchmarks run")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--min-time", type=float, default=0.1, help="Minimum seconds per round")
+    parser.add_argument("--save", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed slowdown (0.15 = 15%%)")
+    parser.add_argument("--stat", choices=("min", "median", "mean"), default="min",
+                        help="Statistic compared against the baseline")
+    args = parser.parse_args()
+
+    wanted = [w.strip() for w in args.filter.split(",") if w.strip()]
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print("=" * 84)
+    print(f"  {'benchmark':<32} {'min':>9} {'median':>9} {'mean':>9} {'stddev':>9}  (ms per call)")
+    print("=" * 84)
+    results, benchmarks = {}, {}
+    regressions: Dict[str, str] = {}
+    with RESOURCES:
+        for suite in SUITES:
+            for name, fn in suite().items():
+                if wanted and not any(w in name for w in wanted):
+                    continue
+                benchmarks[name] = fn
+                results[name] = r = measure(fn, args.rounds, args.min_time)
+                print(f"  {name:<32} {r['min'] * 1000:9.3f} {r['median'] * 1000:9.3f} {r['mean'] * 1000:9.3f} "
+                      f"{r['stddev'] * 1000:9.3f}")
+        if baseline is not None:
+            regressions = compare(baseline, results, args.tolerance, args.stat)
+            # A real slowdown survives a second measurement; a burst of noise from elsewhere rarely does
+            for name in regressions:
+                again = measure(benchmarks[name], args.rounds, args.min_time)
+                if again[args.stat] < results[name][args.stat]:
+                    results[name] = again
+            regressions = compare(baseline, results, args.tolerance, args.stat)
+    print("=" * 84)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "machine": {"python": platform.python_version(), "implementation": platform.python_implementation(),
+                            "processor": platform.processor() or platform.machine(), "cpus": os.cpu_count()},
+                "benchmarks": results,
+            }, f, indent=2)
+        print(f"  Results written to {args.save}")
+
+    if baseline is not None:
+        for line in regressions.values():
+            print(f"  REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"  No regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
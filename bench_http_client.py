@@ -0,0 +1,114 @@
+"""
+Benchmark: pooled async HTTP clients vs. the old requests + asyncio.to_thread path.
+Starts a local stub upstream that answers like an Alpaca snapshot after a fixed
+delay, then fires the same number of concurrent requests through both paths.
+
+Usage:
+    python bench_http_client.py --requests 2000 --concurrency 200 --latency-ms 20
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from http_clients import UpstreamClient
+
+SNAPSHOT_BODY = json.dumps({
+    "latestTrade": {"p": 189.25},
+    "latestQuote": {"ap": 189.3, "bp": 189.2},
+    "dailyBar": {"o": 187.1, "h": 190.0, "l": 186.5, "c": 189.25},
+}).encode()
+
+
+def make_handler(latency: float):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(SNAPSHOT_BODY)))
+            self.end_headers()
+            self.wfile.write(SNAPSHOT_BODY)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def start_stub_server(latency: float) -> ThreadingHTTPServer:
+    """Start the stub upstream on a free local port in a background thread."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(latency))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ---------------------- BENCHMARKED PATHS ------------------------ #
+def _sync_get(url: str, headers: dict = None, params: dict = None, timeout: int = 30) -> dict:
+    """The original per-call requests helper from server.py."""
+    response = requests.get(url, headers=headers, params=params, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+async def run_thread_offload(url: str, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await asyncio.to_thread(_sync_get, url, None, None, 30)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return time.perf_counter() - start
+
+
+async def run_pooled(url: str, total: int, concurrency: int) -> float:
+    client = UpstreamClient("bench", timeout=30.0, max_connections=concurrency,
+                            max_keepalive=concurrency, concurrency=concurrency)
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(client.get(url) for _ in range(total)))
+        return time.perf_counter() - start
+    finally:
+        await client.close()
+
+
+def report(label: str, total: int, elapsed: float):
+    print(f"  {label:<28} {elapsed:8.2f}s  {total / elapsed:10.1f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    server = start_stub_server(args.latency_ms / 1000)
+    url = f"http://127.0.0.1:{server.server_address[1]}/AAPL/snapshot"
+
+    print("=" * 60)
+    print(f"  {args.requests} requests, concurrency {args.concurrency}, "
+          f"stub latency {args.latency_ms:.0f} ms")
+    print("=" * 60)
+    try:
+        elapsed = asyncio.run(run_thread_offload(url, args.requests, args.concurrency))
+        report("requests + to_thread", args.requests, elapsed)
+        elapsed = asyncio.run(run_pooled(url, args.requests, args.concurrency))
+        report("pooled httpx.AsyncClient", args.requests, elapsed)
+    finally:
+        server.shutdown()
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
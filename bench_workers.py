@@ -0,0 +1,133 @@
+"""
+Benchmark: API throughput with 1..N worker processes.
+Starts `serve.py --workers N` on a scratch database for each worker count and
+drives a CPU-bound local endpoint (default: a 200-entry /api/audit page, i.e.
+SQLite read + pydantic validation + JSON encoding, no upstream calls) from
+several client processes with keep-alive connections.
+
+Usage:
+    python bench_workers.py --workers 1,2,4 --duration 10 --clients 4 --connections 16
+"""
+
+import argparse
+import http.client
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from audit_store import AuditStore
+
+
+def wait_until_up(port: int, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def _client_process(port: int, path: str, connections: int, duration: float, results):
+    """One load-generating process: `connections` threads, each with a keep-alive connection."""
+    counts = [0] * connections
+    errors = [0] * connections
+    stop_at = time.monotonic() + duration
+
+    def loop(i: int):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        while time.monotonic() < stop_at:
+            try:
+                conn.request("GET", path)
+                response = conn.getresponse()
+                response.read()
+                if response.status == 200:
+                    counts[i] += 1
+                else:
+                    errors[i] += 1
+            except (OSError, http.client.HTTPException):
+                errors[i] += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+
+    threads = [threading.Thread(target=loop, args=(i,)) for i in range(connections)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results.put((sum(counts), sum(errors)))
+
+
+def run_load(port: int, path: str, clients: int, connections: int, duration: float) -> tuple:
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_client_process, args=(port, path, connections, duration, results))
+             for _ in range(clients)]
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    totals = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - start
+    return sum(t[0] for t in totals), sum(t[1] for t in totals), elapsed
+
+
+def seed_audit_log(db_path: str, entries: int):
+    store = AuditStore(db_path)
+    for i in range(entries):
+        store.append({"id": f"log_bench_{i}", "action": "AGENT_RUN", "timestamp": datetime.now(),
+                      "details": f"Benchmark entry {i}", "actor": "Agent"})
+    store.flush()
+    store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--path", default="/api/audit?limit=200")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=max(2, os.cpu_count() or 1), help="Load-generating processes")
+    parser.add_argument("--connections", type=int, default=16, help="Keep-alive connections per client process")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="plutus-bench-")
+    db_path = os.path.join(scratch, "bench.db")
+    seed_audit_log(db_path, 1000)
+    env = {**os.environ, "PLUTUS_DB_PATH": db_path, "AUDIT_CHECKPOINT_INTERVAL": "3600"}
+
+    print("=" * 60)
+    print(f"  GET {args.path} for {args.duration:.0f}s, {args.clients} client processes x "
+          f"{args.connections} connections, {os.cpu_count()} CPUs")
+    print("=" * 60)
+    baseline = None
+    for workers in [int(w) for w in args.workers.split(",")]:
+        server = subprocess.Popen(
+            [sys.executable, "serve.py", "--workers", str(workers), "--port", str(args.port)],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_until_up(args.port)
+            time.sleep(1 if workers == 1 else 2)  # let every worker finish startup
+            ok, errors, elapsed = run_load(args.port, args.path, args.clients, args.connections, args.duration)
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(60)
+        rate = ok / elapsed
+        baseline = baseline or rate
+        print(f"  {workers:>2} worker(s)  {rate:10.1f} req/s  x{rate / baseline:4.2f}  ({errors} errors)")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Plutus - In-Process Caches
+TTL + LRU caches with single-flight loading, so concurrent requests for the
+same key share one upstream call. Cached values are shared between callers
+and must be treated as read-only.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import settings
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory footprint of a JSON-like value, in bytes."""
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 256
+
+
+class TTLCache:
+    """
+    Async TTL cache with LRU eviction bounded by entry count and approximate bytes.
+    `get_or_load` coalesces concurrent misses for a key into a single loader call.
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int = 1000, max_bytes: int = 8 * 1024 * 1024):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, size, value)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Return a fresh cached value or None. Expired entries are kept (until LRU
+        eviction or replacement) so get_stale can serve them while an upstream is down.
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        self._entries.move_to_end(key)
+        return entry[2]
+
+    def get_stale(self, key: str) -> Optional[Any]:
+        """Return the cached value for key even if it has expired, or None."""
+        entry = self._entries.get(key)
+        return entry[2] if entry is not None else None
+
+    def lookup(self, key: str) -> Optional[Any]:
+        """Like get, but counted in the hit/miss statistics."""
+        value = self.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        if key in self._entries:
+            self._remove(key)
+        size = estimate_size(value)
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), size, value)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, key: str):
+        if key in self._entries:
+            self._remove(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def close(self):
+        """Write out anything buffered (persistent caches)."""
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for key, or run loader once for all concurrent callers."""
+        value, _ = await self.get_or_load_status(key, loader)
+        return value
+
+    async def get_or_load_status(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Tuple[Any, str]:
+        """Like get_or_load, also reporting how the value was obtained: hit, coalesced or miss."""
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value, "hit"
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight), "coalesced"
+
+        self.misses += 1
+        task = asyncio.ensure_future(loader())
+        self._inflight[key] = task
+
+        def _done(t: asyncio.Future):
+            self._inflight.pop(key, None)
+            if not t.cancelled() and t.exception() is None:
+                self.set(key, t.result())
+
+        task.add_done_callback(_done)
+        # Shield so a cancelled caller (e.g. a deadline) does not cancel the shared load
+        return await asyncio.shield(task), "miss"
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "ttl_seconds": self.ttl,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+class PersistentTTLCache(TTLCache):
+    """
+    TTLCache backed by SQLite; unexpired entries are reloaded on startup. Writes
+    are buffered and applied by a background thread every `flush_interval`
+    seconds, so filling the cache never waits on the database. Each flush also
+    deletes expired rows and keeps at most max_entries rows on disk.
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int = 1000,
+                 max_bytes: int = 8 * 1024 * 1024, db_path: str = settings.PLUTUS_DB_PATH, flush_interval: float = 1.0):
+        super().__init__(name, ttl, max_entries, max_bytes)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()     # guards _pending
+        self._db_lock = threading.Lock()  # guards _conn
+        self._pending: Dict[str, Optional[tuple]] = {}  # key -> (expires_at, value) to write, or None to delete
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                cache TEXT NOT NULL,
+                key TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (cache, key)
+            )
+        """)
+        now = time.time()
+        self._conn.execute("DELETE FROM cache_entries WHERE expires_at < ?", (now,))
+        self._conn.commit()
+        rows = self._conn.execute(
+            "SELECT key, expires_at, value FROM cache_entries WHERE cache = ? ORDER BY expires_at",
+            (name,),
+        ).fetchall()
+        for key, expires_at, value in rows:
+            super().set(key, json.loads(value), ttl=expires_at - now)
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._run_flusher, name=f"cache-flusher-{name}", daemon=True)
+        self._flusher.start()
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        super().set(key, value, ttl)
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._pending[key] = (expires_at, value)
+
+    def invalidate(self, key: str):
+        super().invalidate(key)
+        with self._lock:
+            self._pending[key] = None
+
+    def flush(self):
+        """Apply buffered writes, then drop expired rows and rows beyond max_entries."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        writes = [(self.name, key, entry[0], json.dumps(entry[1], default=str))
+                  for key, entry in pending.items() if entry is not None]
+        deletes = [(self.name, key) for key, entry in pending.items() if entry is None]
+        try:
+            with self._db_lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO cache_entries (cache, key, expires_at, value) VALUES (?, ?, ?, ?)", writes
+                )
+                self._conn.executemany("DELETE FROM cache_entries WHERE cache = ? AND key = ?", deletes)
+                self._conn.execute(
+                    "DELETE FROM cache_entries WHERE cache = ? AND expires_at < ?", (self.name, time.time())
+                )
+                self._conn.execute(
+                    "DELETE FROM cache_entries WHERE cache = ? AND key NOT IN "
+                    "(SELECT key FROM cache_entries WHERE cache = ? ORDER BY expires_at DESC LIMIT ?)",
+                    (self.name, self.name, self.max_entries),
+                )
+                self._conn.commit()
+        except sqlite3.Error:
+            with self._db_lock:
+                self._conn.rollback()
+            with self._lock:  # keep the writes for the next attempt unless superseded
+                for key, entry in pending.items():
+                    self._pending.setdefault(key, entry)
+            raise
+
+    def _run_flusher(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"Cache flush error ({self.name}): {e}")
+
+    def close(self):
+        self._stop.set()
+        self._flusher.join(timeout=5)
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+
+# ---------------------- CACHE REGISTRY ------------------------ #
+CACHES: Dict[str, Any] = {}
+
+
+def register(cache):
+    """Register a cache so its counters show up in cache_stats()."""
+    CACHES[cache.name] = cache
+    return cache
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: cache.stats() for name, cache in CACHES.items()}
@@ -0,0 +1,163 @@
+"""
+Plutus - Response Compression
+ASGI middleware compressing response bodies with Brotli (when the `brotli`
+package is installed and the client accepts it) or gzip. Bodies smaller than
+COMPRESSION_MIN_SIZE are sent as is. Streamed bodies (NDJSON) are flushed per
+chunk so nothing is held back. Server-Sent Events are never compressed, so each
+event is delivered as soon as it is written. An ETag on a compressed response
+gets an encoding suffix, because the compressed bytes are a different
+representation; etags.is_fresh strips the suffix again, and a 304 carries the
+suffix only if the client's cached copy had it.
+"""
+
+import os
+import zlib
+from typing import Optional
+
+import etags
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_ENABLED = os.environ.get("COMPRESSION_ENABLED", "1") in ("1", "true", "True")
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1000"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", "4"))  # dynamic content: fast levels compress nearly as well
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/javascript", "application/xml")
+
+
+def compressible(content_type: str) -> bool:
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type == "text/event-stream":
+        return False
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES or media_type.endswith("+json")
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Best encoding the client accepts ("br", "gzip" or None), honouring q=0."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    for encoding in (("br", "gzip") if brotli is not None else ("gzip",)):
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._gz = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            out = self._br.process(data)
+            return out + (self._br.finish() if final else self._br.flush())
+        out = self._gz.compress(data)
+        return out + self._gz.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """ASGI middleware applying Content-Encoding to compressible HTTP responses."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        request_headers = dict(scope.get("headers") or ())
+        encoding = choose_encoding((request_headers.get(b"accept-encoding") or b"").decode("latin-1"))
+
+        start = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = {k.lower(): v for k, v in message.get("headers") or ()}
+                if message["status"] == 304:
+                    # Echo the validator of the 200 being revalidated. Its body is not available here (a
+                    # version ETag skips the query), so whether that 200 was compressed is read from the
+                    # tag the client sent back: CompressionMiddleware suffixed it only if it compressed.
+                    held = etags.matched_encoding(
+                        (request_headers.get(b"if-none-match") or b"").decode("latin-1"),
+                        (headers.get(b"etag") or b"").decode("latin-1"),
+                    )
+                    message["headers"] = _add_vary([(k, _tag_etag(v, held) if k.lower() == b"etag" and held
+                                                     else v) for k, v in message.get("headers") or ()])
+                    passthrough = True
+                    await send(message)
+                    return
+                content_type = (headers.get(b"content-type") or b"").decode("latin-1")
+                if not compressible(content_type) or b"content-encoding" in headers:
+                    passthrough = True
+                    await send(message)
+                    return
+                message["headers"] = _add_vary(list(message.get("headers") or ()))
+                if encoding is None or message["status"] == 204:
+                    passthrough = True
+                    await send(message)
+                    return
+                start = message  # held until the first body chunk shows whether compression pays off
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                if not more_body and len(body) < COMPRESSION_MIN_SIZE:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                headers = [(k, v) for k, v in start["headers"] if k.lower() != b"content-length"]
+                headers = [(k, _tag_etag(v, encoding) if k.lower() == b"etag" else v) for k, v in headers]
+                headers.append((b"content-encoding", encoding.encode()))
+                compressed = compressor.compress(body, final=not more_body)
+                if not more_body:
+                    headers.append((b"content-length", str(len(compressed)).encode()))
+                await send({**start, "headers": headers})
+                await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+                return
+            await send({"type": "http.response.body", "body": compressor.compress(body, final=not more_body),
+                        "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def _add_vary(headers: list) -> list:
+    for i, (key, value) in enumerate(headers):
+        if key.lower() == b"vary":
+            if b"accept-encoding" not in value.lower():
+                headers[i] = (key, value + b", Accept-Encoding")
+            return headers
+    headers.append((b"vary", b"Accept-Encoding"))
+    return headers
+
+
+def _tag_etag(etag: bytes, encoding: str) -> bytes:
+    suffix = etags.ENCODING_SUFFIXES[encoding].encode()
+    return etag[:-1] + suffix + b'"' if etag.endswith(b'"') else etag
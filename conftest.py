@@ -0,0 +1,119 @@
+"""
+Shared pytest fixtures: canned upstream payloads, audit entries for the audit
+log tests, and the server module imported against a scratch database for
+route-level tests.
+"""
+
+import os
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import pytest
+
+AUDIT_START = datetime(2026, 1, 5, 9, 30)
+
+
+def audit_entry(i: int, action: str = "TRADE", actor: str = "agent") -> dict:
+    return {
+        "id": f"entry-{i}",
+        "action": action,
+        "timestamp": AUDIT_START + timedelta(seconds=i),
+        "details": f"details {i}",
+        "actor": actor,
+    }
+
+
+@pytest.fixture
+def make_entry():
+    """Factory for audit entries: id entry-<i>, timestamped i seconds after AUDIT_START."""
+    return audit_entry
+
+
+# Canned upstream payloads, shaped like the real APIs' responses
+NEWS_TOPICS = ("beats earnings estimates", "announces buyback", "cuts guidance", "signs supply deal")
+
+
+def base_price(symbol: str) -> float:
+    return 20 + (zlib.crc32(symbol.encode()) % 48000) / 100
+
+
+def snapshot(symbol: str) -> dict:
+    opened = round(base_price(symbol), 2)
+    price = round(opened * 1.01, 2)
+    now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    return {
+        "symbol": symbol,
+        "latestTrade": {"t": now, "p": price, "s": 100, "x": "V"},
+        "latestQuote": {"t": now, "ap": round(price * 1.0005, 2), "as": 3, "bp": round(price * 0.9995, 2), "bs": 2},
+        "minuteBar": {"t": now, "o": price, "h": price, "l": price, "c": price, "v": 2500},
+        "dailyBar": {"t": now, "o": opened, "h": price, "l": opened, "c": price, "v": 1_000_000},
+        "prevDailyBar": {"t": now, "o": opened, "h": opened, "l": opened, "c": opened, "v": 900_000},
+    }
+
+
+def company_news(symbol: str, count: int) -> list:
+    now = int(time.time())
+    return [{
+        "id": zlib.crc32(f"{symbol}-{i}".encode()),
+        "category": "company", "related": symbol, "image": "",
+        "datetime": now - i * 1800,
+        "headline": f"{symbol} {NEWS_TOPICS[i % len(NEWS_TOPICS)]}",
+        "source": "Wire",
+        "summary": f"{symbol} {NEWS_TOPICS[i % len(NEWS_TOPICS)]}. " + "Analysts weigh the impact on margins. " * 6,
+        "url": f"https://news.example.com/{symbol.lower()}/{i}",
+    } for i in range(count)]
+
+
+def positions(symbols: list) -> list:
+    result = []
+    for symbol in symbols:
+        qty = 1 + zlib.crc32(symbol.encode()) % 200
+        entry = base_price(symbol)
+        current = round(entry * 1.05, 2)
+        result.append({
+            "symbol": symbol, "qty": str(qty), "side": "long", "avg_entry_price": f"{entry:.2f}",
+            "current_price": f"{current:.2f}", "market_value": f"{qty * current:.2f}",
+            "unrealized_pl": f"{qty * (current - entry):.2f}",
+        })
+    return result
+
+
+@pytest.fixture
+def make_snapshot():
+    """Factory for Alpaca snapshot payloads: make_snapshot(symbol)."""
+    return snapshot
+
+
+@pytest.fixture
+def make_news():
+    """Factory for Finnhub company-news payloads: make_news(symbol, count)."""
+    return company_news
+
+
+@pytest.fixture
+def make_positions():
+    """Factory for Alpaca positions payloads: make_positions(symbols)."""
+    return positions
+
+
+@pytest.fixture(scope="session")
+def server(tmp_path_factory):
+    """server.py imported once per session, with its SQLite state in a temporary directory."""
+    if "server" not in sys.modules:
+        db_path = str(tmp_path_factory.mktemp("data") / "plutus.db")
+        os.environ["PLUTUS_DB_PATH"] = db_path
+        if "settings" in sys.modules:  # already imported by an earlier test module
+            sys.modules["settings"].PLUTUS_DB_PATH = db_path
+    import server
+    return server
+
+
+@pytest.fixture(scope="session")
+def client(server):
+    """TestClient for the app; one lifespan for the whole session (shutdown closes the stores)."""
+    from fastapi.testclient import TestClient
+
+    with TestClient(server.app) as client:
+        yield client
@@ -0,0 +1,81 @@
+"""
+Plutus - Conditional Responses
+Strong ETags for polled endpoints, computed from the response body or from a
+state version (e.g. the latest audit hash plus the query). A request whose
+If-None-Match names the current ETag gets `304 Not Modified` with no body; with
+a version ETag the answer is decided before any query or upstream call runs.
+"""
+
+import hashlib
+from typing import Any, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+import serialization
+
+# Revalidate on every use: clients keep the body and send If-None-Match instead of re-downloading
+CACHE_CONTROL = "private, no-cache"
+
+# CompressionMiddleware tags the ETag of an encoded body with one of these
+ENCODING_SUFFIXES = {"gzip": "-gzip", "br": "-br"}
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag from a body (bytes) or version components."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()}"'
+
+
+def _split(tag: str) -> Tuple[str, Optional[str]]:
+    """(ETag without encoding suffix, content encoding or None) for one If-None-Match entry."""
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]  # If-None-Match uses weak comparison
+    for encoding, suffix in ENCODING_SUFFIXES.items():
+        if tag.endswith(suffix + '"'):
+            return tag[:-len(suffix) - 1] + '"', encoding
+    return tag, None
+
+
+def matched_encoding(if_none_match: str, etag: str) -> Optional[str]:
+    """
+    Content encoding of the representation the client holds for `etag`, read
+    from the tag it sent in If-None-Match (None if identity or not named).
+    """
+    for tag in if_none_match.split(","):
+        opaque, encoding = _split(tag)
+        if opaque == etag:
+            return encoding
+    return None
+
+
+def is_fresh(request: Request, etag: str) -> bool:
+    """True if the client's If-None-Match already names this ETag (any content encoding of it)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(_split(tag)[0] == etag for tag in header.split(","))
+
+
+def not_modified(etag: str, headers: Optional[dict] = None) -> Response:
+    return Response(status_code=304, headers={**(headers or {}), "ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def conditional_json(request: Request, content: Any, headers: Optional[dict] = None) -> Response:
+    """JSON response with a content ETag, or 304 if the client already has this body."""
+    body = serialization.dumps(content)
+    return versioned_json(request, make_etag(body), body, headers)
+
+
+def versioned_json(request: Request, etag: str, body: bytes, headers: Optional[dict] = None) -> Response:
+    """An already encoded JSON body under a known ETag, or 304 if the client has it."""
+    if is_fresh(request, etag):
+        return not_modified(etag, headers)
+    return Response(body, media_type="application/json",
+                    headers={**(headers or {}), "ETag": etag, "Cache-Control": CACHE_CONTROL})
@@ -0,0 +1,283 @@
+"""
+Plutus - Shared Upstream HTTP Clients
+One pooled httpx.AsyncClient per upstream API (Alpaca data, Alpaca trading,
+Finnhub, DeepSeek), opened and closed with the FastAPI lifespan. Every call
+goes through the upstream's circuit breaker and rate limiter (resilience.py,
+rate_limit.py); GETs are additionally retried and optionally hedged.
+"""
+
+import os
+import asyncio
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, Optional
+
+import httpx
+
+import metrics
+import rate_limit
+import resilience
+import tracing
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx when installed)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+# ---------------------- CONFIGURATION ------------------------ #
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.environ.get("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_HOST_CONCURRENCY = int(os.environ.get("HTTP_HOST_CONCURRENCY", "32"))
+HTTP2_ENABLED = os.environ.get("HTTP2_ENABLED", "1") not in ("0", "false", "False")
+# A host that does not accept a connection quickly is down; fail fast instead of waiting the read timeout
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))
+
+ALPACA_DATA = "alpaca_data"
+ALPACA_TRADING = "alpaca_trading"
+FINNHUB = "finnhub"
+DEEPSEEK = "deepseek"
+
+# Default timeouts (seconds) per upstream; LLM calls are slower than market data.
+UPSTREAM_TIMEOUTS = {
+    ALPACA_DATA: 30.0,
+    ALPACA_TRADING: 30.0,
+    FINNHUB: 30.0,
+    DEEPSEEK: 60.0,
+}
+
+
+class UpstreamClient:
+    """Pooled keep-alive client for a single upstream with a concurrency cap."""
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive: int = HTTP_MAX_KEEPALIVE,
+        concurrency: int = HTTP_HOST_CONCURRENCY,
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+        self.concurrency = concurrency
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.in_flight = 0
+        self._client: Optional[httpx.AsyncClient] = None
+        self.limiter = rate_limit.get_limiter(name)
+        self.resilience = resilience.Resilience(name)
+
+    def _timeout(self, timeout: Optional[float]) -> httpx.Timeout:
+        total = timeout or self.timeout
+        return httpx.Timeout(total, connect=min(total, HTTP_CONNECT_TIMEOUT))
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=HTTP2_ENABLED and HTTP2_AVAILABLE,
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    @asynccontextmanager
+    async def _slot(self):
+        """One of the upstream's `concurrency` request slots."""
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+
+    @contextmanager
+    def _measure(self, method: str, url: str):
+        """
+        Record one upstream attempt in the /metrics histograms and as a CLIENT
+        span; the caller fills in the yielded dict's status (and byte counts).
+        """
+        labels = (self.name,)
+        outcome = {"status": "error"}
+        metrics.UPSTREAM_IN_FLIGHT.inc(labels)
+        start = time.perf_counter()
+        with tracing.span(f"{method} {self.name}", tracing.CLIENT, **{
+            "upstream": self.name, "http.method": method, "http.url": url.split("?")[0],
+        }) as span:
+            try:
+                yield outcome
+            finally:
+                metrics.UPSTREAM_IN_FLIGHT.dec(labels)
+                metrics.UPSTREAM_DURATION.observe((self.name, method), time.perf_counter() - start)
+                metrics.UPSTREAM_REQUESTS.inc((self.name, method, str(outcome["status"])))
+                span.set(**{
+                    "http.status_code": outcome["status"] if outcome["status"] != "error" else None,
+                    "http.request_content_length": outcome.get("request_bytes"),
+                    "http.response_content_length": outcome.get("response_bytes"),
+                })
+
+    async def request(self, method: str, url: str, timeout: Optional[float] = None, **kwargs) -> httpx.Response:
+        """
+        Send a request and raise httpx.HTTPStatusError on 4xx/5xx, or
+        resilience.CircuitOpenError (an httpx.TransportError) without sending
+        anything while the upstream's circuit is open. GETs are idempotent, so
+        they are retried with backoff on connection errors and 502/503/504;
+        `timeout` then bounds all attempts together.
+        """
+        if method.upper() == "GET":
+            async def send_within(remaining: float):
+                return await self._send(method, url, remaining, **kwargs)
+
+            return await self.resilience.call_idempotent(send_within, deadline=timeout or self.timeout)
+
+        async def send():
+            return await self._send(method, url, timeout, **kwargs)
+
+        return await self.resilience.call(send)
+
+    async def _send(self, method: str, url: str, timeout: Optional[float], **kwargs) -> httpx.Response:
+        """
+        One attempt. Waits for the upstream's rate limiter at the caller's
+        priority; a 429 pauses the limiter for Retry-After and re-queues the
+        request (a 429 was not processed, so this is safe for any method).
+        """
+        for attempt in range(rate_limit.RATE_LIMIT_MAX_RETRIES + 1):
+            if self.limiter is not None:
+                await self.limiter.acquire()
+            async with self._slot():
+                with self._measure(method, url) as outcome:
+                    response = await self.client.request(method, url, timeout=self._timeout(timeout), **kwargs)
+                    outcome["status"] = response.status_code
+                    outcome["request_bytes"] = len(response.request.content)
+                    outcome["response_bytes"] = len(response.content)
+            if response.status_code == 429 and self.limiter is not None \
+                    and attempt < rate_limit.RATE_LIMIT_MAX_RETRIES:
+                self.limiter.penalize(rate_limit.retry_after_seconds(response.headers.get("Retry-After")))
+                continue
+            break
+        response.raise_for_status()
+        return response
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, timeout: Optional[float] = None, **kwargs):
+        """
+        Streaming request; the response body is read incrementally inside the
+        context. Not retried (the body may already have been consumed), but the
+        outcome of opening the stream counts towards the circuit breaker.
+        """
+        breaker = self.resilience.breaker
+        breaker.before_call()
+        opened = False
+        try:
+            if self.limiter is not None:
+                await self.limiter.acquire()
+            async with self._slot():
+                with self._measure(method, url) as outcome:
+                    async with self.client.stream(method, url, timeout=self._timeout(timeout), **kwargs) as response:
+                        outcome["status"] = response.status_code
+                        if response.is_error:
+                            await response.aread()
+                        response.raise_for_status()
+                        opened = True
+                        breaker.record_success()
+                        yield response
+        except Exception as e:
+            if not opened:
+                if resilience.is_failure(e):
+                    breaker.record_failure()
+                else:
+                    breaker.record_neutral()
+            raise
+        except BaseException:
+            if not opened:
+                breaker.abandon()  # cancelled before the stream opened: says nothing about upstream health
+            raise
+
+    async def get(self, url: str, headers: dict = None, params: dict = None, timeout: Optional[float] = None) -> Any:
+        """GET request returning decoded JSON."""
+        response = await self.request("GET", url, timeout=timeout, headers=headers, params=params)
+        return response.json()
+
+    async def post(self, url: str, headers: dict = None, json_data: dict = None, timeout: Optional[float] = None) -> Any:
+        """POST request returning decoded JSON."""
+        response = await self.request("POST", url, timeout=timeout, headers=headers, json=json_data)
+        return response.json()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "open": self._client is not None and not self._client.is_closed,
+            "http2": HTTP2_ENABLED and HTTP2_AVAILABLE,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive": self.limits.max_keepalive_connections,
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "rate_limit": self.limiter.stats() if self.limiter is not None else None,
+            **self.resilience.stats(),
+        }
+
+
+# ---------------------- CLIENT REGISTRY ------------------------ #
+_CLIENTS: Dict[str, UpstreamClient] = {}
+
+
+def get_client(name: str) -> UpstreamClient:
+    """Return the shared client for an upstream, creating it on first use."""
+    client = _CLIENTS.get(name)
+    if client is None:
+        client = UpstreamClient(name, UPSTREAM_TIMEOUTS.get(name, 30.0))
+        _CLIENTS[name] = client
+    return client
+
+
+async def start_clients():
+    """Open connection pools for every known upstream."""
+    for name in UPSTREAM_TIMEOUTS:
+        get_client(name).client
+
+
+async def close_clients():
+    """Close all connection pools (called on application shutdown)."""
+    for client in list(_CLIENTS.values()):
+        await client.close()
+    _CLIENTS.clear()
+
+
+def client_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: client.stats() for name, client in _CLIENTS.items()}
+
+
+def circuit_states() -> Dict[str, Dict[str, Any]]:
+    """Circuit breaker state for every known upstream."""
+    return {name: get_client(name).resilience.breaker.stats() for name in UPSTREAM_TIMEOUTS}
+
+
+UPSTREAM_CIRCUIT_OPEN = metrics.Gauge("upstream_circuit_open", "1 while the upstream's circuit is open or half-open", ("upstream",))
+UPSTREAM_RETRIES = metrics.Counter("upstream_retries_total", "GET attempts retried after a failure", ("upstream",))
+UPSTREAM_HEDGES = metrics.Counter("upstream_hedged_requests_total", "Hedged duplicate GETs sent", ("upstream",))
+RATE_LIMIT_QUEUED = metrics.Gauge("rate_limit_queued_requests", "Calls waiting for a rate-limit token", ("credential",))
+RATE_LIMIT_THROTTLED = metrics.Counter("rate_limit_throttled_total", "429 responses received", ("credential",))
+
+
+@metrics.collector
+def _collect_upstreams():
+    for name, client in _CLIENTS.items():
+        labels = (name,)
+        UPSTREAM_CIRCUIT_OPEN.set(labels, int(client.resilience.breaker.state != resilience.CLOSED))
+        UPSTREAM_RETRIES.set(labels, client.resilience.retries)
+        UPSTREAM_HEDGES.set(labels, client.resilience.hedges)
+        if client.limiter is not None:
+            stats = client.limiter.stats()
+            RATE_LIMIT_QUEUED.set((client.limiter.name,), sum(stats["queued"].values()))
+            RATE_LIMIT_THROTTLED.set((client.limiter.name,), stats["throttled_429"])
@@ -0,0 +1,320 @@
+"""
+Load test: every /api route at a target request rate against the upstream stub.
+Starts upstream_stub.py and `serve.py` on a scratch database, then drives each
+route in turn with open-loop load for --duration seconds. Requests are sent on
+a fixed schedule whether or not earlier ones have finished, and latency is
+measured from the scheduled send time, so a backed-up server shows up in the
+percentiles rather than as a lower request rate.
+
+Reports count, errors, throughput and p50/p95/p99 latency per route, and can
+write them to a baseline file (--output) or compare against one (--compare);
+with --compare the exit status is 1 if any route regressed by more than
+--tolerance.
+
+Usage:
+    python load_test.py --rps 20 --duration 10 --output baseline.json
+    python load_test.py --rps 20 --duration 10 --compare baseline.json --tolerance 0.2
+    python load_test.py --routes stock,audit --stub-latency deepseek=fixed:200
+
+Agent routes run at a fraction of --rps (see ROUTES). The websocket route is
+not covered.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import platform
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from bench_workers import seed_audit_log
+from symbols import SYMBOL_DIRECTORY_PATH
+from upstream_stub import server_env
+
+AUDIT_ENTRIES = 1000
+
+
+class Context:
+    """What request builders draw from: symbols, company names and ids harvested from the server."""
+
+    def __init__(self, symbols: List[Tuple[str, str]]):
+        self.symbols = symbols
+        self.order_ids: List[str] = []
+        self.audit_ids = [f"log_bench_{i}" for i in range(AUDIT_ENTRIES)]
+        self.counter = 0
+
+    def symbol(self) -> str:
+        self.counter += 1
+        return self.symbols[self.counter % len(self.symbols)][0]
+
+    def name(self) -> str:
+        self.counter += 1
+        return self.symbols[self.counter % len(self.symbols)][1]
+
+    def order(self) -> Optional[Dict[str, Any]]:
+        if not self.order_ids:
+            return None
+        return {"order_id": self.order_ids.pop(), "confirm": True}
+
+
+# (route, method, rate relative to --rps, builder returning (url, json body) or None to skip)
+Builder = Callable[[Context], Optional[Tuple[str, Optional[dict]]]]
+ROUTES: List[Tuple[str, str, float, Builder]] = [
+    ("/", "GET", 1.0, lambda c: ("/", None)),
+    ("/api/portfolio/", "GET", 1.0, lambda c: ("/api/portfolio/", None)),
+    ("/api/search/ticker", "POST", 1.0,
+     lambda c: (f"/api/search/ticker?query={c.name() if c.counter % 2 else c.symbol()}", None)),
+    ("/api/search/suggest", "GET", 1.0, lambda c: (f"/api/search/suggest?q={c.name()[:3]}", None)),
+    ("/api/stock/{ticker}", "GET", 1.0, lambda c: (f"/api/stock/{c.symbol()}", None)),
+    ("/api/stocks", "GET", 1.0,
+     lambda c: ("/api/stocks?symbols=" + ",".join(c.symbol() for _ in range(10)), None)),
+    ("/api/orders/pending", "GET", 1.0, lambda c: ("/api/orders/pending", None)),
+    ("/api/agent/", "POST", 0.1, lambda c: ("/api/agent/", {"query": "analyze portfolio", "user_id": "load"})),
+    ("/api/get_agent_analysis/stream", "GET", 0.5,
+     lambda c: (f"/api/get_agent_analysis/stream?symbol={c.symbol()}", None)),
+    ("/api/agent/stream", "POST", 0.1,
+     lambda c: ("/api/agent/stream", {"query": "analyze portfolio", "user_id": "load"})),
+    ("/api/trade/confirm", "POST", 1.0, lambda c: ("/api/trade/confirm", c.order()) if c.order_ids else None),
+    ("/api/game/points", "GET", 1.0, lambda c: ("/api/game/points", None)),
+    ("/api/learn/daily", "GET", 1.0, lambda c: ("/api/learn/daily", None)),
+    ("/api/audit", "GET", 1.0, lambda c: ("/api/audit?limit=50", None)),
+    ("/api/audit/verify", "GET", 0.2, lambda c: ("/api/audit/verify", None)),
+    ("/api/audit/proof/{entry_id}", "GET", 1.0,
+     lambda c: (f"/api/audit/proof/{random.choice(c.audit_ids)}", None)),
+    ("/api/prices/stats", "GET", 1.0, lambda c: ("/api/prices/stats", None)),
+    ("/api/cache/stats", "GET", 1.0, lambda c: ("/api/cache/stats", None)),
+    ("/api/upstreams/stats", "GET", 1.0, lambda c: ("/api/upstreams/stats", None)),
+    ("/api/health", "GET", 1.0, lambda c: ("/api/health", None)),
+    ("/api/storage/stats", "GET", 1.0, lambda c: ("/api/storage/stats", None)),
+    ("/api/get_agent_analysis", "GET", 0.5, lambda c: (f"/api/get_agent_analysis?symbol={c.symbol()}", None)),
+    ("/api/get_details_search_stock", "GET", 1.0,
+     lambda c: (f"/api/get_details_search_stock?query={c.symbol()}", None)),
+    ("/api/get_portfolio", "GET", 1.0, lambda c: ("/api/get_portfolio", None)),
+    ("/api/get_audit", "GET", 1.0, lambda c: ("/api/get_audit?limit=10", None)),
+    ("/api/post_order", "POST", 1.0,
+     lambda c: ("/api/post_order", {"symbol": c.symbol(), "side": random.choice(("buy", "sell")),
+                                    "quantity": random.randint(1, 10), "order_type": "market"})),
+]
+
+
+def wait_for(url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=2).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def percentile(ordered: List[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def send(client: httpx.AsyncClient, method: str, url: str, body: Optional[dict]) -> int:
+    # Read streamed responses (SSE) to the end: the latency is the whole stream
+    async with client.stream(method, url, json=body) as response:
+        async for _ in response.aiter_raw():
+            pass
+        return response.status_code
+
+
+async def run_route(client: httpx.AsyncClient, context: Context, method: str, build: Builder,
+                    rps: float, duration: float) -> Dict[str, Any]:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    skipped = 0
+
+    async def one(scheduled: float, url: str, body: Optional[dict]):
+        try:
+            status = str(await send(client, method, url, body))
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        latencies.append(time.perf_counter() - scheduled)
+        statuses[status] = statuses.get(status, 0) + 1
+
+    tasks = []
+    start = time.perf_counter()
+    for i in range(max(1, int(rps * duration))):
+        scheduled = start + i / rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        request = build(context)
+        if request is None:
+            skipped += 1
+            continue
+        tasks.append(asyncio.create_task(one(scheduled, *request)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    errors = sum(n for status, n in statuses.items() if not status.isdigit() or int(status) >= 400)
+    return {
+        "count": len(ordered),
+        "errors": errors,
+        "skipped": skipped,
+        "statuses": statuses,
+        "target_rps": round(rps, 2),
+        "throughput_rps": round((len(ordered) - errors) / elapsed, 2),
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+        "max_ms": round((ordered[-1] if ordered else 0.0) * 1000, 2),
+    }
+
+
+async def harvest_orders(client: httpx.AsyncClient, context: Context, wanted: int):
+    """Run the agent until it has left `wanted` pending orders to confirm (bounded attempts)."""
+    for _ in range(20):
+        page = (await client.get("/api/orders/pending", params={"limit": 1000})).json()
+        context.order_ids = [o["order_id"] for o in page["pending_orders"]]
+        if len(context.order_ids) >= wanted:
+            return
+        await asyncio.gather(*(client.post("/api/agent/", json={"user_id": "load"}) for _ in range(4)))
+
+
+async def run_all(base_url: str, routes, args) -> Dict[str, Dict[str, Any]]:
+    with open(SYMBOL_DIRECTORY_PATH, newline="") as f:
+        context = Context([(row["symbol"], row["name"]) for row in csv.DictReader(f)])
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        for route, method, scale, build in routes:
+            rps = args.rps * scale
+            if route == "/api/trade/confirm":
+                await harvest_orders(client, context, int(rps * args.duration))
+            # One unmeasured request first, so imports and cold caches are not in the numbers
+            request = build(context)
+            if request is not None:
+                await send(client, method, *request)
+            results[f"{method} {route}"] = result = await run_route(client, context, method, build, rps, args.duration)
+            print(f"  {method:<4} {route:<32} {result['throughput_rps']:7.1f} req/s  p50 {result['p50_ms']:8.1f}  "
+                  f"p95 {result['p95_ms']:8.1f}  p99 {result['p99_ms']:8.1f} ms  "
+                  f"{result['errors']} errors" + (f", {result['skipped']} skipped" if result["skipped"] else ""))
+    return results
+
+
+def compare(baseline: Dict[str, Any], results: Dict[str, Dict[str, Any]], tolerance: float,
+            min_delta_ms: float) -> List[str]:
+    """Regressions of `results` against a baseline file's routes, as readable lines."""
+    regressions = []
+    for route, current in results.items():
+        before = baseline["routes"].get(route)
+        if before is None:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            # Small absolute changes are noise on fast routes, whatever the ratio
+            if current[key] > before[key] * (1 + tolerance) and current[key] - before[key] > min_delta_ms:
+                regressions.append(f"{route}: {key} {before[key]} -> {current[key]}")
+        if current["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{route}: throughput {before['throughput_rps']} -> {current['throughput_rps']} req/s")
+        error_rate = current["errors"] / max(1, current["count"])
+        before_rate = before["errors"] / max(1, before["count"])
+        if error_rate > before_rate + 0.01:
+            regressions.append(f"{route}: error rate {before_rate:.1%} -> {error_rate:.1%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=float, default=20.0, help="Requests per second per route (before scaling)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per route")
+    parser.add_argument("--routes", default="", help="Comma-separated substrings; only matching routes run")
+    parser.add_argument("--connections", type=int, default=256, help="Client connection pool size")
+    parser.add_argument("--workers", type=int, default=1, help="Server worker processes")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--stub-port", type=int, default=9100)
+    parser.add_argument("--stub-latency", action="append", default=[], help="Passed to the stub as --latency")
+    parser.add_argument("--stub-error-rate", action="append", default=[], help="Passed to the stub as --error-rate")
+    parser.add_argument("--stub-rate-limit", action="append", default=[], help="Passed to the stub as --rate-limit")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="Ignore latency increases smaller than this")
+    args = parser.parse_args()
+
+    wanted = [w.strip() for w in args.routes.split(",") if w.strip()]
+    routes = [r for r in ROUTES if not wanted or any(w in r[0] for w in wanted)]
+    if not routes:
+        raise SystemExit(f"no routes match {args.routes!r}")
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    stub_args = [f"--latency={v}" for v in args.stub_latency] + [f"--error-rate={v}" for v in args.stub_error_rate]
+    stub_args += [f"--rate-limit={v}" for v in args.stub_rate_limit]
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    scratch = tempfile.mkdtemp(prefix="plutus-load-")
+    db_path = os.path.join(scratch, "load.db")
+    seed_audit_log(db_path, AUDIT_ENTRIES)
+    env = {
+        **os.environ, **server_env(stub_url),
+        "PLUTUS_DB_PATH": db_path, "AUDIT_CHECKPOINT_INTERVAL": "3600",
+        # The stub enforces rate limits (if asked to); the server should not throttle itself as well
+        "ALPACA_RATE_LIMIT": "0", "FINNHUB_RATE_LIMIT": "0", "DEEPSEEK_RATE_LIMIT": "0",
+        "ALPACA_API_KEY": "stub", "ALPACA_SECRET_KEY": "stub", "FINNHUB_API_KEY": "stub", "DEEPSEEK_API_KEY": "stub",
+    }
+
+    print("=" * 100)
+    print(f"  {len(routes)} routes at {args.rps:g} req/s for {args.duration:g}s each, "
+          f"{args.workers} worker(s), {os.cpu_count()} CPUs")
+    print("=" * 100)
+    stub = subprocess.Popen([sys.executable, "upstream_stub.py", "--port", str(args.stub_port), *stub_args],
+                            stdout=subprocess.DEVNULL)
+    server = None
+    try:
+        wait_for(f"{stub_url}/_stub/stats")
+        server = subprocess.Popen([sys.executable, "serve.py", "--workers", str(args.workers), "--port", str(args.port)],
+                                  env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        wait_for(f"http://127.0.0.1:{args.port}/")
+        time.sleep(1 if args.workers == 1 else 2)  # let every worker finish startup
+        results = asyncio.run(run_all(f"http://127.0.0.1:{args.port}", routes, args))
+        upstreams = httpx.get(f"{stub_url}/_stub/stats").json()
+    finally:
+        for process in (server, stub):
+            if process is not None:
+                process.send_signal(signal.SIGTERM)
+                process.wait(60)
+    print("=" * 100)
+
+    if args.output:
+        report = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "config": {"rps": args.rps, "duration": args.duration, "workers": args.workers,
+                       "cpus": os.cpu_count(), "python": platform.python_version(),
+                       "stub_latency": args.stub_latency, "stub_error_rate": args.stub_error_rate,
+                       "stub_rate_limit": args.stub_rate_limit},
+            "upstreams": upstreams,
+            "routes": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"  Results written to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(baseline, results, args.tolerance, args.min_delta_ms)
+        for line in regressions:
+            print(f"  REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"  No regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+"""
+Plutus - Prometheus Metrics
+Dependency-free counters, gauges and histograms rendered in the Prometheus
+text format at GET /metrics. Recording is a dict lookup plus an addition (a
+bisect for histograms), so instrumenting hot paths costs next to nothing.
+Values that already live elsewhere (cache statistics, thread pools, circuit
+breakers) are read by collectors only when /metrics is scraped.
+
+With several worker processes (METRICS_DIR set, which `serve.py --workers N`
+does), each worker writes its values to METRICS_DIR/<pid>.json and every
+worker's /metrics merges all files: counters and histograms are summed (dead
+workers' totals are kept so counters never go backwards), gauges get a
+`worker` label and are reported for live workers only.
+"""
+
+import asyncio
+import bisect
+import functools
+import inspect
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+METRICS_DIR = os.environ.get("METRICS_DIR") or None
+METRICS_SYNC_INTERVAL = float(os.environ.get("METRICS_SYNC_INTERVAL", "5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple[str, ...], Any] = {}
+        REGISTRY.append(self)
+
+    def set(self, labels: Tuple[str, ...], value: float):
+        self.values[labels] = value
+
+
+class Counter(_Metric):
+    kind = COUNTER
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1.0):
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = GAUGE
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1.0):
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def dec(self, labels: Tuple[str, ...] = (), amount: float = 1.0):
+        self.values[labels] = self.values.get(labels, 0.0) - amount
+
+
+class Histogram(_Metric):
+    """Per label set: [per-bucket counts (last one is +Inf), sum, count]."""
+    kind = HISTOGRAM
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+
+REGISTRY: List[_Metric] = []
+_COLLECTORS: List[Callable[[], None]] = []
+
+
+def collector(fn: Callable[[], None]) -> Callable[[], None]:
+    """Register a function that refreshes metric values right before each scrape."""
+    _COLLECTORS.append(fn)
+    return fn
+
+
+# ---------------------- INSTRUMENTS ------------------------ #
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+HTTP_DURATION = Histogram("http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served")
+
+OPERATIONS = Counter("operation_total", "Calls of instrumented operations by outcome", ("operation", "outcome"))
+OPERATION_DURATION = Histogram("operation_duration_seconds", "Latency of instrumented operations", ("operation",))
+OPERATIONS_IN_FLIGHT = Gauge("operations_in_flight", "Instrumented operations running", ("operation",))
+
+UPSTREAM_REQUESTS = Counter("upstream_requests_total", "Upstream HTTP attempts by status", ("upstream", "method", "status"))
+UPSTREAM_DURATION = Histogram("upstream_request_duration_seconds", "Upstream HTTP attempt latency", ("upstream", "method"))
+UPSTREAM_IN_FLIGHT = Gauge("upstream_requests_in_flight", "Upstream HTTP attempts in progress", ("upstream",))
+
+
+def timed(operation: str):
+    """Decorator recording latency, outcome and concurrency of an async function or async generator."""
+    labels = (operation,)
+
+    def finish(start: float, outcome: str):
+        OPERATIONS_IN_FLIGHT.dec(labels)
+        OPERATION_DURATION.observe(labels, time.perf_counter() - start)
+        OPERATIONS.inc((operation, outcome))
+
+    def decorate(fn):
+        if inspect.isasyncgenfunction(fn):
+            @functools.wraps(fn)
+            async def generator_wrapper(*args, **kwargs):
+                OPERATIONS_IN_FLIGHT.inc(labels)
+                start, outcome = time.perf_counter(), "error"
+                try:
+                    async for item in fn(*args, **kwargs):
+                        yield item
+                    outcome = "ok"
+                except asyncio.CancelledError:
+                    outcome = "cancelled"
+                    raise
+                finally:
+                    finish(start, outcome)
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            OPERATIONS_IN_FLIGHT.inc(labels)
+            start, outcome = time.perf_counter(), "error"
+            try:
+                result = await fn(*args, **kwargs)
+                outcome = "ok"
+                return result
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                raise
+            finally:
+                finish(start, outcome)
+        return wrapper
+
+    return decorate
+
+
+_ROUTES: Dict[Any, str] = {}
+
+
+def route_template(scope) -> str:
+    """Path template of the route that handled an ASGI request (e.g. /api/stock/{ticker})."""
+    # Starlette's router stores the matched endpoint in the (shared) scope
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    route = _ROUTES.get(endpoint)
+    if route is None:
+        for candidate in getattr(scope.get("app"), "routes", ()):
+            if getattr(candidate, "endpoint", None) is endpoint:
+                route = candidate.path
+                break
+        route = _ROUTES[endpoint] = route or "unmatched"
+    return route
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route request counts, latency and in-flight requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = route_template(scope)
+            HTTP_DURATION.observe((scope["method"], route), time.perf_counter() - start)
+            HTTP_REQUESTS.inc((scope["method"], route, status))
+
+
+THREADPOOL_BUSY = Gauge("threadpool_busy_threads", "Threads running work", ("pool",))
+THREADPOOL_SIZE = Gauge("threadpool_max_threads", "Thread pool capacity", ("pool",))
+THREADPOOL_QUEUED = Gauge("threadpool_queued_tasks", "Work items waiting for a thread", ("pool",))
+
+
+@collector
+def _collect_thread_pools():
+    """
+    Saturation of the two pools blocking work runs on: anyio's limiter (sync
+    endpoints and dependencies) and the event loop's default executor
+    (asyncio.to_thread: audit and storage I/O).
+    """
+    try:
+        import anyio.to_thread
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        THREADPOOL_BUSY.set(("anyio",), limiter.borrowed_tokens)
+        THREADPOOL_SIZE.set(("anyio",), limiter.total_tokens)
+        THREADPOOL_QUEUED.set(("anyio",), limiter.statistics().tasks_waiting)
+    except (ImportError, RuntimeError):
+        pass
+    try:
+        executor = asyncio.get_running_loop()._default_executor
+    except RuntimeError:
+        return
+    if executor is not None:
+        queued = executor._work_queue.qsize()
+        THREADPOOL_BUSY.set(("asyncio",), max(0, len(executor._threads) - executor._idle_semaphore._value))
+        THREADPOOL_SIZE.set(("asyncio",), executor._max_workers)
+        THREADPOOL_QUEUED.set(("asyncio",), queued)
+
+
+# ---------------------- EXPOSITION ------------------------ #
+def _snapshot() -> Dict[str, Dict[str, Any]]:
+    return {
+        m.name: {
+            "kind": m.kind,
+            "help": m.help,
+            "labelnames": list(m.labelnames),
+            "buckets": list(getattr(m, "buckets", ())),
+            "values": [[list(labels), value] for labels, value in m.values.items()],
+        }
+        for m in REGISTRY
+    }
+
+
+def write_snapshot():
+    """Publish this worker's values for the other workers' /metrics (multi-worker mode)."""
+    if METRICS_DIR is None:
+        return
+    path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(_snapshot(), f)
+    os.replace(tmp, path)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merged() -> Dict[str, Dict[str, Any]]:
+    """Combine every worker's snapshot file into one set of metric families."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for filename in os.listdir(METRICS_DIR):
+        if not filename.endswith(".json"):
+            continue
+        pid = filename[:-len(".json")]
+        try:
+            with open(os.path.join(METRICS_DIR, filename)) as f:
+                families = json.load(f)
+        except (OSError, ValueError):
+            continue
+        live = pid == str(os.getpid()) or (pid.isdigit() and _alive(int(pid)))
+        for name, family in families.items():
+            target = merged.setdefault(name, {**family, "values": {}})
+            if family["kind"] == GAUGE:
+                if not live:
+                    continue
+                target["labelnames"] = family["labelnames"] + ["worker"]
+                for labels, value in family["values"]:
+                    target["values"][tuple(labels) + (pid,)] = value
+                continue
+            for labels, value in family["values"]:
+                key = tuple(labels)
+                current = target["values"].get(key)
+                if current is None:
+                    target["values"][key] = value
+                elif family["kind"] == HISTOGRAM:
+                    target["values"][key] = [[a + b for a, b in zip(current[0], value[0])],
+                                             current[1] + value[1], current[2] + value[2]]
+                else:
+                    target["values"][key] = current + value
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _render_families(families: Dict[str, Dict[str, Any]]) -> str:
+    lines = []
+    for name, family in families.items():
+        kind, names = family["kind"], family["labelnames"]
+        values = family["values"]
+        items = values.items() if isinstance(values, dict) else ((tuple(k), v) for k, v in values)
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in items:
+            if kind != HISTOGRAM:
+                lines.append(f"{name}{_labels(names, labels)} {_format_value(value)}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, n in zip(list(family["buckets"]) + ["+Inf"], counts):
+                cumulative += n
+                le = bound if bound == "+Inf" else _format_value(bound)
+                bucket_labels = _labels(names, labels, f'le="{le}"')
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{_labels(names, labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_labels(names, labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def collect():
+    """Run the collectors (from the event loop thread)."""
+    for fn in _COLLECTORS:
+        fn()
+
+
+def render() -> str:
+    """Current metrics in the Prometheus text exposition format (version 0.0.4)."""
+    collect()
+    if METRICS_DIR is None:
+        return _render_families(_snapshot())
+    write_snapshot()
+    return _render_families(_merged())
+
+
+def clear_dir(path: str):
+    """Remove snapshot files left by a previous run (called by the supervisor before starting workers)."""
+    os.makedirs(path, exist_ok=True)
+    for filename in os.listdir(path):
+        if filename.endswith(".json") or filename.endswith(".json.tmp"):
+            os.remove(os.path.join(path, filename))
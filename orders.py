@@ -0,0 +1,156 @@
+"""
+Plutus - Pending Order Store
+Agent recommendations awaiting user confirmation, keyed by order_id with
+secondary indexes by symbol and user. Confirmation claims an order atomically
+(it leaves the pending set immediately), so two concurrent confirms cannot
+both execute it. Recommendations expire after PENDING_ORDER_TTL seconds.
+"""
+
+import bisect
+import itertools
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+PENDING_ORDER_TTL = float(os.environ.get("PENDING_ORDER_TTL", "3600"))
+
+
+class OrderClaimedError(Exception):
+    """The order is being confirmed by another request."""
+
+
+class PendingOrderStore:
+    """
+    In-memory pending orders. `_seqs` / `_ids` keep insertion order for cursor
+    pagination (cursor = sequence number) and for expiry, since all orders
+    share one TTL and therefore expire oldest first.
+    """
+
+    def __init__(self, ttl: float = PENDING_ORDER_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._counter = itertools.count(1)
+        self._orders: Dict[str, Dict[str, Any]] = {}
+        self._meta: Dict[str, Tuple[int, float]] = {}  # order_id -> (seq, expires_at)
+        self._seqs: List[int] = []
+        self._ids: List[str] = []
+        self._by_symbol: Dict[str, Dict[str, None]] = {}
+        self._by_user: Dict[str, Dict[str, None]] = {}
+        self._claimed: Dict[str, Tuple[Dict[str, Any], Tuple[int, float]]] = {}
+        self.expired = 0
+
+    def add(self, order: Dict[str, Any]) -> Dict[str, Any]:
+        """Store an order (needs order_id and symbol; user_id is optional)."""
+        expires_at = time.time() + self.ttl
+        order["expires_at"] = datetime.fromtimestamp(expires_at).isoformat()
+        with self._lock:
+            self._insert(order, (next(self._counter), expires_at))
+        return order
+
+    def _insert(self, order: Dict[str, Any], meta: Tuple[int, float]):
+        order_id = order["order_id"]
+        seq = meta[0]
+        self._orders[order_id] = order
+        self._meta[order_id] = meta
+        # Re-inserted (released) orders keep their original position
+        pos = bisect.bisect_left(self._seqs, seq)
+        self._seqs.insert(pos, seq)
+        self._ids.insert(pos, order_id)
+        self._by_symbol.setdefault(order["symbol"], {})[order_id] = None
+        self._by_user.setdefault(order.get("user_id") or "", {})[order_id] = None
+
+    def _remove(self, order_id: str) -> Tuple[Dict[str, Any], Tuple[int, float]]:
+        order = self._orders.pop(order_id)
+        meta = self._meta.pop(order_id)
+        pos = bisect.bisect_left(self._seqs, meta[0])
+        del self._seqs[pos]
+        del self._ids[pos]
+        for index, key in ((self._by_symbol, order["symbol"]), (self._by_user, order.get("user_id") or "")):
+            ids = index[key]
+            ids.pop(order_id, None)
+            if not ids:
+                del index[key]
+        return order, meta
+
+    def _purge_expired(self):
+        now = time.time()
+        while self._ids:
+            order_id = self._ids[0]
+            if self._meta[order_id][1] > now:
+                break
+            self._remove(order_id)
+            self.expired += 1
+
+    def get(self, order_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._purge_expired()
+            return self._orders.get(order_id)
+
+    def claim(self, order_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Atomically take an order out of the pending set. Returns None if it does
+        not exist (or expired); raises OrderClaimedError if another request holds it.
+        Follow with complete() or release().
+        """
+        with self._lock:
+            self._purge_expired()
+            if order_id in self._claimed:
+                raise OrderClaimedError(order_id)
+            if order_id not in self._orders:
+                return None
+            order, meta = self._remove(order_id)
+            self._claimed[order_id] = (order, meta)
+            return order
+
+    def complete(self, order_id: str):
+        """The claimed order was executed, acknowledged or rejected; forget it."""
+        with self._lock:
+            self._claimed.pop(order_id, None)
+
+    def release(self, order_id: str):
+        """Return a claimed order to the pending set (e.g. execution failed)."""
+        with self._lock:
+            claimed = self._claimed.pop(order_id, None)
+            if claimed is not None:
+                self._insert(*claimed)
+
+    def page(
+        self,
+        limit: int = 50,
+        after: Optional[int] = None,
+        symbol: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Oldest-first page of pending orders. Returns (orders, next_cursor)."""
+        with self._lock:
+            self._purge_expired()
+            if symbol is not None or user_id is not None:
+                candidates = None
+                if symbol is not None:
+                    candidates = self._by_symbol.get(symbol, {}).keys()
+                if user_id is not None:
+                    users = self._by_user.get(user_id, {}).keys()
+                    candidates = users if candidates is None else candidates & users
+                ids = sorted(candidates, key=lambda oid: self._meta[oid][0])
+                if after is not None:
+                    ids = [oid for oid in ids if self._meta[oid][0] > after]
+            else:
+                start = 0 if after is None else bisect.bisect_right(self._seqs, after)
+                ids = self._ids[start:start + limit + 1]
+            page = ids[:limit]
+            next_cursor = self._meta[page[-1]][0] if len(ids) > limit else None
+            return [self._orders[oid] for oid in page], next_cursor
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._orders),
+            "claimed": len(self._claimed),
+            "symbols": len(self._by_symbol),
+            "expired": self.expired,
+            "ttl_seconds": self.ttl,
+        }
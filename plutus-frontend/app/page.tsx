@@ -1,6 +1,6 @@
 'use client';
 
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useMemo } from 'react';
 import { AgentCard } from '@/components/AgentCard';
 import { api } from '@/utils/api';
 import Link from 'next/link';
@@ -22,42 +22,41 @@ export default function Dashboard() {
   const [loading, setLoading] = useState(false);
   const [auditLog, setAuditLog] = useState<any[]>([]);
   const [portfolioKey, setPortfolioKey] = useState(0);
-  const [portfolioStats, setPortfolioStats] = useState<PortfolioStats>({
-    totalValue: 0,
-    totalCost: 0,
-    dayChange: 0,
-    dayChangePct: 0
-  });
   const [statsLoading, setStatsLoading] = useState(true);
+  const [positions, setPositions] = useState<any[]>([]);
+
+  // Derived from positions, so refreshes and pushed quotes update it the same way
+  const portfolioStats = useMemo<PortfolioStats>(() => {
+    let totalValue = 0;
+    let totalCost = 0;
+    
+    positions.forEach((item: any) => {
+      const qty = parseFloat(item.qty) || 0;
+      const avgPrice = parseFloat(item.avg_entry_price || item.avg_price) || 0;
+      const marketValue = parseFloat(item.market_value) || 0;
+      const currentPrice = parseFloat(item.current_price) || (qty > 0 ? marketValue / qty : avgPrice);
+      
+      totalValue += marketValue || (qty * currentPrice);
+      totalCost += qty * avgPrice;
+    });
+    
+    const dayChange = totalValue - totalCost;
+    const dayChangePct = totalCost > 0 ? (dayChange / totalCost) * 100 : 0;
+    
+    return {
+      totalValue,
+      totalCost,
+      dayChange,
+      dayChangePct
+    };
+  }, [positions]);
 
   const fetchPortfolioStats = async () => {
     try {
       const data = await api.getPortfolio('user123');
       if (data) {
         const items = data.positions || data.holdings || [];
-        
-        let totalValue = 0;
-        let totalCost = 0;
-        
-        items.forEach((item: any) => {
-          const qty = parseFloat(item.qty) || 0;
-          const avgPrice = parseFloat(item.avg_entry_price || item.avg_price) || 0;
-          const marketValue = parseFloat(item.market_value) || 0;
-          const currentPrice = parseFloat(item.current_price) || (qty > 0 ? marketValue / qty : avgPrice);
-          
-          totalValue += marketValue || (qty * currentPrice);
-          totalCost += qty * avgPrice;
-        });
-        
-        const dayChange = totalValue - totalCost;
-        const dayChangePct = totalCost > 0 ? (dayChange / totalCost) * 100 : 0;
-        
-        setPortfolioStats({
-          totalValue,
-          totalCost,
-          dayChange,
-          dayChangePct
-        });
+        setPositions(items);
       }
     } catch (e) {
       console.error("Failed to fetch portfolio stats", e);
@@ -145,10 +144,23 @@ export default function Dashboard() {
 
   useEffect(() => {
     refreshData();
-    const interval = setInterval(refreshData, 10000);
+    // Prices are pushed over the WebSocket below; this only reconciles orders, audit and holdings
+    const interval = setInterval(refreshData, 60000);
     return () => clearInterval(interval);
   }, []);
 
+  const positionSymbols = positions.map((p: any) => p.symbol).filter(Boolean).sort().join(',');
+
+  useEffect(() => {
+    if (!positionSymbols) return;
+    return api.subscribePrices(positionSymbols.split(','), (quote: any) => {
+      if (quote.price === undefined) return;
+      setPositions(prev => prev.map((item: any) => item.symbol === quote.symbol
+        ? { ...item, current_price: quote.price, market_value: (parseFloat(item.qty) || 0) * quote.price }
+        : item));
+    });
+  }, [positionSymbols]);
+
   const formatCurrency = (value: number) => {
     return new Intl.NumberFormat('en-US', {
       style: 'currency',
@@ -1,6 +1,6 @@
 'use client';
 
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import { api } from '@/utils/api';
 
 interface Stock {
@@ -15,6 +15,12 @@ interface Stock {
     description?: string;
 }
 
+interface Suggestion {
+    symbol: string;
+    name: string;
+    score: number;
+}
+
 export function SearchPane({ onBuyComplete }: { onBuyComplete: () => void }) {
     const [query, setQuery] = useState('');
     const [results, setResults] = useState<Stock[]>([]);
@@ -23,6 +29,20 @@ export function SearchPane({ onBuyComplete }: { onBuyComplete: () => void }) {
     const [loading, setLoading] = useState(false);
     const [buying, setBuying] = useState(false);
     const [error, setError] = useState<string | null>(null);
+    const [suggestions, setSuggestions] = useState<Suggestion[]>([]);
+
+    // Typeahead: local symbol index on the backend, debounced per keystroke
+    useEffect(() => {
+        const q = query.trim();
+        if (!q || selectedStock) {
+            setSuggestions([]);
+            return;
+        }
+        const timer = setTimeout(async () => {
+            setSuggestions(await api.suggestTickers(q, 6));
+        }, 150);
+        return () => clearTimeout(timer);
+    }, [query, selectedStock]);
 
     const handleSearch = async (e: React.FormEvent) => {
         e.preventDefault();
@@ -30,6 +50,7 @@ export function SearchPane({ onBuyComplete }: { onBuyComplete: () => void }) {
 
         setLoading(true);
         setSelectedStock(null);
+        setSuggestions([]);
         setError(null);
         try {
             const data = await api.searchStocks(query);
@@ -43,6 +64,7 @@ export function SearchPane({ onBuyComplete }: { onBuyComplete: () => void }) {
     };
 
     const handleSelect = async (ticker: string) => {
+        setSuggestions([]);
         setLoading(true);
         setError(null);
         try {
@@ -131,8 +153,24 @@ export function SearchPane({ onBuyComplete }: { onBuyComplete: () => void }) {
                 </button>
             </form>
 
+            {/* Typeahead Suggestions */}
+            {suggestions.length > 0 && results.length === 0 && (
+                <div className="border border-gray-100 rounded-lg divide-y divide-gray-100 mb-4 -mt-2">
+                    {suggestions.map((s) => (
+                        <div
+                            key={s.symbol}
+                            onClick={() => handleSelect(s.symbol)}
+                            className="px-4 py-2 hover:bg-gray-50 cursor-pointer flex justify-between items-center text-sm"
+                        >
+                            <span className="font-bold text-gray-900">{s.symbol}</span>
+                            <span className="text-gray-500 truncate ml-4">{s.name}</span>
+                        </div>
+                    ))}
+                </div>
+            )}
+
             {/* No Results Message */}
-            {!loading && !selectedStock && results.length === 0 && query.trim() !== '' && (
+            {!loading && !selectedStock && results.length === 0 && suggestions.length === 0 && query.trim() !== '' && (
                 <div className="border border-gray-100 rounded-lg p-8 text-center bg-gray-50">
                     <div className="text-gray-400 text-4xl mb-2">🔍</div>
                     <p className="text-gray-600 font-medium">No results found</p>
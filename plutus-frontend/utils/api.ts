@@ -47,6 +47,50 @@ export const api = {
         }
     },
 
+    // ---------------------- Typeahead Suggestions ----------------------
+    suggestTickers: async (query: string, limit: number = 8) => {
+        try {
+            const res = await fetch(`${API_BASE}/search/suggest?q=${encodeURIComponent(query)}&limit=${limit}`);
+            if (!res.ok) throw new Error('Suggest failed');
+            const data = await res.json();
+            return data.results || [];
+        } catch (error) {
+            console.error('suggestTickers error:', error);
+            return [];
+        }
+    },
+
+    // ---------------------- Live Prices (WebSocket) ----------------------
+    // Returns an unsubscribe function. Quote messages only carry changed fields.
+    subscribePrices: (symbols: string[], onQuote: (quote: any) => void) => {
+        let socket: WebSocket | null = null;
+        let closed = false;
+        let retryTimer: ReturnType<typeof setTimeout> | undefined;
+
+        const connect = () => {
+            socket = new WebSocket(`${API_BASE.replace(/^http/, 'ws')}/ws/prices`);
+            socket.onopen = () => socket?.send(JSON.stringify({ action: 'subscribe', symbols }));
+            socket.onmessage = (event) => {
+                try {
+                    const message = JSON.parse(event.data);
+                    if (message.type === 'quote') onQuote(message);
+                } catch (error) {
+                    console.error('subscribePrices message error:', error);
+                }
+            };
+            socket.onclose = () => {
+                if (!closed) retryTimer = setTimeout(connect, 3000);
+            };
+        };
+
+        if (symbols.length > 0) connect();
+        return () => {
+            closed = true;
+            clearTimeout(retryTimer);
+            socket?.close();
+        };
+    },
+
     // ---------------------- Stock Details ----------------------
     getStockDetails: async (ticker: string) => {
         try {
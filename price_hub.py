@@ -0,0 +1,243 @@
+"""
+Plutus - Price Streaming Hub
+Server-side subscription hub for the /api/ws/prices WebSocket. Every symbol
+subscribed by any client is polled by one shared loop, with one batch snapshot
+request per interval (per batch of symbols) instead of a request per symbol;
+clients only receive fields that changed, and slow clients get coalesced
+updates instead of an ever-growing queue.
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from fastapi import WebSocket
+
+QUOTE_POLL_INTERVAL = float(os.environ.get("QUOTE_POLL_INTERVAL", "2"))
+WS_SEND_TIMEOUT = float(os.environ.get("WS_SEND_TIMEOUT", "10"))
+WS_MAX_SYMBOLS = int(os.environ.get("WS_MAX_SYMBOLS", "200"))
+# Distinct symbols streamed across all clients; 0 derives the cap from the upstream rate budget (feed_limit)
+WS_MAX_FEEDS = int(os.environ.get("WS_MAX_FEEDS", "0"))
+# Share of the upstream request budget that price polling may use, leaving the rest for API requests
+QUOTE_RATE_SHARE = float(os.environ.get("QUOTE_RATE_SHARE", "0.25"))
+
+# fetch_quotes(symbols) -> ({symbol: quote}, {symbol: error})
+QuoteFetcher = Callable[[List[str]], Awaitable[Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]]]
+
+
+def feed_limit(per_minute: Optional[float], batch_size: int, interval: float = QUOTE_POLL_INTERVAL,
+               share: float = QUOTE_RATE_SHARE) -> int:
+    """
+    Symbols that can be polled every `interval` seconds, `batch_size` per request,
+    within `share` of a per-minute request budget (None: not rate limited). At
+    least one batch is always allowed; the rate limiter still paces it.
+    """
+    if WS_MAX_FEEDS > 0:
+        return WS_MAX_FEEDS
+    if not per_minute:
+        return batch_size * 10
+    requests_per_poll = per_minute * share * interval / 60.0
+    return max(1, int(requests_per_poll)) * batch_size
+
+
+class PriceSubscriber:
+    """
+    One connected client. Pending updates are merged per symbol, so a client
+    that cannot keep up sees the latest values rather than a backlog.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.symbols: Set[str] = set()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._control: list = []
+        self._wakeup = asyncio.Event()
+        self.dropped = 0
+
+    def send_control(self, message: Dict[str, Any]):
+        """Queue a non-quote message; all socket writes go through run_sender."""
+        self._control.append(message)
+        self._wakeup.set()
+
+    def offer(self, symbol: str, changes: Dict[str, Any]):
+        if symbol in self._pending:
+            self.dropped += 1  # superseded before it was sent
+            self._pending[symbol].update(changes)
+        else:
+            self._pending[symbol] = dict(changes)
+        self._wakeup.set()
+
+    async def run_sender(self):
+        """Drain pending updates to the socket; a send stalled past WS_SEND_TIMEOUT ends the session."""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            control, self._control = self._control, []
+            for message in control:
+                await asyncio.wait_for(self.websocket.send_json(message), WS_SEND_TIMEOUT)
+            pending, self._pending = self._pending, {}
+            for symbol, changes in pending.items():
+                message = {"type": "quote", "symbol": symbol, **changes}
+                await asyncio.wait_for(self.websocket.send_json(message), WS_SEND_TIMEOUT)
+
+
+class PriceHub:
+    """Polls every symbol any client subscribed to in one loop and fans quotes out to the watchers."""
+
+    def __init__(self, fetch_quotes: QuoteFetcher, max_feeds: int, interval: float = QUOTE_POLL_INTERVAL,
+                 is_valid: Optional[Callable[[str], bool]] = None):
+        self.fetch_quotes = fetch_quotes
+        self.interval = interval
+        self.max_feeds = max_feeds
+        self.is_valid = is_valid
+        self._subscribers: Dict[str, Set[PriceSubscriber]] = {}
+        self._poller: Optional[asyncio.Task] = None
+        self._last: Dict[str, Dict[str, Any]] = {}
+        self._errors: Dict[str, str] = {}  # symbol (or "*" for the whole poll) -> last error reported
+        self.polls = 0
+        self.rejected = 0
+
+    def subscribe(self, subscriber: PriceSubscriber, symbol: str):
+        if self.is_valid is not None and symbol not in self._subscribers and not self.is_valid(symbol):
+            self.rejected += 1
+            raise ValueError(f"Unknown symbol: {symbol}")
+        if len(subscriber.symbols) >= WS_MAX_SYMBOLS and symbol not in subscriber.symbols:
+            raise ValueError(f"Subscription limit of {WS_MAX_SYMBOLS} symbols reached")
+        if symbol not in self._subscribers and len(self._subscribers) >= self.max_feeds:
+            raise ValueError(f"Server is streaming the maximum of {self.max_feeds} symbols; try again later")
+        subscriber.symbols.add(symbol)
+        self._subscribers.setdefault(symbol, set()).add(subscriber)
+        if symbol in self._last:
+            subscriber.offer(symbol, self._last[symbol])  # full current state for late joiners
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll())
+
+    def unsubscribe(self, subscriber: PriceSubscriber, symbol: str):
+        subscriber.symbols.discard(symbol)
+        watchers = self._subscribers.get(symbol)
+        if watchers is None:
+            return
+        watchers.discard(subscriber)
+        if not watchers:
+            del self._subscribers[symbol]
+            self._last.pop(symbol, None)
+            self._errors.pop(symbol, None)
+
+    def disconnect(self, subscriber: PriceSubscriber):
+        for symbol in list(subscriber.symbols):
+            self.unsubscribe(subscriber, symbol)
+
+    async def _poll(self):
+        """Fetch every subscribed symbol once per interval; stops when nobody is subscribed."""
+        while self._subscribers:
+            await self.poll_once()
+            await asyncio.sleep(self.interval)
+
+    async def poll_once(self):
+        symbols = sorted(self._subscribers)
+        try:
+            quotes, errors = await self.fetch_quotes(symbols)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._report("*", str(e))
+            return
+        self.polls += 1
+        self._errors.pop("*", None)
+        for symbol in symbols:
+            if symbol in quotes:
+                self._errors.pop(symbol, None)
+                self.publish(symbol, quotes[symbol])
+            elif symbol in errors:
+                self._report(symbol, errors[symbol])
+
+    def _report(self, symbol: str, error: str):
+        """Print an error once, not on every poll while it persists."""
+        if self._errors.get(symbol) != error:
+            self._errors[symbol] = error
+            print(f"Price feed error for {'all symbols' if symbol == '*' else symbol}: {error}")
+
+    def publish(self, symbol: str, quote: Dict[str, Any]):
+        last = self._last.get(symbol, {})
+        changes = {k: v for k, v in quote.items() if last.get(k) != v}
+        if not changes:
+            return
+        self._last[symbol] = {**last, **quote}
+        for subscriber in self._subscribers.get(symbol, ()):
+            subscriber.offer(symbol, changes)
+
+    async def close(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+
+    def stats(self) -> Dict[str, Any]:
+        clients: Set[PriceSubscriber] = set()
+        for watchers in self._subscribers.values():
+            clients |= watchers
+        return {
+            "symbols": len(self._subscribers),
+            "max_symbols": self.max_feeds,
+            "clients": len(clients),
+            "poll_interval_seconds": self.interval,
+            "polls": self.polls,
+            "rejected_symbols": self.rejected,
+            "failing_symbols": sorted(s for s in self._errors if s != "*"),
+        }
+
+
+async def serve_client(hub: PriceHub, websocket: WebSocket, normalize: Optional[Callable[[str], str]] = None):
+    """
+    WebSocket session. Client messages:
+        {"action": "subscribe", "symbols": ["AAPL", ...]}
+        {"action": "unsubscribe", "symbols": [...]}
+    Server messages: {"type": "quote", "symbol": ..., <changed fields>},
+    {"type": "subscribed", "symbols": [...]}, {"type": "error", "detail": ...}.
+    """
+    await websocket.accept()
+    subscriber = PriceSubscriber(websocket)
+    sender = asyncio.create_task(subscriber.run_sender())
+    receiver = asyncio.create_task(_receive_commands(hub, subscriber, normalize or str.upper))
+    try:
+        # Whichever ends first (client closed, or a send stalled/failed) ends the session
+        done, _ = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.exception()  # disconnects and send timeouts are expected here
+    finally:
+        sender.cancel()
+        receiver.cancel()
+        hub.disconnect(subscriber)
+
+
+async def _receive_commands(hub: PriceHub, subscriber: PriceSubscriber, normalize: Callable[[str], str]):
+    websocket = subscriber.websocket
+    while True:
+        try:
+            message = await websocket.receive_json()
+        except ValueError:
+            subscriber.send_control({"type": "error", "detail": "Messages must be JSON"})
+            continue
+        if not isinstance(message, dict):
+            message = {}
+        action = message.get("action")
+        symbols = message.get("symbols") or []
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        requested = [normalize(s.strip()) for s in symbols if isinstance(s, str) and s.strip()]
+        if action == "subscribe":
+            errors = []
+            for symbol in requested:  # an unknown symbol does not stop the rest of the request
+                try:
+                    hub.subscribe(subscriber, symbol)
+                except ValueError as e:
+                    if str(e) not in errors:
+                        errors.append(str(e))
+            for detail in errors:
+                subscriber.send_control({"type": "error", "detail": detail})
+            subscriber.send_control({"type": "subscribed", "symbols": sorted(subscriber.symbols)})
+        elif action == "unsubscribe":
+            for symbol in requested:
+                hub.unsubscribe(subscriber, symbol)
+            subscriber.send_control({"type": "subscribed", "symbols": sorted(subscriber.symbols)})
+        else:
+            subscriber.send_control({"type": "error", "detail": "Unknown action; use subscribe or unsubscribe"})
@@ -0,0 +1,156 @@
+"""
+Plutus - Prompt Compaction
+Shrinks the market snapshot and news payload sent to the LLM: keeps only the
+fields the analysis uses, drops near-duplicate headlines, ranks articles by
+recency and relevance, and trims the result to a token budget.
+"""
+
+import json
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+PROMPT_MAX_ARTICLES = int(os.environ.get("PROMPT_MAX_ARTICLES", "15"))
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", "3000"))
+PROMPT_SUMMARY_CHARS = int(os.environ.get("PROMPT_SUMMARY_CHARS", "280"))
+
+# Headlines sharing at least this fraction of words are treated as duplicates
+DUPLICATE_SIMILARITY = 0.8
+
+# Snapshot fields kept for the prompt: section -> {source key: prompt key}
+MARKET_FIELDS = {
+    "latestTrade": {"p": "price", "t": "time"},
+    "latestQuote": {"bp": "bid", "ap": "ask"},
+    "dailyBar": {"o": "open", "h": "high", "l": "low", "c": "close", "v": "volume"},
+    "prevDailyBar": {"c": "close", "v": "volume"},
+    "minuteBar": {"c": "close"},
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English/JSON)."""
+    return (len(text) + 3) // 4
+
+
+def compact_json(data: Any) -> str:
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def compact_market_data(snapshot: dict) -> dict:
+    """Keep only the snapshot fields the analysis uses, under readable names."""
+    compact = {}
+    for section, fields in MARKET_FIELDS.items():
+        source = snapshot.get(section)
+        if not isinstance(source, dict):
+            continue
+        values = {name: source[key] for key, name in fields.items() if key in source}
+        if values:
+            compact[section] = values
+    return compact
+
+
+def _headline_words(headline: str) -> frozenset:
+    return frozenset(re.findall(r"[a-z0-9]+", headline.lower()))
+
+
+def _is_duplicate(words: frozenset, seen: List[frozenset]) -> bool:
+    for other in seen:
+        union = len(words | other)
+        if union and len(words & other) / union >= DUPLICATE_SIMILARITY:
+            return True
+    return False
+
+
+def _relevance(article: dict, ticker: Optional[str], now: float) -> float:
+    """Higher is better: recent, specific to the ticker, and with a summary."""
+    age_hours = max(0.0, (now - float(article.get("datetime") or 0)) / 3600)
+    score = 1.0 / (1.0 + age_hours / 24)
+    if ticker:
+        related = [r.strip() for r in str(article.get("related") or "").split(",") if r.strip()]
+        if related == [ticker]:
+            score += 0.5
+        if re.search(rf"\b{re.escape(ticker)}\b", article.get("headline") or ""):
+            score += 0.5
+    if article.get("summary"):
+        score += 0.1
+    return score
+
+
+def _compact_article(article: dict, summary_chars: int) -> dict:
+    summary = (article.get("summary") or "").strip()
+    if len(summary) > summary_chars:
+        summary = summary[:summary_chars].rsplit(" ", 1)[0] + "..."
+    published = article.get("datetime")
+    return {
+        "headline": (article.get("headline") or "").strip(),
+        "summary": summary,
+        "source": article.get("source"),
+        "date": time.strftime("%Y-%m-%d", time.gmtime(published)) if published else None,
+    }
+
+
+def compact_news(
+    articles: list,
+    ticker: Optional[str] = None,
+    max_articles: int = PROMPT_MAX_ARTICLES,
+    summary_chars: int = PROMPT_SUMMARY_CHARS,
+) -> Tuple[List[dict], int]:
+    """Deduplicate, rank and strip articles. Returns (articles, duplicates_dropped)."""
+    now = time.time()
+    ranked = sorted(
+        (a for a in articles if isinstance(a, dict) and a.get("headline")),
+        key=lambda a: _relevance(a, ticker, now),
+        reverse=True,
+    )
+    kept, seen, duplicates = [], [], 0
+    for article in ranked:
+        words = _headline_words(article["headline"])
+        if _is_duplicate(words, seen):
+            duplicates += 1
+            continue
+        seen.append(words)
+        kept.append(_compact_article(article, summary_chars))
+        if len(kept) >= max_articles:
+            break
+    return kept, duplicates
+
+
+def build_prompt_payload(
+    market_data: dict,
+    news_data: list,
+    ticker: Optional[str] = None,
+    token_budget: int = PROMPT_TOKEN_BUDGET,
+) -> Tuple[str, str, Dict[str, Any]]:
+    """
+    Compact market data and news for the prompt within a token budget.
+    Returns (market_json, news_json, report) where report lists tokens saved.
+    """
+    original_tokens = estimate_tokens(json.dumps(market_data, indent=2)) + \
+        estimate_tokens(json.dumps(news_data, indent=2))
+
+    market_json = compact_json(compact_market_data(market_data))
+    news, duplicates = compact_news(news_data or [], ticker)
+
+    # Enforce the budget: drop the lowest-ranked articles, then shorten summaries
+    news_budget = max(0, token_budget - estimate_tokens(market_json))
+    news_json = compact_json(news)
+    while news and estimate_tokens(news_json) > news_budget:
+        if len(news) > 1:
+            news.pop()
+        elif news[0]["summary"]:
+            news[0]["summary"] = ""
+        else:
+            news.pop()
+        news_json = compact_json(news)
+
+    compacted_tokens = estimate_tokens(market_json) + estimate_tokens(news_json)
+    report = {
+        "original_tokens": original_tokens,
+        "compacted_tokens": compacted_tokens,
+        "tokens_saved": max(0, original_tokens - compacted_tokens),
+        "articles_in": len(news_data or []),
+        "duplicates_dropped": duplicates,
+        "articles_kept": len(news),
+    }
+    return market_json, news_json, report
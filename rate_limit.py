@@ -0,0 +1,171 @@
+"""
+Plutus - Upstream Rate Limiting
+Token-bucket limiter per upstream credential with a priority queue: when the
+bucket is empty, waiting requests are granted strictly by priority (trade >
+interactive > background), oldest first within a level. The priority of the
+current request is carried in a contextvar, so endpoints set it once and every
+upstream call they trigger (including tasks they spawn) inherits it.
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+TRADE = 0
+INTERACTIVE = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {TRADE: "trade", INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("upstream_priority", default=INTERACTIVE)
+
+# Upstreams sharing an API key share a limiter
+CREDENTIALS = {
+    "alpaca_data": "alpaca",
+    "alpaca_trading": "alpaca",
+    "finnhub": "finnhub",
+    "deepseek": "deepseek",
+}
+
+# Requests per minute and burst size per credential; a rate of 0 disables limiting.
+# Alpaca allows 200/min per account, Finnhub's free tier 60/min.
+RATE_LIMITS = {
+    "alpaca": (float(os.environ.get("ALPACA_RATE_LIMIT", "200")), int(os.environ.get("ALPACA_RATE_BURST", "20"))),
+    "finnhub": (float(os.environ.get("FINNHUB_RATE_LIMIT", "60")), int(os.environ.get("FINNHUB_RATE_BURST", "10"))),
+    "deepseek": (float(os.environ.get("DEEPSEEK_RATE_LIMIT", "0")), int(os.environ.get("DEEPSEEK_RATE_BURST", "10"))),
+}
+
+# Every worker process has its own buckets, so each gets an equal share of the limit
+WORKER_COUNT = max(1, int(os.environ.get("WEB_CONCURRENCY", "1")))
+
+# How often a request rejected with 429 is queued again before the error is raised
+RATE_LIMIT_MAX_RETRIES = int(os.environ.get("RATE_LIMIT_MAX_RETRIES", "2"))
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+@contextmanager
+def priority(level: int):
+    """Run upstream calls made inside the block (and tasks created in it) at this priority."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def set_priority(level: int):
+    """Set the priority for the rest of the current task (e.g. at the top of an endpoint)."""
+    _priority.set(level)
+
+
+class RateLimiter:
+    """Token bucket (`rate` tokens per second, up to `burst`) with a priority wait queue."""
+
+    def __init__(self, name: str, per_minute: float, burst: int):
+        self.name = name
+        self.rate = per_minute / 60.0
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.granted = {level: 0 for level in PRIORITY_NAMES}
+        self.waited = 0
+        self.throttled = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        if now > self._paused_until:
+            start = max(self._updated, self._paused_until)
+            self._tokens = min(self.burst, self._tokens + (now - start) * self.rate)
+        self._updated = now
+
+    async def acquire(self, level: Optional[int] = None):
+        """Wait for a token. Takes one immediately if available and nobody is queued."""
+        level = current_priority() if level is None else level
+        self._refill()
+        if not self._waiters and self._tokens >= 1:
+            self._tokens -= 1
+            self.granted[level] += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (level, next(self._seq), future))
+        self.waited += 1
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future  # a cancelled waiter is skipped by the dispatcher
+        self.granted[level] += 1
+
+    async def _dispatch(self):
+        """Hand out tokens to queued waiters, highest priority first, as the bucket refills."""
+        while self._waiters:
+            self._refill()
+            while self._waiters and self._tokens >= 1:
+                _, _, future = heapq.heappop(self._waiters)
+                if not future.done():
+                    self._tokens -= 1
+                    future.set_result(None)
+            if not self._waiters:
+                return
+            now = time.monotonic()
+            delay = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            await asyncio.sleep(max(delay, 0.001))
+
+    def penalize(self, retry_after: float):
+        """Upstream answered 429: empty the bucket and stop granting for retry_after seconds."""
+        self.throttled += 1
+        self._tokens = 0.0
+        self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        self._updated = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill()
+        queued = {name: 0 for name in PRIORITY_NAMES.values()}
+        for level, _, future in self._waiters:
+            if not future.done():
+                queued[PRIORITY_NAMES[level]] += 1
+        return {
+            "credential": self.name,
+            "per_minute": round(self.rate * 60, 2),
+            "burst": self.burst,
+            "tokens": round(self._tokens, 2),
+            "queued": queued,
+            "granted": {PRIORITY_NAMES[level]: n for level, n in self.granted.items()},
+            "waited": self.waited,
+            "throttled_429": self.throttled,
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 2),
+        }
+
+
+# ---------------------- LIMITER REGISTRY ------------------------ #
+_LIMITERS: Dict[str, RateLimiter] = {}
+
+
+def get_limiter(upstream: str) -> Optional[RateLimiter]:
+    """Shared limiter for an upstream's credential, or None if it is not rate limited."""
+    credential = CREDENTIALS.get(upstream, upstream)
+    limiter = _LIMITERS.get(credential)
+    if limiter is None:
+        per_minute, burst = RATE_LIMITS.get(credential, (0.0, 1))
+        if per_minute <= 0:
+            return None
+        limiter = RateLimiter(credential, per_minute / WORKER_COUNT, max(1, burst // WORKER_COUNT))
+        _LIMITERS[credential] = limiter
+    return limiter
+
+
+def retry_after_seconds(value: Optional[str], default: float = 1.0) -> float:
+    """Parse a Retry-After header given in seconds; fall back to default."""
+    try:
+        return max(0.0, float(value)) if value else default
+    except ValueError:
+        return default
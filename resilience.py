@@ -0,0 +1,239 @@
+"""
+Plutus - Upstream Resilience
+Per-upstream circuit breaker, retries with exponential backoff and full jitter
+for idempotent GETs (connection errors and 502/503/504 only, within one
+overall deadline), and optional hedged GETs: if a request is still running
+after the upstream's recent p95 latency, a second copy is sent and whichever
+answers first wins. While a circuit is open, calls fail immediately with
+CircuitOpenError so callers can fall back to cached or degraded responses.
+"""
+
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.environ.get("BREAKER_RESET_TIMEOUT", "30"))
+RETRY_MAX_ATTEMPTS = int(os.environ.get("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.environ.get("RETRY_BASE_DELAY", "0.2"))
+RETRY_MAX_DELAY = float(os.environ.get("RETRY_MAX_DELAY", "2"))
+HEDGE_ENABLED = os.environ.get("HEDGE_ENABLED", "0") in ("1", "true", "True")
+HEDGE_MIN_SAMPLES = 20
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+RETRYABLE_STATUS = {502, 503, 504}
+
+
+class CircuitOpenError(httpx.TransportError):
+    """The upstream's circuit is open; the request was not sent."""
+
+
+def is_failure(exc: BaseException) -> bool:
+    """Errors that say the upstream is unhealthy (not the caller's fault)."""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """The request never reached the upstream, or the upstream says to try again."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_STATUS
+    return isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout))
+
+
+def is_upstream_outage(exc: BaseException) -> bool:
+    """The upstream could not serve the request (circuit open, unreachable or 5xx): worth a fallback."""
+    return isinstance(exc, CircuitOpenError) or is_failure(exc)
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures. After `reset_timeout` one trial
+    request is let through (half-open): success closes the circuit, failure reopens it.
+    """
+
+    def __init__(self, name: str, threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a request may be sent now."""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self._trial_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(f"{self.name} circuit is half-open; trial request in flight")
+            self._trial_in_flight = True
+
+    def record_success(self):
+        self._trial_in_flight = False
+        self.state = CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self._trial_in_flight = False
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.threshold:
+            if self.state != OPEN:
+                self.times_opened += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def abandon(self):
+        """The call was cancelled before it finished; let another request be the trial."""
+        self._trial_in_flight = False
+
+    def record_neutral(self):
+        """The call ended without telling us anything about upstream health (e.g. a 4xx)."""
+        self._trial_in_flight = False
+        if self.state == HALF_OPEN:
+            self.state = CLOSED
+            self.failures = 0
+
+    def stats(self) -> Dict[str, Any]:
+        retry_in = 0.0
+        if self.state == OPEN:
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "retry_in": round(retry_in, 2),
+        }
+
+
+class LatencyTracker:
+    """Recent successful request durations for one upstream."""
+
+    def __init__(self, size: int = 200):
+        self._samples: deque = deque(maxlen=size)
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if len(self._samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Resilience:
+    """Breaker, latency history and retry/hedge policy for one upstream."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.breaker = CircuitBreaker(name)
+        self.latency = LatencyTracker()
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    async def call(self, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        """One attempt through the breaker; `send` must raise on HTTP errors."""
+        self.breaker.before_call()
+        start = time.perf_counter()
+        try:
+            response = await send()
+        except asyncio.CancelledError:
+            self.breaker.abandon()
+            raise
+        except Exception as e:
+            if is_failure(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_neutral()
+            raise
+        self.breaker.record_success()
+        self.latency.observe(time.perf_counter() - start)
+        return response
+
+    async def call_idempotent(self, send: Callable[[float], Awaitable[httpx.Response]],
+                              deadline: float) -> httpx.Response:
+        """
+        call() with hedging and jittered exponential backoff between attempts.
+        `send(timeout)` makes one attempt within `timeout` seconds: all attempts
+        and backoff together stay within `deadline`. Only errors where the
+        upstream cannot have done the work are retried: a connection that
+        failed, or 502/503/504. A read timeout is not retried; it already used
+        a whole timeout's worth of the caller's time.
+        """
+        loop = asyncio.get_running_loop()
+        expires = loop.time() + deadline
+
+        def attempt_send() -> Awaitable[httpx.Response]:
+            return send(max(0.001, expires - loop.time()))
+
+        for attempt in range(RETRY_MAX_ATTEMPTS):
+            try:
+                return await self._hedged(attempt_send)
+            except Exception as e:
+                if not is_retryable(e) or attempt == RETRY_MAX_ATTEMPTS - 1:
+                    raise
+                delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+                if loop.time() + delay >= expires:
+                    raise
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    async def _hedged(self, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        delay = self.latency.percentile(95) if HEDGE_ENABLED else None
+        if delay is None:
+            return await self.call(send)
+        first = asyncio.create_task(self.call(send))
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done or self.breaker.state != CLOSED:
+                return await first
+            second = asyncio.create_task(self.call(send))
+            self.hedges += 1
+            pending = {first, second}
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.latency.percentile(95)
+        return {
+            "circuit": self.breaker.stats(),
+            "retries": self.retries,
+            "hedging": HEDGE_ENABLED,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
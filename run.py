@@ -14,6 +14,7 @@ from pathlib import Path
 
 # Configuration
 BACKEND_PORT = 8000
+BACKEND_WORKERS = int(os.environ.get("WEB_CONCURRENCY", "1"))
 FRONTEND_PORT = 3000
 FRONTEND_DIR = "plutus-frontend"
 
@@ -26,7 +27,7 @@ def print_banner():
     print("=" * 60)
     print("  PLUTUS - AI-Powered Stock Trading Agent")
     print("=" * 60)
-    print(f"  Backend:  http://localhost:{BACKEND_PORT}")
+    print(f"  Backend:  http://localhost:{BACKEND_PORT} ({BACKEND_WORKERS} worker{'s' if BACKEND_WORKERS != 1 else ''})")
     print(f"  Frontend: http://localhost:{FRONTEND_PORT}")
     print(f"  API Docs: http://localhost:{BACKEND_PORT}/docs")
     print("=" * 60)
@@ -56,8 +57,8 @@ def cleanup(signum=None, frame=None):
     sys.exit(0)
 
 
-def start_backend():
-    """Start the FastAPI backend server."""
+def start_backend(workers=BACKEND_WORKERS):
+    """Start the FastAPI backend server (workers > 1 runs it under the multi-process supervisor)."""
     print("[Backend] Starting FastAPI server...")
     
     # Check if server.py exists
@@ -68,14 +69,14 @@ def start_backend():
     try:
         if platform.system() == "Windows":
             proc = subprocess.Popen(
-                [sys.executable, "server.py"],
+                [sys.executable, "serve.py", "--workers", str(workers)],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
                 creationflags=subprocess.CREATE_NEW_PROCESS_GROUP
             )
         else:
             proc = subprocess.Popen(
-                [sys.executable, "server.py"],
+                [sys.executable, "serve.py", "--workers", str(workers)],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
                 preexec_fn=os.setsid
@@ -226,7 +227,11 @@ def check_requirements():
 
 
 def main():
-    """Main entry point."""
+    """Main entry point. Usage: python run.py [--workers N]"""
+    global BACKEND_WORKERS
+    if "--workers" in sys.argv:
+        BACKEND_WORKERS = int(sys.argv[sys.argv.index("--workers") + 1])
+    
     # Register signal handlers
     signal.signal(signal.SIGINT, cleanup)
     signal.signal(signal.SIGTERM, cleanup)
@@ -239,7 +244,7 @@ def main():
         sys.exit(1)
     
     # Start services
-    backend = start_backend()
+    backend = start_backend(BACKEND_WORKERS)
     if not backend:
         print("\nFailed to start backend. Exiting.")
         sys.exit(1)
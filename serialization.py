@@ -0,0 +1,59 @@
+"""
+Plutus - Fast Response Serialization
+JSON encoding for list endpoints that return many rows. Records that come from
+our own storage (or were just converted field by field) are encoded directly,
+skipping pydantic model construction and FastAPI's response_model validation.
+Uses orjson when installed, else the standard library encoder with the same
+output. Very large result sets can be streamed as NDJSON (one record per line).
+"""
+
+import json
+import os
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Iterable, Sequence
+
+from starlette.responses import Response, StreamingResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+FAST_SERIALIZATION = os.environ.get("FAST_SERIALIZATION", "1") in ("1", "true", "True")
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON, as FastAPI's JSONResponse renders it (datetimes in ISO format)."""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default)
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default).encode()
+
+
+def records(fields: Sequence[str], rows: Iterable[Sequence[Any]]) -> list:
+    """Row tuples (values in `fields` order) as dicts."""
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def ndjson(fields: Sequence[str], rows: Iterable[Sequence[Any]]) -> bytes:
+    """Row tuples as NDJSON lines."""
+    return b"".join(dumps(dict(zip(fields, row))) + b"\n" for row in rows)
+
+
+class FastJSONResponse(Response):
+    """JSONResponse rendered with dumps(); return it from an endpoint to bypass response_model validation."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def ndjson_response(chunks: AsyncIterator[bytes], headers: dict = None) -> StreamingResponse:
+    return StreamingResponse(chunks, media_type=NDJSON_MEDIA_TYPE, headers=headers)
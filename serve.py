@@ -0,0 +1,51 @@
+"""
+Plutus - Server Entry Point
+Command line for running the API: `python serve.py [--workers N]`. The app is
+imported by uvicorn as "server:app", never as __main__, so this module has no
+startup side effects. That matters with the spawn start method: every worker
+process (supervisor.py) and audit verifier process re-imports the parent's
+__main__ module, and importing server.py there would repeat its setup.
+"""
+
+import argparse
+import os
+import tempfile
+
+import uvicorn
+
+import metrics
+import supervisor
+
+APP = "server:app"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plutus Stock Trading Agent API")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "1")),
+                        help="Worker processes; more than 1 runs under the supervisor (SIGHUP = rolling restart)")
+    args = parser.parse_args(argv)
+
+    print("=" * 50)
+    print("Starting Plutus Stock Trading Agent API")
+    print("=" * 50)
+    print(f"Server: http://localhost:{args.port}")
+    print(f"API Docs: http://localhost:{args.port}/docs")
+    print(f"API Base: http://localhost:{args.port}/api")
+    print(f"Workers: {args.workers}")
+    print("=" * 50)
+    if args.workers > 1:
+        # Workers import the app themselves; shared state is in PLUTUS_DB_PATH.
+        # WEB_CONCURRENCY tells each worker its share of the upstream rate limits.
+        os.environ["WEB_CONCURRENCY"] = str(args.workers)
+        # Workers publish metrics here so any worker's /metrics covers all of them
+        os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), f"plutus-metrics-{args.port}"))
+        metrics.clear_dir(os.environ["METRICS_DIR"])
+        supervisor.Supervisor(APP, args.host, args.port, args.workers).run()
+    else:
+        uvicorn.run(APP, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,48 @@
-import uvicorn
 import os
+import sys
+
+if __name__ == "__main__":
+    # `python server.py` is kept for convenience: hand over to serve.py before any setup runs, so
+    # the app is only ever imported as "server" (see serve.py)
+    entry = os.path.join(os.path.dirname(os.path.abspath(__file__)), "serve.py")
+    os.execv(sys.executable, [sys.executable, entry, *sys.argv[1:]])
+
 import json
-import requests
 import asyncio
 import uuid
 import hashlib
-from fastapi import FastAPI, HTTPException, Query, APIRouter, Body
+import math
+import time
+import httpx
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, APIRouter, Body, Request, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, model_validator
 from typing import List, Optional, Literal, Dict, Any
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
+import audit_integrity
+import audit_store
+import caches
+import compression
+import etags
+import http_clients
+import metrics
+import orders
+import price_hub
+import prompt_compaction
+import rate_limit
+import resilience
+import serialization
+import settings
+import storage
+import symbols
+import tracing
+from audit_store import generate_audit_hash
+from http_clients import ALPACA_DATA, ALPACA_TRADING, FINNHUB, DEEPSEEK
+
 # ---------------------- API KEYS (from environment) ------------------------ #
 load_dotenv()
 
@@ -24,25 +55,64 @@ ALPACA_BASE_URL = os.environ.get("ALPACA_BASE_URL", "https://data.alpaca.markets
 ALPACA_TRADING_URL = os.environ.get("ALPACA_TRADING_URL", "https://paper-api.alpaca.markets/v2").strip()
 
 FINNHUB_API_KEY = os.environ.get("FINNHUB_API_KEY", "ENTER YOUR API KEY HERE")
+FINNHUB_URL = os.environ.get("FINNHUB_URL", "https://finnhub.io/api/v1").strip()
+
+# Per-source deadlines (seconds) for the super agent's concurrent fetch stage
+MARKET_DATA_DEADLINE = float(os.environ.get("MARKET_DATA_DEADLINE", "10"))
+NEWS_DEADLINE = float(os.environ.get("NEWS_DEADLINE", "5"))
+
+# Agent executor: max tickers analyzed in parallel and per-ticker time budget (seconds)
+AGENT_CONCURRENCY = int(os.environ.get("AGENT_CONCURRENCY", "8"))
+AGENT_TICKER_TIMEOUT = float(os.environ.get("AGENT_TICKER_TIMEOUT", "90"))
+
+# SQLite file for persistent state, such as the ticker resolution cache below
+settings.ensure_db_dir()
+
+# Alpaca snapshot cache: short TTL, bounded by entry count and approximate bytes
+SNAPSHOT_CACHE_TTL = float(os.environ.get("SNAPSHOT_CACHE_TTL", "5"))
+SNAPSHOT_CACHE_MAX_ENTRIES = int(os.environ.get("SNAPSHOT_CACHE_MAX_ENTRIES", "2000"))
+SNAPSHOT_CACHE_MAX_BYTES = int(os.environ.get("SNAPSHOT_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+SNAPSHOT_CACHE = caches.register(caches.TTLCache(
+    "snapshots", SNAPSHOT_CACHE_TTL, SNAPSHOT_CACHE_MAX_ENTRIES, SNAPSHOT_CACHE_MAX_BYTES
+))
+
+# Batch snapshots: symbols per Alpaca multi-snapshot request, and per /api/stocks call
+SNAPSHOT_BATCH_SIZE = int(os.environ.get("SNAPSHOT_BATCH_SIZE", "100"))
+BATCH_MAX_SYMBOLS = int(os.environ.get("BATCH_MAX_SYMBOLS", "500"))
+
+# Account positions: one Alpaca call per TTL however many clients poll the portfolio; this worker's orders invalidate it.
+# The default outlasts the dashboard's 60 s reconciliation poll (live prices arrive over the WebSocket).
+POSITIONS_CACHE_TTL = float(os.environ.get("POSITIONS_CACHE_TTL", "60"))
+POSITIONS_CACHE = caches.register(caches.TTLCache("positions", POSITIONS_CACHE_TTL, max_entries=2))
 
+# LLM verdict cache: keyed on a hash of ticker, bucketed price and news article IDs
+VERDICT_CACHE_TTL = float(os.environ.get("VERDICT_CACHE_TTL", "900"))
+VERDICT_CACHE_MAX_ENTRIES = int(os.environ.get("VERDICT_CACHE_MAX_ENTRIES", "5000"))
+VERDICT_PRICE_TOLERANCE = float(os.environ.get("VERDICT_PRICE_TOLERANCE", "0.005"))
+VERDICT_CACHE_PERSIST = os.environ.get("VERDICT_CACHE_PERSIST", "0") in ("1", "true", "True")
 
-# ---------------------- SYNC HTTP HELPERS (run in thread pool) ------------------------ #
-def _sync_post(url: str, headers: dict, json_data: dict, timeout: int = 60) -> dict:
-    """Synchronous POST request."""
-    response = requests.post(url, headers=headers, json=json_data, timeout=timeout)
-    response.raise_for_status()
-    return response.json()
+if VERDICT_CACHE_PERSIST:
+    VERDICT_CACHE = caches.register(caches.PersistentTTLCache(
+        "verdicts", VERDICT_CACHE_TTL, VERDICT_CACHE_MAX_ENTRIES, db_path=settings.PLUTUS_DB_PATH
+    ))
+else:
+    VERDICT_CACHE = caches.register(caches.TTLCache("verdicts", VERDICT_CACHE_TTL, VERDICT_CACHE_MAX_ENTRIES))
 
+# Company name -> ticker: preloaded symbol directory plus an on-disk cache of LLM resolutions
+SYMBOL_DIRECTORY = symbols.SymbolDirectory()
+TICKER_CACHE = caches.register(symbols.TickerCache(settings.PLUTUS_DB_PATH))
 
-def _sync_get(url: str, headers: dict = None, params: dict = None, timeout: int = 30) -> dict:
-    """Synchronous GET request."""
-    response = requests.get(url, headers=headers, params=params, timeout=timeout)
-    response.raise_for_status()
-    return response.json()
+# Minimum score (and lead over the runner-up) for a search index hit to resolve without the LLM
+INDEX_RESOLVE_MIN_SCORE = 0.7
+INDEX_RESOLVE_MIN_LEAD = 0.05
 
 
 # ---------------------- LLM ANALYZER ------------------------ #
-async def analyze_stock(market_data: dict, news_data: list) -> dict:
+def _build_analysis_request(market_data: dict, news_data: list, ticker: Optional[str] = None) -> tuple:
+    """Build (headers, payload, prompt_stats) for a DeepSeek analysis call."""
+    market_json, news_json, prompt_stats = prompt_compaction.build_prompt_payload(market_data, news_data, ticker)
+
     prompt = """
     You are a financial assistant. 
     Analyze the following market data and company news, then decide:
@@ -53,10 +123,10 @@ async def analyze_stock(market_data: dict, news_data: list) -> dict:
     4. explanation: a concise explanation in 2–4 sentences
 
     MARKET DATA:
-    {""" + json.dumps(market_data, indent=2) + """}
+    {""" + market_json + """}
 
     COMPANY NEWS:
-    {""" + json.dumps(news_data, indent=2) + """}
+    {""" + news_json + """}
 
     Respond in JSON ONLY with this exact format:
     {{
@@ -81,44 +151,134 @@ async def analyze_stock(market_data: dict, news_data: list) -> dict:
         ],
         "temperature": 0.2
     }
+    return headers, payload, prompt_stats
+
 
+def _parse_verdict(raw: str) -> dict:
+    """Extract the JSON verdict from LLM output, falling back to HOLD if it is invalid."""
     try:
-        data = await asyncio.to_thread(_sync_post, DEEPSEEK_URL, headers, payload, 60)
+        # Handle markdown code blocks
+        if "```json" in raw:
+            raw = raw.split("```json")[1].split("```")[0].strip()
+        elif "```" in raw:
+            raw = raw.split("```")[1].split("```")[0].strip()
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        return {
+            "action": "HOLD",
+            "confidence": 0.5,
+            "drivers": ["fallback-mode"],
+            "explanation": "LLM returned invalid JSON. Fallback response activated."
+        }
+
+
+def _degraded_verdict(prompt_stats: dict) -> dict:
+    """Neutral verdict served while the LLM's circuit is open (never cached: fallback-mode)."""
+    return {
+        "action": "HOLD",
+        "confidence": 0.0,
+        "drivers": ["fallback-mode"],
+        "explanation": "AI analysis is temporarily unavailable. Fallback response activated.",
+        "degraded": True,
+        "prompt_stats": prompt_stats,
+    }
+
+
+@tracing.traced("analyze_stock")
+@metrics.timed("analyze_stock")
+async def analyze_stock(market_data: dict, news_data: list, ticker: Optional[str] = None) -> dict:
+    headers, payload, prompt_stats = _build_analysis_request(market_data, news_data, ticker)
+
+    try:
+        data = await http_clients.get_client(DEEPSEEK).post(DEEPSEEK_URL, headers, payload, 60)
 
         if "choices" not in data or len(data["choices"]) == 0:
             raise ValueError("No choices in LLM response")
 
-        raw = data["choices"][0]["message"]["content"]
+        usage = data.get("usage") or {}
+        tracing.set_attributes(**{
+            "llm.prompt_tokens": usage.get("prompt_tokens"),
+            "llm.completion_tokens": usage.get("completion_tokens"),
+            "llm.prompt_tokens_estimated": prompt_stats["compacted_tokens"],
+            "llm.news_articles": prompt_stats["articles_kept"],
+        })
+        verdict = _parse_verdict(data["choices"][0]["message"]["content"])
+        verdict["prompt_stats"] = prompt_stats
+        return verdict
+    except resilience.CircuitOpenError:
+        return _degraded_verdict(prompt_stats)
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=502, detail=f"LLM API error: {e.response.status_code}")
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=502, detail=f"LLM API connection error: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
+
 
-        # Try to extract JSON from the response
-        try:
-            # Handle markdown code blocks
-            if "```json" in raw:
-                raw = raw.split("```json")[1].split("```")[0].strip()
-            elif "```" in raw:
-                raw = raw.split("```")[1].split("```")[0].strip()
-            return json.loads(raw)
-        except json.JSONDecodeError:
-            return {
-                "action": "HOLD",
-                "confidence": 0.5,
-                "drivers": ["fallback-mode"],
-                "explanation": "LLM returned invalid JSON. Fallback response activated."
-            }
-    except requests.HTTPError as e:
+@tracing.traced("analyze_stock_stream")
+@metrics.timed("analyze_stock_stream")
+async def analyze_stock_stream(market_data: dict, news_data: list, ticker: Optional[str] = None):
+    """
+    Streaming variant of analyze_stock using the upstream's streaming completion API.
+    Yields ("token", text_delta) as the completion arrives, then ("verdict", verdict).
+    """
+    headers, payload, prompt_stats = _build_analysis_request(market_data, news_data, ticker)
+    payload["stream"] = True
+    headers["Accept"] = "text/event-stream"
+
+    chunks = []
+    usage = {}
+    try:
+        async with http_clients.get_client(DEEPSEEK).stream("POST", DEEPSEEK_URL, timeout=60, headers=headers, json=payload) as response:
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(data)
+                except json.JSONDecodeError:
+                    continue
+                choices = chunk.get("choices") or []
+                if chunk.get("usage"):
+                    usage = chunk["usage"]
+                delta = choices[0].get("delta", {}).get("content") if choices else None
+                if delta:
+                    chunks.append(delta)
+                    yield "token", delta
+    except resilience.CircuitOpenError:
+        yield "verdict", _degraded_verdict(prompt_stats)
+        return
+    except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=502, detail=f"LLM API error: {e.response.status_code}")
-    except requests.RequestException as e:
+    except httpx.RequestError as e:
         raise HTTPException(status_code=502, detail=f"LLM API connection error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
 
+    tracing.set_attributes(**{
+        "llm.prompt_tokens": usage.get("prompt_tokens"),
+        "llm.completion_tokens": usage.get("completion_tokens"),
+        "llm.prompt_tokens_estimated": prompt_stats["compacted_tokens"],
+        "llm.news_articles": prompt_stats["articles_kept"],
+        "llm.stream_chunks": len(chunks),
+    })
+    if not chunks:
+        raise HTTPException(status_code=500, detail="Analysis error: No content in LLM stream")
+    verdict = _parse_verdict("".join(chunks))
+    verdict["prompt_stats"] = prompt_stats
+    yield "verdict", verdict
+
 
 # ---------------------- GET NEWS ------------------------ #
+@tracing.traced("get_company_news")
+@metrics.timed("get_company_news")
 async def get_company_news(ticker: str) -> list:
     today = datetime.now().date()
     week_ago = today - timedelta(days=7)
 
-    url = "https://finnhub.io/api/v1/company-news"
+    url = f"{FINNHUB_URL}/company-news"
     params = {
         "symbol": ticker,
         "from": str(week_ago),
@@ -127,15 +287,25 @@ async def get_company_news(ticker: str) -> list:
     }
 
     try:
-        return await asyncio.to_thread(_sync_get, url, None, params, 30)
-    except requests.HTTPError as e:
+        news = await http_clients.get_client(FINNHUB).get(url, None, params, 30)
+    except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=502, detail=f"Finnhub API error: {e.response.status_code}")
-    except requests.RequestException as e:
+    except httpx.RequestError as e:
         raise HTTPException(status_code=502, detail=f"Finnhub connection error: {str(e)}")
+    if not isinstance(news, list):
+        raise HTTPException(status_code=502, detail="Finnhub returned an unexpected response")
+    return news
 
 
 # ---------------------- GET MARKET DATA ------------------------ #
+@tracing.traced("get_market_data")
+@metrics.timed("get_market_data")
 async def get_market_data(ticker: str) -> dict:
+    """Alpaca snapshot for a ticker, served from the TTL cache when fresh."""
+    return await SNAPSHOT_CACHE.get_or_load(ticker, lambda: _fetch_snapshot(ticker))
+
+
+async def _fetch_snapshot(ticker: str) -> dict:
     url = f"{ALPACA_BASE_URL}/{ticker}/snapshot"
 
     headers = {
@@ -144,23 +314,330 @@ async def get_market_data(ticker: str) -> dict:
     }
 
     try:
-        return await asyncio.to_thread(_sync_get, url, headers, None, 30)
-    except requests.HTTPError as e:
-        raise HTTPException(status_code=502, detail=f"Alpaca API error: {e.response.status_code}")
-    except requests.RequestException as e:
+        return await http_clients.get_client(ALPACA_DATA).get(url, headers, None, 30)
+    except (httpx.HTTPStatusError, httpx.RequestError) as e:
+        # Upstream unavailable: serve the last snapshot we had, flagged as stale
+        stale = SNAPSHOT_CACHE.get_stale(ticker)
+        if stale is not None and resilience.is_upstream_outage(e):
+            return {**stale, "stale": True}
+        if isinstance(e, resilience.CircuitOpenError):
+            raise HTTPException(status_code=503, detail=f"Alpaca unavailable: {str(e)}")
+        if isinstance(e, httpx.HTTPStatusError):
+            raise HTTPException(status_code=502, detail=f"Alpaca API error: {e.response.status_code}")
         raise HTTPException(status_code=502, detail=f"Alpaca connection error: {str(e)}")
 
 
+async def get_market_data_batch(tickers: List[str]) -> tuple:
+    """
+    Snapshots for many tickers: cached ones from SNAPSHOT_CACHE, the rest via
+    Alpaca's multi-symbol endpoint in chunks of SNAPSHOT_BATCH_SIZE (run concurrently).
+    Returns ({ticker: snapshot}, {ticker: error}).
+    """
+    snapshots, errors = {}, {}
+    missing = []
+    for ticker in tickers:
+        cached = SNAPSHOT_CACHE.lookup(ticker)
+        if cached is not None:
+            snapshots[ticker] = cached
+        else:
+            missing.append(ticker)
+
+    url = f"{ALPACA_BASE_URL}/snapshots"
+    headers = {
+        "APCA-API-KEY-ID": ALPACA_API_KEY,
+        "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY
+    }
+
+    async def fetch_chunk(chunk: List[str]):
+        try:
+            data = await http_clients.get_client(ALPACA_DATA).get(url, headers, {"symbols": ",".join(chunk)}, 30)
+        except httpx.HTTPStatusError as e:
+            return chunk, None, f"Alpaca API error: {e.response.status_code}", resilience.is_upstream_outage(e)
+        except httpx.RequestError as e:
+            return chunk, None, f"Alpaca connection error: {str(e)}", True
+        return chunk, data, None, False
+
+    chunks = [missing[i:i + SNAPSHOT_BATCH_SIZE] for i in range(0, len(missing), SNAPSHOT_BATCH_SIZE)]
+    for chunk, data, error, outage in await asyncio.gather(*(fetch_chunk(c) for c in chunks)):
+        for ticker in chunk:
+            snapshot = (data or {}).get(ticker)
+            stale = SNAPSHOT_CACHE.get_stale(ticker) if outage else None
+            if snapshot:
+                SNAPSHOT_CACHE.set(ticker, snapshot)
+                snapshots[ticker] = snapshot
+            elif stale is not None:
+                snapshots[ticker] = {**stale, "stale": True}
+            else:
+                errors[ticker] = error or "Symbol not found"
+    return snapshots, errors
+
+
+# ---------------------- VERDICT CACHE KEY ------------------------ #
+def snapshot_price(snapshot: dict) -> float:
+    """Current price from an Alpaca snapshot (latest trade, else ask)."""
+    if "latestTrade" in snapshot and "p" in snapshot["latestTrade"]:
+        return float(snapshot["latestTrade"]["p"])
+    if "latestQuote" in snapshot and "ap" in snapshot["latestQuote"]:
+        return float(snapshot["latestQuote"]["ap"])
+    return 0.0
+
+
+def snapshot_change_pct(snapshot: dict, price: float) -> float:
+    """Percent change of `price` from the snapshot's daily open (0 without a daily bar)."""
+    daily = snapshot.get("dailyBar") or {}
+    if daily.get("o", 0) > 0:
+        return round((price - daily["o"]) / daily["o"] * 100, 2)
+    return 0.0
+
+
+def verdict_cache_key(ticker: str, market_data: dict, news_data: list) -> str:
+    """
+    Content hash of the analysis inputs. Prices within VERDICT_PRICE_TOLERANCE of each
+    other share a (logarithmic) bucket; the news set is identified by article IDs.
+    """
+    price = snapshot_price(market_data)
+    price_bucket = math.floor(math.log(price) / math.log1p(VERDICT_PRICE_TOLERANCE)) if price > 0 else 0
+    article_ids = sorted(
+        str(a.get("id") or hashlib.sha256(f"{a.get('headline')}|{a.get('datetime')}".encode()).hexdigest()[:16])
+        for a in news_data if isinstance(a, dict)
+    )
+    content = json.dumps({"ticker": ticker.upper(), "price_bucket": price_bucket, "news": article_ids})
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
 # ---------------------- SUPER AGENT ------------------------ #
+async def _fetch_with_deadline(coro, deadline: float) -> tuple:
+    """Await a fetch with a deadline. Returns (result, error_status, elapsed_ms)."""
+    start = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(coro, deadline)
+        return result, None, round((time.perf_counter() - start) * 1000, 1)
+    except asyncio.TimeoutError:
+        return None, "timeout", round((time.perf_counter() - start) * 1000, 1)
+    except HTTPException as e:
+        return e, "error", round((time.perf_counter() - start) * 1000, 1)
+    except Exception as e:
+        # e.g. a malformed upstream body; surfaced like an upstream error so optional sources degrade
+        error = HTTPException(status_code=502, detail=f"Invalid upstream response: {str(e)}")
+        return error, "error", round((time.perf_counter() - start) * 1000, 1)
+
+
+@tracing.traced("super_agent")
 async def super_agent(ticker: str) -> dict:
-    market = await get_market_data(ticker)
-    news = await get_company_news(ticker)
-    result = await analyze_stock(market, news)
+    start = time.perf_counter()
+
+    # Fan out: market data and news are independent, fetch them concurrently
+    (market, market_status, market_ms), (news, news_status, news_ms) = await asyncio.gather(
+        _fetch_with_deadline(get_market_data(ticker), MARKET_DATA_DEADLINE),
+        _fetch_with_deadline(get_company_news(ticker), NEWS_DEADLINE),
+    )
+    fetch_ms = round((time.perf_counter() - start) * 1000, 1)
+
+    # Market data is required; news is optional and degrades to an empty list
+    if market_status == "timeout":
+        raise HTTPException(status_code=504, detail=f"Market data timed out after {MARKET_DATA_DEADLINE}s")
+    if market_status == "error":
+        raise market
+    if news_status is not None:
+        news = []
+
+    llm_start = time.perf_counter()
+    cache_key = verdict_cache_key(ticker, market, news)
+    verdict, lookup = await VERDICT_CACHE.get_or_load_status(cache_key, lambda: analyze_stock(market, news, ticker))
+    llm_ms = round((time.perf_counter() - llm_start) * 1000, 1)
+    if verdict.get("drivers") == ["fallback-mode"]:
+        VERDICT_CACHE.invalidate(cache_key)  # never serve a parse-failure fallback from cache
+
+    tracing.set_attributes(ticker=ticker, cache_status="cached" if lookup == "hit" else "fresh")
+    return _annotate_result(verdict, "cached" if lookup == "hit" else "fresh", news_status, {
+        "market_data_ms": market_ms,
+        "news_ms": news_ms,
+        "fetch_ms": fetch_ms,
+        "llm_ms": llm_ms,
+        "total_ms": round((time.perf_counter() - start) * 1000, 1),
+    }, "stale" if market.get("stale") else None)
+
+
+def _annotate_result(verdict: dict, cache_status: str, news_status: Optional[str], timings: dict,
+                     market_status: Optional[str] = None) -> dict:
+    """Copy a (possibly cached, shared) verdict and attach per-request metadata."""
+    result = dict(verdict)
+    result["cache_status"] = cache_status
+    result["partial"] = news_status is not None or market_status is not None
+    result["sources"] = {"market_data": market_status or "ok", "news": news_status or "ok"}
+    result["timings"] = timings
     return result
 
 
+@tracing.traced("super_agent_stream")
+async def super_agent_stream(ticker: str):
+    """
+    Event-producing variant of super_agent for streaming endpoints. Yields
+    (event, data) pairs: market_data, news, token (LLM deltas) and finally verdict.
+    Failures are raised as HTTPException like super_agent.
+    """
+    start = time.perf_counter()
+    sources = {
+        asyncio.create_task(_fetch_with_deadline(get_market_data(ticker), MARKET_DATA_DEADLINE)): "market_data",
+        asyncio.create_task(_fetch_with_deadline(get_company_news(ticker), NEWS_DEADLINE)): "news",
+    }
+    fetched = {}
+    pending = set(sources)
+    try:
+        # Report each source as soon as it lands
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = sources[task]
+                value, status, elapsed_ms = task.result()
+                fetched[name] = (value, status, elapsed_ms)
+                event = {"symbol": ticker, "status": status or "ok", "ms": elapsed_ms}
+                if name == "news" and status is None:
+                    event["articles"] = len(value)
+                yield name, event
+                if name == "market_data" and status == "timeout":
+                    raise HTTPException(status_code=504, detail=f"Market data timed out after {MARKET_DATA_DEADLINE}s")
+                if name == "market_data" and status == "error":
+                    raise value
+    finally:
+        for task in pending:
+            task.cancel()
+    fetch_ms = round((time.perf_counter() - start) * 1000, 1)
+
+    market, _, market_ms = fetched["market_data"]
+    news, news_status, news_ms = fetched["news"]
+    if news_status is not None:
+        news = []
+
+    llm_start = time.perf_counter()
+    cache_key = verdict_cache_key(ticker, market, news)
+    verdict = VERDICT_CACHE.lookup(cache_key)
+    cache_status = "cached"
+    if verdict is None:
+        cache_status = "fresh"
+        async for kind, value in analyze_stock_stream(market, news, ticker):
+            if kind == "token":
+                yield "token", {"symbol": ticker, "delta": value}
+            else:
+                verdict = value
+        if verdict.get("drivers") != ["fallback-mode"]:
+            VERDICT_CACHE.set(cache_key, verdict)
+    llm_ms = round((time.perf_counter() - llm_start) * 1000, 1)
+
+    yield "verdict", _annotate_result(verdict, cache_status, news_status, {
+        "market_data_ms": market_ms,
+        "news_ms": news_ms,
+        "fetch_ms": fetch_ms,
+        "llm_ms": llm_ms,
+        "total_ms": round((time.perf_counter() - start) * 1000, 1),
+    }, "stale" if market.get("stale") else None)
+
+
+# ---------------------- AGENT EXECUTOR ------------------------ #
+async def _cancel_on_disconnect(http_request: Request, tasks: list, interval: float = 0.5):
+    """Cancel outstanding analysis tasks once the client has gone away."""
+    while not all(t.done() for t in tasks):
+        if await http_request.is_disconnected():
+            for t in tasks:
+                t.cancel()
+            return True
+        await asyncio.sleep(interval)
+    return False
+
+
+async def run_agent_batch(tickers: List[str], http_request: Optional[Request] = None) -> List[tuple]:
+    """
+    Run super_agent over many tickers with bounded concurrency.
+    Returns (ticker, result_or_exception) pairs in input order.
+    """
+    semaphore = asyncio.Semaphore(AGENT_CONCURRENCY)
+
+    async def analyze_one(ticker: str) -> dict:
+        async with semaphore:
+            return await asyncio.wait_for(super_agent(ticker), AGENT_TICKER_TIMEOUT)
+
+    tasks = [asyncio.create_task(analyze_one(t)) for t in tickers]
+    watcher = asyncio.create_task(_cancel_on_disconnect(http_request, tasks)) if http_request else None
+    try:
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        if watcher:
+            watcher.cancel()
+    return list(zip(tickers, results))
+
+
+# ---------------------- PRICE STREAMING ------------------------ #
+def quote_from_snapshot(snapshot: dict) -> dict:
+    """Compact quote for the price hub."""
+    price = snapshot_price(snapshot)
+    quote = {"price": price}
+    if "latestQuote" in snapshot:
+        quote["bid"] = snapshot["latestQuote"].get("bp")
+        quote["ask"] = snapshot["latestQuote"].get("ap")
+    if (snapshot.get("dailyBar") or {}).get("o"):
+        quote["change_pct"] = snapshot_change_pct(snapshot, price)
+    return quote
+
+
+async def fetch_quotes(tickers: List[str]) -> tuple:
+    """Quotes for every streamed symbol: batch snapshot requests through the snapshot cache."""
+    with rate_limit.priority(rate_limit.BACKGROUND):
+        snapshots, errors = await get_market_data_batch(tickers)
+    return {ticker: quote_from_snapshot(snapshot) for ticker, snapshot in snapshots.items()}, errors
+
+
+def is_streamable_symbol(symbol: str) -> bool:
+    """Ticker-shaped, and listed in the symbol directory when one is loaded."""
+    if not symbols.looks_like_ticker(symbol):
+        return False
+    return not SYMBOL_DIRECTORY.listings or SYMBOL_DIRECTORY.has_symbol(symbol)
+
+
+def _price_feed_limit() -> int:
+    limiter = rate_limit.get_limiter(ALPACA_DATA)  # this worker's share of the account's budget
+    return price_hub.feed_limit(limiter.rate * 60 if limiter else None, SNAPSHOT_BATCH_SIZE)
+
+
+PRICE_HUB = price_hub.PriceHub(fetch_quotes, _price_feed_limit(), is_valid=is_streamable_symbol)
+
+
 # ---------------------- RESOLVE TICKER ------------------------ #
+@tracing.traced("resolve_ticker")
+@metrics.timed("resolve_ticker")
 async def resolve_ticker(company_name: str) -> str:
+    """Resolve a company name to a ticker, using the LLM only when local lookups miss."""
+    query = company_name.strip()
+
+    # Fast path: a listed symbol typed in any case
+    if SYMBOL_DIRECTORY.has_symbol(query):
+        return query.upper()
+
+    # Names come before the ticker pattern: "FORD" and "TESLA" look like tickers but mean F and TSLA
+    ticker = SYMBOL_DIRECTORY.lookup_name(query) or _resolve_from_index(query) or TICKER_CACHE.get(query)
+    if ticker:
+        return ticker
+    if symbols.looks_like_ticker(query):
+        return query  # an unlisted ticker, written as one
+
+    ticker = await _resolve_ticker_llm(query)
+    if symbols.looks_like_ticker(ticker):
+        TICKER_CACHE.set(query, ticker)
+    return ticker
+
+
+def _resolve_from_index(query: str) -> Optional[str]:
+    """Top search index candidate, if it is a confident and unambiguous match."""
+    candidates = SYMBOL_DIRECTORY.search(query, limit=2)
+    if not candidates or candidates[0]["score"] < INDEX_RESOLVE_MIN_SCORE:
+        return None
+    if len(candidates) > 1 and candidates[0]["score"] - candidates[1]["score"] < INDEX_RESOLVE_MIN_LEAD:
+        return None
+    if candidates[0]["match"] == "symbol_prefix" and symbols.looks_like_ticker(query):
+        return None  # "PLT" is more likely an unlisted ticker than an abbreviation of PLTR
+    return candidates[0]["symbol"]
+
+
+async def _resolve_ticker_llm(company_name: str) -> str:
     prompt = f"""
     You are a financial assistant. 
     Convert the following company name into its official stock ticker symbol.
@@ -187,7 +664,7 @@ async def resolve_ticker(company_name: str) -> str:
     }
 
     try:
-        data = await asyncio.to_thread(_sync_post, DEEPSEEK_URL, headers, payload, 30)
+        data = await http_clients.get_client(DEEPSEEK).post(DEEPSEEK_URL, headers, payload, 30)
 
         if "choices" not in data or len(data["choices"]) == 0:
             raise ValueError("No choices in LLM response")
@@ -195,9 +672,9 @@ async def resolve_ticker(company_name: str) -> str:
         raw = data["choices"][0]["message"]["content"].strip()
         ticker = "".join(c for c in raw if c.isalnum()).upper()
         return ticker
-    except requests.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=502, detail=f"LLM API error: {e.response.status_code}")
-    except requests.RequestException as e:
+    except httpx.RequestError as e:
         raise HTTPException(status_code=502, detail=f"LLM API connection error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ticker resolution error: {str(e)}")
@@ -209,11 +686,87 @@ async def get_direct_stock_details(company_name: str) -> tuple:
     return market_data, ticker
 
 
+# ---------------------- PLACE ORDER ------------------------ #
+@tracing.traced("place_order")
+@metrics.timed("place_order")
+async def place_order(order_payload: dict) -> dict:
+    """Submit an order to Alpaca; raises httpx errors like the shared client does."""
+    url = f"{ALPACA_TRADING_URL}/orders"
+    headers = {
+        "APCA-API-KEY-ID": ALPACA_API_KEY,
+        "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY,
+        "Content-Type": "application/json"
+    }
+    response = await http_clients.get_client(ALPACA_TRADING).post(url, headers, order_payload, 30)
+    POSITIONS_CACHE.invalidate("positions")
+    POSITIONS_CACHE.invalidate("portfolio")
+    return response
+
+
+async def fetch_positions() -> list:
+    """Alpaca account positions, shared by portfolio requests for POSITIONS_CACHE_TTL seconds."""
+    url = f"{ALPACA_TRADING_URL}/positions"
+    headers = {
+        "APCA-API-KEY-ID": ALPACA_API_KEY,
+        "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY
+    }
+    return await POSITIONS_CACHE.get_or_load(
+        "positions", lambda: http_clients.get_client(ALPACA_TRADING).get(url, headers, None, 30)
+    )
+
+
+async def build_portfolio() -> tuple:
+    positions = await fetch_positions()
+    result = [{
+        "symbol": pos.get("symbol", ""),
+        "qty": float(pos.get("qty", 0)),
+        "avg_entry_price": float(pos.get("avg_entry_price", 0)),
+        "market_value": float(pos.get("market_value", 0)),
+        "current_price": float(pos.get("current_price", 0)),
+        "unrealized_pl": float(pos.get("unrealized_pl", 0))
+    } for pos in positions]
+    body = serialization.dumps({"positions": result, "holdings": result})
+    return etags.make_etag(body), body
+
+
+async def fetch_portfolio() -> tuple:
+    """
+    (ETag, encoded body) of /api/portfolio/, built once per positions load: the
+    ETag is a version of the cached positions, so a revalidating poll costs
+    neither an Alpaca call nor re-encoding while the cache is fresh.
+    """
+    return await POSITIONS_CACHE.get_or_load("portfolio", build_portfolio)
+
+
 # ---------------------- Initialize FastAPI Application ------------------------ #
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared upstream connection pools on startup and close them on shutdown."""
+    await http_clients.start_clients()
+    count = SYMBOL_DIRECTORY.load()
+    print(f"Loaded {count} symbols from {symbols.SYMBOL_DIRECTORY_PATH}")
+    checkpointer = asyncio.create_task(checkpoint_audit_log())
+    metrics_sync = asyncio.create_task(sync_metrics()) if metrics.METRICS_DIR else None
+    yield
+    checkpointer.cancel()
+    if metrics_sync is not None:
+        metrics_sync.cancel()
+        metrics.write_snapshot()  # keep this worker's final counts in the merged totals
+    tracing.shutdown()
+    await PRICE_HUB.close()
+    await http_clients.close_clients()
+    await asyncio.to_thread(AUDIT_STORE.close)
+    AUDIT_VERIFIER.close()
+    await asyncio.to_thread(VERDICT_CACHE.close)
+    await asyncio.to_thread(TICKER_CACHE.close)
+    await asyncio.to_thread(STORAGE.close)
+
+
 app = FastAPI(
     title="Plutus - Stock Trading Agent API",
     description="AI-powered stock analysis, portfolio management, and trading with XAI explainability.",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware for frontend communication
@@ -223,8 +776,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],  # read by the frontend for audit paging and conditional GETs
 )
 
+# gzip/Brotli response bodies; inside metrics and tracing so they record the bytes actually sent
+app.add_middleware(compression.CompressionMiddleware)
+
+# Per-route request metrics for /metrics, and a trace span per request (when TRACE_EXPORT_PATH is set)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(tracing.TracingMiddleware)
+
 # Create API Router with /api prefix
 api_router = APIRouter(prefix="/api")
 
@@ -237,6 +798,10 @@ class StockAnalysis(BaseModel):
     confidence_score: float
     analysis_date: datetime
     summary: str
+    partial: bool = False
+    cache_status: Literal["fresh", "cached"] = "fresh"
+    timings: Optional[Dict[str, float]] = None
+    prompt_stats: Optional[Dict[str, int]] = None
 
 
 class StockDetails(BaseModel):
@@ -247,6 +812,12 @@ class StockDetails(BaseModel):
     pe_ratio: Optional[float] = None
     change_pct: Optional[float] = None
     description: Optional[str] = None
+    stale: bool = False
+
+
+class BatchStockDetails(BaseModel):
+    results: Dict[str, StockDetails]
+    errors: Dict[str, str] = {}
 
 
 class PortfolioPosition(BaseModel):
@@ -264,6 +835,34 @@ class AuditLog(BaseModel):
     actor: Optional[str] = "System"
     audit_hash: Optional[str] = None
     prev_hash: Optional[str] = None
+    trace_id: Optional[str] = None
+
+
+class AuditInclusionProof(BaseModel):
+    entry: AuditLog
+    leaf_index: int
+    tree_size: int
+    leaf_hash: str
+    proof: List[str]
+    root: str
+    root_signature: str
+
+
+class AuditBrokenLink(BaseModel):
+    seq: int
+    id: Optional[str] = None
+    reason: str
+
+
+class AuditVerification(BaseModel):
+    valid: bool
+    mode: Literal["incremental", "full"]
+    entries_total: int
+    entries_checked: int
+    checkpoints: int
+    checkpoints_created: int
+    first_broken: Optional[AuditBrokenLink] = None
+    elapsed_ms: float
 
 
 class OrderRequest(BaseModel):
@@ -323,55 +922,205 @@ class DailyLesson(BaseModel):
     points_reward: int
 
 
-# ---------------------- In-Memory Storage ------------------------ #
+# ---------------------- Storage ------------------------ #
 
-AUDIT_LOGS: List[Dict] = [
-    {"id": "log_001", "action": "LOGIN", "timestamp": datetime.now(), "details": "User logged in", "actor": "User", "audit_hash": "genesis", "prev_hash": ""},
-    {"id": "log_002", "action": "VIEW_PORTFOLIO", "timestamp": datetime.now(), "details": "Portfolio accessed", "actor": "User", "audit_hash": "abc123", "prev_hash": "genesis"},
-]
-
-PENDING_ORDERS: List[Dict] = []
-
-USER_POINTS: Dict[str, Dict] = {
+# Seed data; live state is in STORAGE (SQLite by default, shared by all workers)
+DEFAULT_USER_POINTS: Dict[str, Dict] = {
     "demo": {"points": 150, "badges": ["Early Adopter", "First Trade"], "streak": 3}
 }
 
-DAILY_LESSONS = [
+DEFAULT_LESSONS = [
     {"id": "lesson_001", "title": "Understanding Risk Tolerance", "content": "Risk tolerance is your ability to endure market volatility...", "category": "Basics", "points_reward": 10},
     {"id": "lesson_002", "title": "Diversification Strategies", "content": "Don't put all your eggs in one basket...", "category": "Strategy", "points_reward": 15},
     {"id": "lesson_003", "title": "Reading Market Indicators", "content": "Technical indicators help predict market movements...", "category": "Technical", "points_reward": 20},
 ]
 
+STORAGE = storage.open_storage(settings.PLUTUS_DB_PATH, DEFAULT_USER_POINTS, DEFAULT_LESSONS)
+PENDING_ORDERS = STORAGE.pending_orders
+
 
 # ---------------------- Helper Functions ------------------------ #
 
-def generate_audit_hash(data: dict, prev_hash: str) -> str:
-    """Generate SHA256 hash for audit trail."""
-    content = json.dumps(data, sort_keys=True, default=str) + prev_hash
-    return hashlib.sha256(content.encode()).hexdigest()[:16]
+# Audit trail: append-only SQLite store (see audit_store.py); hashes are chained at commit
+AUDIT_STORE = audit_store.AuditStore(settings.PLUTUS_DB_PATH, generate_audit_hash)
+AUDIT_VERIFIER = audit_integrity.AuditVerifier(settings.PLUTUS_DB_PATH)
+AUDIT_CHECKPOINT_INTERVAL = float(os.environ.get("AUDIT_CHECKPOINT_INTERVAL", "300"))
+AUDIT_PAGE_MAX = 1000
+AUDIT_EXPORT_MAX_ROWS = int(os.environ.get("AUDIT_EXPORT_MAX_ROWS", "100000"))
+AUDIT_FIELDS = audit_store.COLUMNS[1:]  # AuditLog fields, in stored column order
 
 
 def get_latest_audit_hash() -> str:
-    """Get the hash of the latest audit entry."""
-    if AUDIT_LOGS:
-        return AUDIT_LOGS[-1].get("audit_hash", "genesis")
-    return "genesis"
+    """Get the hash of the latest committed audit entry."""
+    return AUDIT_STORE.latest_hash()
 
 
 def add_audit_entry(action: str, details: str, actor: str = "System"):
-    """Add a new entry to the audit log."""
-    prev_hash = get_latest_audit_hash()
+    """
+    Queue a new entry for the audit log. prev_hash and audit_hash are set on the
+    returned dict once the background writer commits it.
+    """
     entry = {
         "id": f"log_{uuid.uuid4().hex[:8]}",
         "action": action,
         "timestamp": datetime.now(),
         "details": details,
         "actor": actor,
-        "prev_hash": prev_hash
     }
-    entry["audit_hash"] = generate_audit_hash(entry, prev_hash)
-    AUDIT_LOGS.append(entry)
-    return entry
+    trace_id = tracing.current_trace_id()
+    if trace_id is not None:
+        entry["trace_id"] = trace_id  # links the entry to the request's spans
+    return AUDIT_STORE.append(entry)
+
+
+async def query_audit_log(request: Request, response: Response, newest_first: bool, format: str = "json", **filters):
+    """
+    Read one page of audit entries and set X-Next-Cursor when more may follow.
+    SQLite reads run in a worker thread, off the event loop.
+    With FAST_SERIALIZATION the stored rows are encoded directly (no AuditLog
+    models); format="ndjson" streams up to AUDIT_EXPORT_MAX_ROWS entries instead.
+    The ETag is a version: the log is append-only, so the newest entry's hash and
+    the query determine the result, and an unchanged poll gets 304 without a query.
+    """
+    if format == "json" and filters["limit"] > AUDIT_PAGE_MAX:
+        raise HTTPException(status_code=422, detail=f"limit must be at most {AUDIT_PAGE_MAX} (use format=ndjson for more)")
+    if AUDIT_STORE.pending:
+        await asyncio.to_thread(AUDIT_STORE.flush)  # read-your-writes for just-queued entries
+    etag = etags.make_etag(await asyncio.to_thread(AUDIT_STORE.latest_hash), request.url.query)
+    if etags.is_fresh(request, etag):
+        return etags.not_modified(etag)
+    headers = {"ETag": etag, "Cache-Control": etags.CACHE_CONTROL}
+    if format == "ndjson":
+        return serialization.ndjson_response(stream_audit_log(newest_first, **filters), headers)
+    if not serialization.FAST_SERIALIZATION:
+        entries = await asyncio.to_thread(AUDIT_STORE.query, newest_first=newest_first, **filters)
+        if len(entries) == filters["limit"]:
+            response.headers["X-Next-Cursor"] = str(entries[-1]["seq"])
+        response.headers.update(headers)
+        if newest_first:
+            entries.reverse()  # pages are returned in chronological order
+        return [AuditLog(**entry) for entry in entries]
+
+    rows = await asyncio.to_thread(AUDIT_STORE.query_rows, newest_first=newest_first, **filters)
+    if len(rows) == filters["limit"]:
+        headers["X-Next-Cursor"] = str(rows[-1][0])
+    if newest_first:
+        rows.reverse()
+    return serialization.FastJSONResponse(serialization.records(AUDIT_FIELDS, (row[1:] for row in rows)), headers=headers)
+
+
+async def stream_audit_log(newest_first: bool, limit: int, **filters):
+    """NDJSON chunks of up to `limit` entries, read a page at a time in scan order (newest first or oldest first)."""
+    remaining = limit
+    while remaining > 0:
+        rows = await asyncio.to_thread(
+            AUDIT_STORE.query_rows, newest_first=newest_first, limit=min(remaining, AUDIT_PAGE_MAX), **filters
+        )
+        if not rows:
+            return
+        yield serialization.ndjson(AUDIT_FIELDS, (row[1:] for row in rows))
+        remaining -= len(rows)
+        filters["before" if newest_first else "after"] = rows[-1][0]
+
+
+async def verify_audit_log(full: bool = False) -> dict:
+    """Commit queued entries, then verify the chain off the event loop."""
+    await asyncio.to_thread(AUDIT_STORE.flush)
+    return await asyncio.to_thread(AUDIT_VERIFIER.verify, full)
+
+
+async def checkpoint_audit_log():
+    """Background task: periodically verify new entries and seal complete blocks."""
+    while True:
+        await asyncio.sleep(AUDIT_CHECKPOINT_INTERVAL)
+        try:
+            result = await verify_audit_log()
+            if not result["valid"]:
+                print(f"Audit chain verification failed: {result['first_broken']}")
+        except Exception as e:
+            print(f"Audit checkpoint error: {e}")
+
+
+async def sync_metrics():
+    """Background task (multi-worker): publish this worker's metrics for the others' /metrics."""
+    while True:
+        await asyncio.sleep(metrics.METRICS_SYNC_INTERVAL)
+        try:
+            metrics.collect()
+            metrics.write_snapshot()  # a few KB; done on the loop so no metric changes mid-copy
+        except OSError as e:
+            print(f"Metrics sync error: {e}")
+
+
+AUDIT_STORE.seed([
+    {"id": f"log_{uuid.uuid4().hex[:8]}", "action": "LOGIN", "timestamp": datetime.now(), "details": "User logged in", "actor": "User"},
+    {"id": f"log_{uuid.uuid4().hex[:8]}", "action": "VIEW_PORTFOLIO", "timestamp": datetime.now(), "details": "Portfolio accessed", "actor": "User"},
+])
+
+
+def build_pending_order(ticker: str, result: dict, user_id: str = "demo") -> dict:
+    """Turn a super_agent verdict into a pending order recommendation."""
+    top_features = [{"name": d, "score": 0.3} for d in result.get("drivers", [])[:3]]
+    return {
+        "order_id": f"ord_{uuid.uuid4().hex[:8]}",
+        "symbol": ticker,
+        "user_id": user_id,
+        "side": result.get("action", "HOLD").lower() if result.get("action") != "HOLD" else "hold",
+        "quantity": 10,  # Default quantity for demo
+        "confidence": result.get("confidence", 0.5),
+        "explanation": result.get("explanation", "No explanation"),
+        "top_features": top_features,
+        "created_at": datetime.now().isoformat(),
+        "raw_payload": {
+            "symbol": ticker,
+            "side": result.get("action", "HOLD").lower(),
+            "confidence": result.get("confidence", 0.5),
+            "explanation": result.get("explanation", ""),
+            "top_features": top_features,
+            "partial": result.get("partial", False),
+            "cache_status": result.get("cache_status", "fresh"),
+            "timings": result.get("timings"),
+            "prompt_stats": result.get("prompt_stats")
+        }
+    }
+
+
+def build_stock_analysis(symbol: str, result: dict) -> StockAnalysis:
+    """Turn a super_agent verdict into the StockAnalysis response model."""
+    return StockAnalysis(
+        symbol=symbol.upper(),
+        recommendation=result.get("action", "HOLD"),
+        confidence_score=float(result.get("confidence", 0.5)),
+        analysis_date=datetime.now(),
+        summary=result.get("explanation", "No analysis available"),
+        partial=result.get("partial", False),
+        cache_status=result.get("cache_status", "fresh"),
+        timings=result.get("timings"),
+        prompt_stats=result.get("prompt_stats")
+    )
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def build_stock_details(ticker: str, snapshot: dict) -> StockDetails:
+    """StockDetails for a ticker from its Alpaca snapshot."""
+    current_price = snapshot_price(snapshot)
+    return StockDetails(
+        symbol=ticker,
+        company_name=ticker,
+        current_price=current_price,
+        sector="Technology",
+        pe_ratio=None,
+        change_pct=snapshot_change_pct(snapshot, current_price),
+        description=f"Market data for {ticker}",
+        stale=bool(snapshot.get("stale")),
+    )
 
 
 # ---------------------- Root Endpoint ------------------------ #
@@ -386,33 +1135,19 @@ async def root():
 # --- Portfolio Endpoints ---
 
 @api_router.get("/portfolio/", response_model=Dict[str, Any], tags=["Portfolio"])
-async def get_portfolio_api():
-    """Get current portfolio positions from Alpaca."""
-    url = f"{ALPACA_TRADING_URL}/positions"
-    headers = {
-        "APCA-API-KEY-ID": ALPACA_API_KEY,
-        "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY
-    }
-    
+async def get_portfolio_api(request: Request):
+    """
+    Get current portfolio positions from Alpaca. Positions are cached for
+    POSITIONS_CACHE_TTL seconds; the response has an ETag, and a matching
+    If-None-Match gets 304 Not Modified.
+    """
     try:
-        positions = await asyncio.to_thread(_sync_get, url, headers, None, 30)
-        
-        # Transform Alpaca response
-        result = []
-        for pos in positions:
-            result.append({
-                "symbol": pos.get("symbol", ""),
-                "qty": float(pos.get("qty", 0)),
-                "avg_entry_price": float(pos.get("avg_entry_price", 0)),
-                "market_value": float(pos.get("market_value", 0)),
-                "current_price": float(pos.get("current_price", 0)),
-                "unrealized_pl": float(pos.get("unrealized_pl", 0))
-            })
-        return {"positions": result, "holdings": result}
-    except requests.HTTPError as e:
+        etag, body = await fetch_portfolio()
+        return etags.versioned_json(request, etag, body)
+    except httpx.HTTPStatusError as e:
         # Return empty portfolio on error (e.g., no positions)
         return {"positions": [], "holdings": []}
-    except requests.RequestException as e:
+    except httpx.RequestError as e:
         raise HTTPException(status_code=502, detail=f"Alpaca connection error: {str(e)}")
 
 
@@ -422,30 +1157,20 @@ async def get_portfolio_api():
 async def search_ticker(query: str = Query(..., description="Company name or ticker to search")):
     """Search for a stock by company name and get details."""
     snapshot, ticker = await get_direct_stock_details(query)
-    
-    # Extract current price from Alpaca snapshot
-    current_price = 0.0
-    change_pct = 0.0
-    
-    if "latestTrade" in snapshot and "p" in snapshot["latestTrade"]:
-        current_price = float(snapshot["latestTrade"]["p"])
-    elif "latestQuote" in snapshot and "ap" in snapshot["latestQuote"]:
-        current_price = float(snapshot["latestQuote"]["ap"])
-    
-    if "dailyBar" in snapshot:
-        daily = snapshot["dailyBar"]
-        if "o" in daily and daily["o"] > 0:
-            change_pct = ((current_price - daily["o"]) / daily["o"]) * 100
-    
-    return StockDetails(
-        symbol=ticker,
-        company_name=query,
-        current_price=current_price,
-        sector="Technology",  # Default for demo
-        pe_ratio=None,
-        change_pct=round(change_pct, 2),
-        description=f"Stock details for {query}"
-    )
+    listing = SYMBOL_DIRECTORY.get(ticker)
+    return build_stock_details(ticker, snapshot).model_copy(update={
+        "company_name": listing["name"] if listing else query,
+        "description": f"Stock details for {query}",
+    })
+
+
+@api_router.get("/search/suggest", response_model=Dict[str, Any], tags=["Search"])
+async def suggest_tickers(
+    q: str = Query(..., description="Partial company name or ticker"),
+    limit: int = Query(8, ge=1, le=50, description="Maximum number of candidates")
+):
+    """Typeahead: ranked ticker candidates from the local symbol index (no upstream calls)."""
+    return {"query": q, "results": SYMBOL_DIRECTORY.search(q, limit)}
 
 
 @api_router.get("/stock/{ticker}", response_model=StockDetails, tags=["Search"])
@@ -453,46 +1178,63 @@ async def get_stock_details(ticker: str):
     """Get stock details by ticker symbol."""
     try:
         snapshot = await get_market_data(ticker.upper())
-        
-        current_price = 0.0
-        change_pct = 0.0
-        
-        if "latestTrade" in snapshot and "p" in snapshot["latestTrade"]:
-            current_price = float(snapshot["latestTrade"]["p"])
-        elif "latestQuote" in snapshot and "ap" in snapshot["latestQuote"]:
-            current_price = float(snapshot["latestQuote"]["ap"])
-        
-        if "dailyBar" in snapshot:
-            daily = snapshot["dailyBar"]
-            if "o" in daily and daily["o"] > 0:
-                change_pct = ((current_price - daily["o"]) / daily["o"]) * 100
-        
-        return StockDetails(
-            symbol=ticker.upper(),
-            company_name=ticker.upper(),
-            current_price=current_price,
-            sector="Technology",
-            pe_ratio=None,
-            change_pct=round(change_pct, 2),
-            description=f"Market data for {ticker.upper()}"
-        )
+        return build_stock_details(ticker.upper(), snapshot)
+    except HTTPException as e:
+        if e.status_code == 503:
+            raise  # circuit open and nothing cached: unavailable, not unknown
+        raise HTTPException(status_code=404, detail=f"Stock not found: {ticker}")
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Stock not found: {ticker}")
 
 
+@api_router.get("/stocks", response_model=BatchStockDetails, tags=["Search"])
+async def get_stocks_batch(
+    symbols: List[str] = Query(..., description="Ticker symbols, comma-separated and/or repeated")
+):
+    """
+    Get stock details for many symbols at once. Uncached symbols are fetched with
+    Alpaca multi-symbol snapshot requests; failures are reported per symbol.
+    """
+    tickers = list(dict.fromkeys(
+        t.strip().upper() for value in symbols for t in value.split(",") if t.strip()
+    ))
+    if len(tickers) > BATCH_MAX_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_SYMBOLS} symbols per request")
+    
+    snapshots, errors = await get_market_data_batch(tickers)
+    return BatchStockDetails(
+        results={t: build_stock_details(t, snapshots[t]) for t in tickers if t in snapshots},
+        errors=errors
+    )
+
+
 # --- Pending Orders Endpoints ---
 
-@api_router.get("/orders/pending", response_model=Dict[str, List[Dict]], tags=["Orders"])
-async def get_pending_orders():
-    """Get all pending orders awaiting user confirmation."""
-    return {"pending_orders": PENDING_ORDERS}
+@api_router.get("/orders/pending", response_model=Dict[str, Any], tags=["Orders"])
+async def get_pending_orders(
+    request: Request,
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[int] = Query(None, description="Cursor from next_cursor of the previous page"),
+    symbol: Optional[str] = None,
+    user_id: Optional[str] = None,
+):
+    """
+    Get pending orders awaiting user confirmation, oldest first. Expired
+    recommendations are dropped; follow next_cursor (as `after`) for more.
+    Unchanged pages answer If-None-Match with 304 Not Modified.
+    """
+    page, next_cursor = await asyncio.to_thread(
+        PENDING_ORDERS.page, limit, after, symbol.upper() if symbol else None, user_id
+    )
+    return etags.conditional_json(request, {"pending_orders": page, "next_cursor": next_cursor})
 
 
 # --- Agent Endpoints ---
 
 @api_router.post("/agent/", response_model=Dict[str, Any], tags=["Agent"])
-async def run_agent(request: AgentRequest = Body(...)):
+async def run_agent(http_request: Request, request: AgentRequest = Body(...)):
     """Run the AI agent to analyze portfolio and generate recommendations."""
+    rate_limit.set_priority(rate_limit.BACKGROUND)  # batch work yields to search and trades
     try:
         # Get current portfolio
         url = f"{ALPACA_TRADING_URL}/positions"
@@ -501,48 +1243,40 @@ async def run_agent(request: AgentRequest = Body(...)):
             "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY
         }
         
-        try:
-            positions = await asyncio.to_thread(_sync_get, url, headers, None, 30)
-        except:
-            positions = []
+        with tracing.span("resolve_portfolio") as span:
+            try:
+                positions = await http_clients.get_client(ALPACA_TRADING).get(url, headers, None, 30)
+            except:
+                positions = []
+            span.set(positions=len(positions))
         
         recommendations = []
         
         # Analyze each position or use default tickers
         tickers_to_analyze = [p.get("symbol") for p in positions] if positions else ["AAPL", "MSFT", "GOOGL"]
         
-        for ticker in tickers_to_analyze[:3]:  # Limit to 3 for demo speed
-            try:
-                result = await super_agent(ticker)
-                
-                # Create pending order
-                order_id = f"ord_{uuid.uuid4().hex[:8]}"
-                pending = {
-                    "order_id": order_id,
-                    "symbol": ticker,
-                    "side": result.get("action", "HOLD").lower() if result.get("action") != "HOLD" else "hold",
-                    "quantity": 10,  # Default quantity for demo
-                    "confidence": result.get("confidence", 0.5),
-                    "explanation": result.get("explanation", "No explanation"),
-                    "top_features": [{"name": d, "score": 0.3} for d in result.get("drivers", [])[:3]],
-                    "created_at": datetime.now().isoformat(),
-                    "raw_payload": {
-                        "symbol": ticker,
-                        "side": result.get("action", "HOLD").lower(),
-                        "confidence": result.get("confidence", 0.5),
-                        "explanation": result.get("explanation", ""),
-                        "top_features": [{"name": d, "score": 0.3} for d in result.get("drivers", [])[:3]]
-                    }
-                }
-                
-                # Only add buy/sell recommendations to pending
-                if result.get("action") in ["BUY", "SELL"]:
-                    PENDING_ORDERS.append(pending)
-                
-                recommendations.append(pending)
-            except Exception as e:
-                print(f"Error analyzing {ticker}: {e}")
+        cancelled = 0
+        for ticker, result in await run_agent_batch(tickers_to_analyze, http_request):
+            if isinstance(result, asyncio.CancelledError):
+                cancelled += 1
+                continue
+            if isinstance(result, asyncio.TimeoutError):
+                print(f"Error analyzing {ticker}: timed out after {AGENT_TICKER_TIMEOUT}s")
+                continue
+            if isinstance(result, BaseException):
+                print(f"Error analyzing {ticker}: {result}")
                 continue
+            
+            pending = build_pending_order(ticker, result, request.user_id)
+            
+            # Only add buy/sell recommendations to pending
+            if result.get("action") in ["BUY", "SELL"]:
+                await asyncio.to_thread(PENDING_ORDERS.add, pending)
+            
+            recommendations.append(pending)
+        
+        if cancelled:
+            print(f"Agent run: client disconnected, cancelled {cancelled} of {len(tickers_to_analyze)} analyses")
         
         # Add audit entry
         add_audit_entry("AGENT_RUN", f"Agent analyzed {len(recommendations)} stocks", "Agent")
@@ -556,19 +1290,117 @@ async def run_agent(request: AgentRequest = Body(...)):
         raise HTTPException(status_code=500, detail=f"Agent error: {str(e)}")
 
 
+# --- Streaming Endpoints (Server-Sent Events) ---
+
+@api_router.get("/get_agent_analysis/stream", tags=["Analysis"])
+async def stream_agent_analysis(symbol: str = Query(..., description="Stock symbol to analyze")):
+    """
+    Stream an analysis as SSE: start, market_data, news, token (LLM deltas),
+    verdict (StockAnalysis), then done; error replaces the rest on failure.
+    """
+    ticker = symbol.upper()
+
+    async def events():
+        yield sse_event("start", {"symbol": ticker})
+        try:
+            async for event, data in super_agent_stream(ticker):
+                if event == "verdict":
+                    data = build_stock_analysis(ticker, data).model_dump(mode="json")
+                yield sse_event(event, data)
+        except HTTPException as e:
+            yield sse_event("error", {"symbol": ticker, "status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            print(f"Error analyzing {ticker}: {e}")
+            yield sse_event("error", {"symbol": ticker, "status_code": 500, "detail": f"Analysis error: {str(e)}"})
+        yield sse_event("done", {"symbol": ticker})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@api_router.post("/agent/stream", tags=["Agent"])
+async def stream_agent(request: AgentRequest = Body(...)):
+    """
+    Streaming /api/agent/: analyses run concurrently and their events are
+    interleaved on one SSE stream, each tagged with its symbol. Every finished
+    ticker emits a recommendation event; the stream ends with done.
+    """
+    rate_limit.set_priority(rate_limit.BACKGROUND)  # batch work yields to search and trades
+    url = f"{ALPACA_TRADING_URL}/positions"
+    headers = {
+        "APCA-API-KEY-ID": ALPACA_API_KEY,
+        "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY
+    }
+    with tracing.span("resolve_portfolio") as span:
+        try:
+            positions = await http_clients.get_client(ALPACA_TRADING).get(url, headers, None, 30)
+        except Exception:
+            positions = []
+        span.set(positions=len(positions))
+    tickers_to_analyze = [p.get("symbol") for p in positions] if positions else ["AAPL", "MSFT", "GOOGL"]
+
+    async def events():
+        queue: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(AGENT_CONCURRENCY)
+        recommendations = []
+
+        async def analyze(ticker: str):
+            async def run():
+                async for event, data in super_agent_stream(ticker):
+                    if event == "verdict":
+                        pending = build_pending_order(ticker, data, request.user_id)
+                        if data.get("action") in ["BUY", "SELL"]:
+                            await asyncio.to_thread(PENDING_ORDERS.add, pending)
+                        recommendations.append(pending)
+                        event, data = "recommendation", pending
+                    await queue.put((event, data))
+
+            async with semaphore:
+                try:
+                    await asyncio.wait_for(run(), AGENT_TICKER_TIMEOUT)
+                except asyncio.TimeoutError:
+                    await queue.put(("error", {"symbol": ticker, "detail": f"Timed out after {AGENT_TICKER_TIMEOUT}s"}))
+                except HTTPException as e:
+                    await queue.put(("error", {"symbol": ticker, "status_code": e.status_code, "detail": e.detail}))
+                except Exception as e:
+                    print(f"Error analyzing {ticker}: {e}")
+                    await queue.put(("error", {"symbol": ticker, "status_code": 500, "detail": f"Analysis error: {str(e)}"}))
+
+        yield sse_event("start", {"tickers": tickers_to_analyze})
+        tasks = [asyncio.create_task(analyze(t)) for t in tickers_to_analyze]
+        finished = asyncio.gather(*tasks, return_exceptions=True)
+        finished.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield sse_event(*item)
+        finally:
+            # Client disconnects cancel this generator; stop outstanding analyses too
+            for task in tasks:
+                task.cancel()
+
+        add_audit_entry("AGENT_RUN", f"Agent analyzed {len(recommendations)} stocks", "Agent")
+        yield sse_event("done", {
+            "status": "success",
+            "message": f"Analyzed {len(recommendations)} positions",
+            "count": len(recommendations)
+        })
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 # --- Trade Confirmation Endpoints ---
 
 @api_router.post("/trade/confirm", response_model=Dict[str, Any], tags=["Trading"])
 async def confirm_trade(request: TradeConfirmRequest = Body(...)):
     """Confirm or reject a pending trade recommendation."""
-    # Find the pending order
-    order = None
-    order_index = -1
-    for i, o in enumerate(PENDING_ORDERS):
-        if o["order_id"] == request.order_id:
-            order = o
-            order_index = i
-            break
+    rate_limit.set_priority(rate_limit.TRADE)
+    # Claim the order: it leaves the pending set now, so a second confirm cannot execute it again
+    try:
+        order = await asyncio.to_thread(PENDING_ORDERS.claim, request.order_id)
+    except orders.OrderClaimedError:
+        raise HTTPException(status_code=409, detail="Order is already being processed")
     
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -576,13 +1408,6 @@ async def confirm_trade(request: TradeConfirmRequest = Body(...)):
     if request.confirm:
         # Execute the trade via Alpaca
         if order["side"] in ["buy", "sell"]:
-            url = f"{ALPACA_TRADING_URL}/orders"
-            headers = {
-                "APCA-API-KEY-ID": ALPACA_API_KEY,
-                "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY,
-                "Content-Type": "application/json"
-            }
-            
             order_payload = {
                 "symbol": order["symbol"],
                 "qty": str(order["quantity"]),
@@ -592,28 +1417,9 @@ async def confirm_trade(request: TradeConfirmRequest = Body(...)):
             }
             
             try:
-                alpaca_response = await asyncio.to_thread(_sync_post, url, headers, order_payload, 30)
-                
-                # Remove from pending
-                PENDING_ORDERS.pop(order_index)
-                
-                # Add audit entry
-                add_audit_entry(
-                    "APPROVE",
-                    f"Approved {order['side'].upper()} {order['quantity']} {order['symbol']}",
-                    "User"
-                )
-                
-                # Award points
-                if "demo" in USER_POINTS:
-                    USER_POINTS["demo"]["points"] += 10
-                
-                return {
-                    "status": "executed",
-                    "order_id": alpaca_response.get("id", order["order_id"]),
-                    "message": f"Successfully executed {order['side']} order for {order['symbol']}"
-                }
-            except requests.HTTPError as e:
+                alpaca_response = await place_order(order_payload)
+            except httpx.HTTPStatusError as e:
+                await asyncio.to_thread(PENDING_ORDERS.release, order["order_id"])  # still pending; the user can retry
                 error_detail = "Trade execution failed"
                 try:
                     error_body = e.response.json()
@@ -621,14 +1427,35 @@ async def confirm_trade(request: TradeConfirmRequest = Body(...)):
                 except:
                     pass
                 raise HTTPException(status_code=400, detail=error_detail)
+            except BaseException:
+                await asyncio.to_thread(PENDING_ORDERS.release, order["order_id"])
+                raise
+            
+            await asyncio.to_thread(PENDING_ORDERS.complete, order["order_id"])
+            
+            # Add audit entry
+            add_audit_entry(
+                "APPROVE",
+                f"Approved {order['side'].upper()} {order['quantity']} {order['symbol']}",
+                "User"
+            )
+            
+            # Award points
+            STORAGE.add_points("demo", 10)
+            
+            return {
+                "status": "executed",
+                "order_id": alpaca_response.get("id", order["order_id"]),
+                "message": f"Successfully executed {order['side']} order for {order['symbol']}"
+            }
         else:
             # HOLD action - just acknowledge
-            PENDING_ORDERS.pop(order_index)
+            await asyncio.to_thread(PENDING_ORDERS.complete, order["order_id"])
             add_audit_entry("APPROVE", f"Acknowledged HOLD for {order['symbol']}", "User")
             return {"status": "acknowledged", "message": "Hold recommendation acknowledged"}
     else:
         # Reject/Cancel the recommendation
-        PENDING_ORDERS.pop(order_index)
+        await asyncio.to_thread(PENDING_ORDERS.complete, order["order_id"])
         add_audit_entry(
             "OVERRIDE",
             f"Rejected {order['side'].upper()} recommendation for {order['symbol']}",
@@ -640,14 +1467,15 @@ async def confirm_trade(request: TradeConfirmRequest = Body(...)):
 # --- Gamification Endpoints ---
 
 @api_router.get("/game/points", response_model=GamePoints, tags=["Gamification"])
-async def get_points():
-    """Get user's gamification points and badges."""
-    user_data = USER_POINTS.get("demo", {"points": 0, "badges": [], "streak": 0})
-    return GamePoints(
+async def get_points(request: Request):
+    """Get user's gamification points and badges (304 Not Modified if unchanged)."""
+    user_data = await asyncio.to_thread(STORAGE.get_points, "demo") or {"points": 0, "badges": [], "streak": 0}
+    points = GamePoints(
         points=user_data.get("points", 0),
         badges=user_data.get("badges", []),
         streak=user_data.get("streak", 0)
     )
+    return etags.conditional_json(request, points.model_dump(mode="json"))
 
 
 # --- Learning Endpoints ---
@@ -656,17 +1484,141 @@ async def get_points():
 async def get_daily_lesson():
     """Get today's learning content."""
     # Rotate lessons based on day
-    day_index = datetime.now().day % len(DAILY_LESSONS)
-    lesson = DAILY_LESSONS[day_index]
+    lessons = await asyncio.to_thread(STORAGE.get_lessons)
+    day_index = datetime.now().day % len(lessons)
+    lesson = lessons[day_index]
     return DailyLesson(**lesson)
 
 
 # --- Audit Endpoints ---
 
 @api_router.get("/audit", response_model=List[AuditLog], tags=["Compliance"])
-async def get_audit_api(limit: int = 50):
-    """Get system audit logs with hash chain."""
-    return [AuditLog(**log) for log in AUDIT_LOGS[-limit:]]
+async def get_audit_api(
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=AUDIT_EXPORT_MAX_ROWS, description="At most 1000 unless format=ndjson"),
+    before: Optional[int] = Query(None, description="Cursor from X-Next-Cursor: return entries older than this"),
+    action: Optional[str] = None,
+    actor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    format: Literal["json", "ndjson"] = Query("json", description="ndjson: stream one entry per line, newest first"),
+):
+    """
+    Get system audit logs with hash chain, most recent page first.
+    Follow X-Next-Cursor (passed as `before`) to page back through older entries.
+    """
+    return await query_audit_log(
+        request, response, newest_first=True, format=format, limit=limit, before=before,
+        action=action, actor=actor, since=since, until=until,
+    )
+
+
+@api_router.get("/audit/verify", response_model=AuditVerification, tags=["Compliance"])
+async def verify_audit(full: bool = Query(False, description="Re-verify every block instead of only entries after the last checkpoint")):
+    """
+    Verify the audit hash chain. Returns the first broken link, if any, and timing.
+    Complete blocks that verify are sealed into signed Merkle-root checkpoints.
+    """
+    return await verify_audit_log(full)
+
+
+@api_router.get("/audit/proof/{entry_id}", response_model=AuditInclusionProof, tags=["Compliance"])
+async def get_audit_proof(entry_id: str):
+    """
+    Merkle inclusion proof for one audit entry: O(log n) sibling hashes from the
+    entry's leaf to the signed root. Check it with audit_integrity.verify_entry_proof.
+    """
+    if AUDIT_STORE.pending:
+        await asyncio.to_thread(AUDIT_STORE.flush)
+    proof = await asyncio.to_thread(AUDIT_STORE.inclusion_proof, entry_id)
+    if proof is None:
+        raise HTTPException(status_code=404, detail=f"Audit entry {entry_id} not found")
+    proof["root_signature"] = AUDIT_VERIFIER.sign_root(proof["tree_size"], proof["root"])
+    return proof
+
+
+# --- Price Streaming Endpoints ---
+
+@api_router.websocket("/ws/prices")
+async def prices_websocket(websocket: WebSocket):
+    """
+    Push price updates. Send {"action": "subscribe", "symbols": ["AAPL"]} to start;
+    quote messages carry only the fields that changed since the last update.
+    """
+    await price_hub.serve_client(PRICE_HUB, websocket)
+
+
+@api_router.get("/prices/stats", response_model=Dict[str, Any], tags=["System"])
+async def get_price_hub_stats():
+    """Get the number of live symbol feeds and connected price stream clients."""
+    return PRICE_HUB.stats()
+
+
+# --- System Endpoints ---
+
+CACHE_HITS = metrics.Counter("cache_hits_total", "Cache lookups served from the cache (incl. coalesced)", ("cache",))
+CACHE_MISSES = metrics.Counter("cache_misses_total", "Cache lookups that ran the loader", ("cache",))
+CACHE_HIT_RATIO = metrics.Gauge("cache_hit_ratio", "Hits / lookups since start", ("cache",))
+CACHE_ENTRIES = metrics.Gauge("cache_entries", "Entries held (including expired ones kept for stale fallback)", ("cache",))
+
+
+@metrics.collector
+def _collect_caches():
+    for name, stats in caches.cache_stats().items():
+        labels = (name,)
+        CACHE_HITS.set(labels, stats["hits"] + stats.get("coalesced", 0))
+        CACHE_MISSES.set(labels, stats["misses"])
+        CACHE_HIT_RATIO.set(labels, stats["hit_ratio"])
+        CACHE_ENTRIES.set(labels, stats["entries"])
+
+
+AUDIT_PENDING = metrics.Gauge("audit_pending_entries", "Audit entries queued but not yet committed")
+AUDIT_RETRIES = metrics.Counter("audit_commit_retries_total", "Audit batch commits retried after a database error")
+AUDIT_REJECTED = metrics.Counter("audit_rejected_entries_total", "Audit entries the database refused to commit")
+
+
+@metrics.collector
+def _collect_audit():
+    AUDIT_PENDING.set((), AUDIT_STORE.pending)
+    AUDIT_RETRIES.set((), AUDIT_STORE.retries)
+    AUDIT_REJECTED.set((), AUDIT_STORE.rejected)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus scrape endpoint (all workers' totals when running with --workers)."""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@api_router.get("/cache/stats", response_model=Dict[str, Any], tags=["System"])
+async def get_cache_stats():
+    """Get hit/miss counters and sizes for the in-process caches."""
+    return caches.cache_stats()
+
+
+@api_router.get("/upstreams/stats", response_model=Dict[str, Any], tags=["System"])
+async def get_upstream_stats():
+    """Get connection pool and rate limiter state per upstream API."""
+    return http_clients.client_stats()
+
+
+@api_router.get("/health", response_model=Dict[str, Any], tags=["System"])
+async def get_health():
+    """
+    Liveness plus circuit breaker state per upstream. "degraded" means at least
+    one upstream's circuit is not closed; affected endpoints then serve stale or
+    fallback data (or fail fast with 503) instead of waiting on the upstream.
+    """
+    circuits = http_clients.circuit_states()
+    degraded = any(c["state"] != resilience.CLOSED for c in circuits.values())
+    return {"status": "degraded" if degraded else "ok", "upstreams": circuits}
+
+
+@api_router.get("/storage/stats", response_model=Dict[str, Any], tags=["System"])
+async def get_storage_stats():
+    """Get the storage backend, its connection pool and pending-order counts."""
+    return await asyncio.to_thread(STORAGE.stats)
 
 
 # --- Legacy Endpoints (for backwards compatibility) ---
@@ -674,80 +1626,69 @@ async def get_audit_api(limit: int = 50):
 @api_router.get("/get_agent_analysis", response_model=StockAnalysis, tags=["Analysis"])
 async def get_agent_analysis(symbol: str = Query(..., description="Stock symbol to analyze")):
     """Get AI-powered stock analysis with buy/sell/hold recommendation."""
-    result = await super_agent(symbol)
-    
-    return StockAnalysis(
-        symbol=symbol.upper(),
-        recommendation=result.get("action", "HOLD"),
-        confidence_score=float(result.get("confidence", 0.5)),
-        analysis_date=datetime.now(),
-        summary=result.get("explanation", "No analysis available")
-    )
+    ticker = symbol.upper()  # one snapshot cache entry and single-flight load per symbol, whatever the case
+    result = await super_agent(ticker)
+    return build_stock_analysis(ticker, result)
 
 
 @api_router.get("/get_details_search_stock", response_model=StockDetails, tags=["Market Data"])
 async def get_details_search_stock(query: str = Query(..., description="Company name or ticker to search")):
     """Get stock details by company name or ticker symbol."""
     snapshot, ticker = await get_direct_stock_details(query)
-    
-    current_price = 0.0
-    if "latestTrade" in snapshot and "p" in snapshot["latestTrade"]:
-        current_price = float(snapshot["latestTrade"]["p"])
-    elif "latestQuote" in snapshot and "ap" in snapshot["latestQuote"]:
-        current_price = float(snapshot["latestQuote"]["ap"])
-    
     return StockDetails(
         symbol=ticker,
         company_name=query,
-        current_price=current_price,
+        current_price=snapshot_price(snapshot),
         sector=None,
-        pe_ratio=None
+        pe_ratio=None,
+        stale=bool(snapshot.get("stale")),
     )
 
 
 @api_router.get("/get_portfolio", response_model=List[PortfolioPosition], tags=["Account"])
 async def get_portfolio():
     """Get current portfolio positions from Alpaca."""
-    url = f"{ALPACA_TRADING_URL}/positions"
-    headers = {
-        "APCA-API-KEY-ID": ALPACA_API_KEY,
-        "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY
-    }
-    
     try:
-        positions = await asyncio.to_thread(_sync_get, url, headers, None, 30)
+        positions = await fetch_positions()
         
-        result = []
-        for pos in positions:
-            result.append(PortfolioPosition(
-                symbol=pos.get("symbol", ""),
-                quantity=float(pos.get("qty", 0)),
-                average_price=float(pos.get("avg_entry_price", 0)),
-                current_value=float(pos.get("market_value", 0))
-            ))
-        return result
-    except requests.HTTPError as e:
+        result = [{
+            "symbol": str(pos.get("symbol", "")),
+            "quantity": float(pos.get("qty", 0)),
+            "average_price": float(pos.get("avg_entry_price", 0)),
+            "current_value": float(pos.get("market_value", 0))
+        } for pos in positions]
+        if serialization.FAST_SERIALIZATION:
+            return serialization.FastJSONResponse(result)  # fields are already converted; skip response_model
+        return [PortfolioPosition(**position) for position in result]
+    except httpx.HTTPStatusError as e:
         return []
-    except requests.RequestException as e:
+    except httpx.RequestError as e:
         raise HTTPException(status_code=502, detail=f"Alpaca connection error: {str(e)}")
 
 
 @api_router.get("/get_audit", response_model=List[AuditLog], tags=["Compliance"])
-async def get_audit(limit: int = 10):
-    """Get system audit logs."""
-    return [AuditLog(**log) for log in AUDIT_LOGS[:limit]]
+async def get_audit(
+    request: Request,
+    response: Response,
+    limit: int = Query(10, ge=1, le=AUDIT_EXPORT_MAX_ROWS, description="At most 1000 unless format=ndjson"),
+    after: Optional[int] = Query(None, description="Cursor from X-Next-Cursor: return entries newer than this"),
+    action: Optional[str] = None,
+    actor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    format: Literal["json", "ndjson"] = Query("json", description="ndjson: stream one entry per line, oldest first"),
+):
+    """Get system audit logs, oldest first. Follow X-Next-Cursor (passed as `after`) to page forward."""
+    return await query_audit_log(
+        request, response, newest_first=False, format=format, limit=limit, after=after,
+        action=action, actor=actor, since=since, until=until,
+    )
 
 
 @api_router.post("/post_order", response_model=OrderResponse, tags=["Trading"])
 async def post_order(order: OrderRequest):
     """Place a new buy or sell order via Alpaca."""
-    url = f"{ALPACA_TRADING_URL}/orders"
-    headers = {
-        "APCA-API-KEY-ID": ALPACA_API_KEY,
-        "APCA-API-SECRET-KEY": ALPACA_SECRET_KEY,
-        "Content-Type": "application/json"
-    }
-    
+    rate_limit.set_priority(rate_limit.TRADE)
     order_payload = {
         "symbol": order.symbol.upper(),
         "qty": str(order.quantity),
@@ -760,7 +1701,7 @@ async def post_order(order: OrderRequest):
         order_payload["limit_price"] = str(order.limit_price)
     
     try:
-        alpaca_response = await asyncio.to_thread(_sync_post, url, headers, order_payload, 30)
+        alpaca_response = await place_order(order_payload)
         
         add_audit_entry(
             "ORDER_PLACED",
@@ -774,7 +1715,7 @@ async def post_order(order: OrderRequest):
             message=f"Successfully submitted {order.side} order for {order.quantity} shares of {order.symbol}",
             timestamp=datetime.now()
         )
-    except requests.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         error_detail = "Unknown error"
         try:
             error_body = e.response.json()
@@ -782,22 +1723,9 @@ async def post_order(order: OrderRequest):
         except Exception:
             error_detail = e.response.text
         raise HTTPException(status_code=e.response.status_code, detail=f"Order failed: {error_detail}")
-    except requests.RequestException as e:
+    except httpx.RequestError as e:
         raise HTTPException(status_code=502, detail=f"Alpaca connection error: {str(e)}")
 
 
 # Include the API router in the main app
 app.include_router(api_router)
-
-
-# ---------------------- Server Entry Point ------------------------ #
-
-if __name__ == "__main__":
-    print("=" * 50)
-    print("Starting Plutus Stock Trading Agent API")
-    print("=" * 50)
-    print("Server: http://localhost:8000")
-    print("API Docs: http://localhost:8000/docs")
-    print("API Base: http://localhost:8000/api")
-    print("=" * 50)
-    uvicorn.run(app, host="0.0.0.0", port=8000)
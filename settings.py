@@ -0,0 +1,19 @@
+"""
+Plutus - Shared Settings
+Settings read by more than one backend module. Importing this module has no
+side effects, so worker entry points and tools can use it freely.
+"""
+
+import os
+
+# Runtime state (SQLite database) lives here; the directory is not tracked by git
+PLUTUS_DATA_DIR = os.environ.get(
+    "PLUTUS_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+)
+PLUTUS_DB_PATH = os.environ.get("PLUTUS_DB_PATH", os.path.join(PLUTUS_DATA_DIR, "plutus.db"))
+
+
+def ensure_db_dir(db_path: str = PLUTUS_DB_PATH) -> str:
+    """Create the directory holding db_path if needed and return db_path."""
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    return db_path
@@ -0,0 +1,383 @@
+"""
+Plutus - Storage Backends
+Shared state for pending orders, user points and daily lessons behind one
+interface, so every uvicorn worker sees the same data. STORAGE_BACKEND picks
+the implementation: "sqlite" (default, multi-process safe) or "memory"
+(single process, state lost on restart).
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from orders import PENDING_ORDER_TTL, OrderClaimedError, PendingOrderStore
+
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "sqlite")
+STORAGE_POOL_SIZE = int(os.environ.get("STORAGE_POOL_SIZE", "8"))
+STORAGE_FLUSH_INTERVAL = float(os.environ.get("STORAGE_FLUSH_INTERVAL", "0.5"))
+
+# A claim older than this is treated as abandoned (worker died mid-confirmation)
+ORDER_CLAIM_TIMEOUT = float(os.environ.get("ORDER_CLAIM_TIMEOUT", "120"))
+
+
+class Storage:
+    """Interface implemented by every backend."""
+
+    pending_orders: Any  # add / get / claim / complete / release / page / stats
+
+    def get_points(self, user_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def add_points(self, user_id: str, delta: int):
+        """Credit points to an existing user; may be applied asynchronously."""
+        raise NotImplementedError
+
+    def get_lessons(self) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def flush(self):
+        """Write out anything buffered."""
+
+    def close(self):
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self).__name__, "pending_orders": self.pending_orders.stats()}
+
+
+# ---------------------- IN-MEMORY ------------------------ #
+class MemoryStorage(Storage):
+    """Process-local dictionaries; only suitable for a single worker."""
+
+    def __init__(self, points: Dict[str, Dict[str, Any]], lessons: List[Dict[str, Any]]):
+        self.pending_orders = PendingOrderStore()
+        self._points = {user: dict(data) for user, data in points.items()}
+        self._lessons = list(lessons)
+
+    def get_points(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return self._points.get(user_id)
+
+    def add_points(self, user_id: str, delta: int):
+        if user_id in self._points:
+            self._points[user_id]["points"] += delta
+
+    def get_lessons(self) -> List[Dict[str, Any]]:
+        return self._lessons
+
+
+# ---------------------- SQLITE ------------------------ #
+class SQLitePool:
+    """
+    Bounded pool of autocommit connections. sqlite3 keeps a per-connection cache
+    of prepared statements, so reusing connections with constant SQL text skips
+    re-parsing on every call.
+    """
+
+    def __init__(self, db_path: str, size: int = STORAGE_POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path, timeout=30, isolation_level=None, check_same_thread=False, cached_statements=256
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            conn = self._open() if create else self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """BEGIN IMMEDIATE: takes the write lock up front, so read-then-write is atomic across processes."""
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": self.size, "open": self._created, "idle": self._idle.qsize()}
+
+
+class SQLitePendingOrders:
+    """
+    Pending orders in SQLite, with the same interface as orders.PendingOrderStore.
+    A claim marks the row (claimed_at) inside a write transaction, so only one
+    request in any worker process can confirm a given order.
+    """
+
+    def __init__(self, pool: SQLitePool, ttl: float = PENDING_ORDER_TTL):
+        self.pool = pool
+        self.ttl = ttl
+        self.expired = 0
+        self.reclaimed = 0
+        with pool.connection() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS pending_orders (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    order_id TEXT NOT NULL UNIQUE,
+                    symbol TEXT NOT NULL,
+                    user_id TEXT,
+                    payload TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    claimed_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_pending_symbol ON pending_orders (symbol, seq);
+                CREATE INDEX IF NOT EXISTS idx_pending_user ON pending_orders (user_id, seq);
+                CREATE INDEX IF NOT EXISTS idx_pending_expires ON pending_orders (expires_at);
+                CREATE INDEX IF NOT EXISTS idx_pending_claimed ON pending_orders (claimed_at);
+            """)
+
+    def add(self, order: Dict[str, Any]) -> Dict[str, Any]:
+        expires_at = time.time() + self.ttl
+        order["expires_at"] = datetime.fromtimestamp(expires_at).isoformat()
+        with self.pool.connection() as conn:
+            conn.execute(
+                "INSERT INTO pending_orders (order_id, symbol, user_id, payload, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (order["order_id"], order["symbol"], order.get("user_id"), json.dumps(order, default=str), expires_at),
+            )
+        return order
+
+    def get(self, order_id: str) -> Optional[Dict[str, Any]]:
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT payload FROM pending_orders WHERE order_id = ? AND claimed_at IS NULL AND expires_at > ?",
+                (order_id, time.time()),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def claim(self, order_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self.pool.transaction() as conn:
+            row = conn.execute(
+                "SELECT payload, expires_at, claimed_at FROM pending_orders WHERE order_id = ?", (order_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            payload, expires_at, claimed_at = row
+            if claimed_at is not None and now - claimed_at < ORDER_CLAIM_TIMEOUT:
+                raise OrderClaimedError(order_id)
+            if claimed_at is None and expires_at <= now:
+                return None
+            conn.execute("UPDATE pending_orders SET claimed_at = ? WHERE order_id = ?", (now, order_id))
+        return json.loads(payload)
+
+    def complete(self, order_id: str):
+        with self.pool.connection() as conn:
+            conn.execute("DELETE FROM pending_orders WHERE order_id = ?", (order_id,))
+
+    def release(self, order_id: str):
+        with self.pool.connection() as conn:
+            conn.execute("UPDATE pending_orders SET claimed_at = NULL WHERE order_id = ?", (order_id,))
+
+    def purge_expired(self) -> int:
+        """
+        Delete expired orders and hand abandoned claims (older than
+        ORDER_CLAIM_TIMEOUT) back to the pending set, or delete them if they
+        expired meanwhile. Returns the number of orders deleted.
+        """
+        now = time.time()
+        with self.pool.transaction() as conn:
+            deleted = conn.execute(
+                "DELETE FROM pending_orders WHERE expires_at <= ? AND (claimed_at IS NULL OR claimed_at <= ?)",
+                (now, now - ORDER_CLAIM_TIMEOUT),
+            ).rowcount
+            reclaimed = conn.execute(
+                "UPDATE pending_orders SET claimed_at = NULL WHERE claimed_at <= ?", (now - ORDER_CLAIM_TIMEOUT,)
+            ).rowcount
+        self.expired += deleted
+        self.reclaimed += reclaimed
+        return deleted
+
+    def page(
+        self,
+        limit: int = 50,
+        after: Optional[int] = None,
+        symbol: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        clauses, params = ["claimed_at IS NULL", "expires_at > ?"], [time.time()]
+        if after is not None:
+            clauses.append("seq > ?")
+            params.append(after)
+        if symbol is not None:
+            clauses.append("symbol = ?")
+            params.append(symbol)
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        params.append(limit + 1)
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                f"SELECT seq, payload FROM pending_orders WHERE {' AND '.join(clauses)} ORDER BY seq LIMIT ?",
+                params,
+            ).fetchall()
+        page = rows[:limit]
+        next_cursor = page[-1][0] if len(rows) > limit else None
+        return [json.loads(payload) for _, payload in page], next_cursor
+
+    def __len__(self) -> int:
+        with self.pool.connection() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM pending_orders WHERE claimed_at IS NULL AND expires_at > ?", (time.time(),)
+            ).fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self.pool.connection() as conn:
+            claimed = conn.execute("SELECT COUNT(*) FROM pending_orders WHERE claimed_at IS NOT NULL").fetchone()[0]
+        return {"pending": len(self), "claimed": claimed, "expired": self.expired, "reclaimed": self.reclaimed,
+                "ttl_seconds": self.ttl}
+
+
+class SQLiteStorage(Storage):
+    """
+    SQLite-backed shared state. Orders are written through (claims must be seen
+    by every worker at once); point credits go to a write-behind buffer that a
+    background thread applies as additive updates, so concurrent workers never
+    overwrite each other's totals.
+    """
+
+    def __init__(self, db_path: str, points: Dict[str, Dict[str, Any]], lessons: List[Dict[str, Any]],
+                 pool_size: int = STORAGE_POOL_SIZE, flush_interval: float = STORAGE_FLUSH_INTERVAL):
+        self.pool = SQLitePool(db_path, pool_size)
+        self.flush_interval = flush_interval
+        with self.pool.transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS user_points (
+                    user_id TEXT PRIMARY KEY,
+                    points INTEGER NOT NULL,
+                    badges TEXT NOT NULL,
+                    streak INTEGER NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS daily_lessons (
+                    id TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    points_reward INTEGER NOT NULL
+                )
+            """)
+            # Seed defaults without touching existing rows
+            conn.executemany(
+                "INSERT OR IGNORE INTO user_points (user_id, points, badges, streak) VALUES (?, ?, ?, ?)",
+                [(user, d["points"], json.dumps(d["badges"]), d["streak"]) for user, d in points.items()],
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO daily_lessons (id, title, content, category, points_reward) "
+                "VALUES (:id, :title, :content, :category, :points_reward)",
+                lessons,
+            )
+        self.pending_orders = SQLitePendingOrders(self.pool)
+        self._lessons: Optional[List[Dict[str, Any]]] = None
+        self._point_deltas: Dict[str, int] = {}
+        self._buffer_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._run_flusher, name="storage-flusher", daemon=True)
+        self._flusher.start()
+
+    def get_points(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT points, badges, streak FROM user_points WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        with self._buffer_lock:
+            buffered = self._point_deltas.get(user_id, 0)
+        return {"points": row[0] + buffered, "badges": json.loads(row[1]), "streak": row[2]}
+
+    def add_points(self, user_id: str, delta: int):
+        with self._buffer_lock:
+            self._point_deltas[user_id] = self._point_deltas.get(user_id, 0) + delta
+
+    def get_lessons(self) -> List[Dict[str, Any]]:
+        # Lessons are reference data: read once per process
+        if self._lessons is None:
+            with self.pool.connection() as conn:
+                rows = conn.execute(
+                    "SELECT id, title, content, category, points_reward FROM daily_lessons ORDER BY id"
+                ).fetchall()
+            keys = ("id", "title", "content", "category", "points_reward")
+            self._lessons = [dict(zip(keys, row)) for row in rows]
+        return self._lessons
+
+    def flush(self):
+        with self._buffer_lock:
+            deltas, self._point_deltas = self._point_deltas, {}
+        if not deltas:
+            return
+        try:
+            with self.pool.transaction() as conn:
+                conn.executemany(
+                    "UPDATE user_points SET points = points + ? WHERE user_id = ?",
+                    [(delta, user) for user, delta in deltas.items()],
+                )
+        except sqlite3.Error:
+            with self._buffer_lock:  # keep the credits for the next attempt
+                for user, delta in deltas.items():
+                    self._point_deltas[user] = self._point_deltas.get(user, 0) + delta
+            raise
+
+    def _run_flusher(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                self.pending_orders.purge_expired()
+            except sqlite3.Error as e:
+                print(f"Storage flush error: {e}")
+
+    def close(self):
+        self._stop.set()
+        self._flusher.join(timeout=5)
+        self.flush()
+        self.pool.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._buffer_lock:
+            buffered = len(self._point_deltas)
+        return {**super().stats(), "pool": self.pool.stats(), "buffered_point_updates": buffered}
+
+
+def open_storage(db_path: str, points: Dict[str, Dict[str, Any]], lessons: List[Dict[str, Any]],
+                 backend: str = STORAGE_BACKEND) -> Storage:
+    """Create the configured backend, seeded with default points and lessons."""
+    if backend == "memory":
+        return MemoryStorage(points, lessons)
+    if backend == "sqlite":
+        return SQLiteStorage(db_path, points, lessons)
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}; use 'sqlite' or 'memory'")
@@ -0,0 +1,123 @@
+"""
+Plutus - Multi-Worker Supervisor
+Runs N uvicorn worker processes on one shared listening socket. Workers that
+die are respawned; SIGHUP performs a rolling restart (start a replacement,
+wait until its lifespan startup finished, then gracefully stop the old worker)
+so the API keeps serving throughout. SIGINT/SIGTERM stop every worker,
+letting in-flight requests finish.
+
+Shared state lives in SQLite (storage.py, audit_store.py, symbols.py), so any
+worker can serve any request. Per-process caches and price feeds are not shared.
+"""
+
+import multiprocessing
+import os
+import signal
+import threading
+from socket import socket
+from typing import List, Optional
+
+import uvicorn
+
+GRACEFUL_TIMEOUT = float(os.environ.get("GRACEFUL_TIMEOUT", "30"))
+WORKER_READY_TIMEOUT = float(os.environ.get("WORKER_READY_TIMEOUT", "60"))
+
+_spawn = multiprocessing.get_context("spawn")
+
+
+class _ReadyServer(uvicorn.Server):
+    """uvicorn Server that reports when it is accepting requests."""
+
+    def __init__(self, config: uvicorn.Config, ready):
+        super().__init__(config)
+        self.ready = ready
+
+    async def startup(self, sockets: Optional[List[socket]] = None):
+        await super().startup(sockets=sockets)
+        if not self.should_exit:
+            self.ready.set()
+
+
+def _run_worker(config: uvicorn.Config, sockets: List[socket], ready):
+    _ReadyServer(config, ready).run(sockets=sockets)
+
+
+class Worker:
+    def __init__(self, config: uvicorn.Config, sockets: List[socket]):
+        self.ready = _spawn.Event()
+        self.process = _spawn.Process(target=_run_worker, args=(config, sockets, self.ready), daemon=False)
+        self.process.start()
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid
+
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def stop(self, timeout: float = GRACEFUL_TIMEOUT):
+        """SIGTERM lets uvicorn drain in-flight requests; kill if it overruns."""
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout + 5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+
+
+class Supervisor:
+    def __init__(self, app: str, host: str, port: int, workers: int, graceful_timeout: float = GRACEFUL_TIMEOUT):
+        self.config = uvicorn.Config(
+            app, host=host, port=port, workers=workers, timeout_graceful_shutdown=graceful_timeout
+        )
+        self.size = workers
+        self.graceful_timeout = graceful_timeout
+        self.workers: List[Worker] = []
+        self._exit = threading.Event()
+        self._restart = threading.Event()
+
+    def run(self):
+        sock = self.config.bind_socket()
+        signal.signal(signal.SIGINT, lambda *_: self._exit.set())
+        signal.signal(signal.SIGTERM, lambda *_: self._exit.set())
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda *_: self._restart.set())
+
+        print(f"Supervisor [{os.getpid()}] starting {self.size} workers on {self.config.host}:{self.config.port}")
+        self.workers = [Worker(self.config, [sock]) for _ in range(self.size)]
+        try:
+            while not self._exit.wait(0.5):
+                if self._restart.is_set():
+                    self._restart.clear()
+                    self.rolling_restart([sock])
+                self._respawn_dead([sock])
+        finally:
+            print(f"Supervisor stopping {len(self.workers)} workers")
+            threads = [threading.Thread(target=w.stop, args=(self.graceful_timeout,)) for w in self.workers]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            sock.close()
+
+    def _respawn_dead(self, sockets: List[socket]):
+        for i, worker in enumerate(self.workers):
+            if not worker.alive() and not self._exit.is_set():
+                print(f"Worker [{worker.pid}] exited with code {worker.process.exitcode}; respawning")
+                self.workers[i] = Worker(self.config, sockets)
+
+    def rolling_restart(self, sockets: List[socket]):
+        """Replace workers one at a time; the old one stops only once its replacement is ready."""
+        print("Rolling restart")
+        for i, old in enumerate(list(self.workers)):
+            if self._exit.is_set():
+                return
+            new = Worker(self.config, sockets)
+            if not new.ready.wait(WORKER_READY_TIMEOUT):
+                print(f"Replacement for worker [{old.pid}] did not become ready; keeping the old one")
+                new.stop(0)
+                continue
+            self.workers[i] = new
+            old.stop(self.graceful_timeout)
+            print(f"Worker [{old.pid}] replaced by [{new.pid}]")
+
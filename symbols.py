@@ -0,0 +1,288 @@
+"""
+Plutus - Symbol Directory & Ticker Resolution Cache
+Resolves company names to ticker symbols without an LLM call when possible:
+a preloadable symbol directory file (symbol, name, aliases) with an in-memory
+search index (prefix, token and fuzzy matching), and an on-disk cache of past
+name -> symbol resolutions that survives restarts (written behind by a
+background thread, like caches.PersistentTTLCache).
+"""
+
+import bisect
+import csv
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+import settings
+
+SYMBOL_DIRECTORY_PATH = os.environ.get(
+    "SYMBOL_DIRECTORY_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "symbols.csv")
+)
+
+TICKER_PATTERN = re.compile(r"^[A-Z]{1,5}([.-][A-Z]{1,2})?$")
+
+# Corporate suffixes ignored when comparing company names ("Apple Inc." == "apple")
+NAME_SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "ltd", "limited",
+    "plc", "llc", "lp", "sa", "ag", "nv", "se", "holdings", "holding", "group",
+}
+
+
+def normalize_company_name(name: str) -> str:
+    """Lowercase, drop punctuation, collapse whitespace and strip corporate suffixes."""
+    text = re.sub(r"[^a-z0-9&\s]", " ", name.lower().replace("'", ""))
+    tokens = text.split()
+    if tokens and tokens[0] == "the" and len(tokens) > 1:
+        tokens = tokens[1:]
+    while len(tokens) > 1 and (tokens[-1] in NAME_SUFFIXES or tokens[-1] in ("&", "and")):
+        tokens.pop()
+    return " ".join(tokens)
+
+
+def looks_like_ticker(query: str) -> bool:
+    """True if the raw query is already written as a ticker symbol (e.g. AAPL, BRK.B)."""
+    return bool(TICKER_PATTERN.match(query.strip()))
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# ---------------------- SYMBOL DIRECTORY ------------------------ #
+class SymbolDirectory:
+    """
+    Listings loaded from a CSV file with columns: symbol, name, aliases (|-separated),
+    indexed for ranked typeahead search over symbols, names and aliases.
+    """
+
+    # Minimum trigram similarity for a fuzzy match to be returned
+    FUZZY_THRESHOLD = 0.35
+
+    def __init__(self):
+        self.listings: Dict[str, Dict[str, Any]] = {}
+        self.by_name: Dict[str, str] = {}
+        self._symbols: List[str] = []                # sorted, for symbol prefix search
+        self._labels: List[tuple] = []               # sorted (normalized label, symbol)
+        self._tokens: List[str] = []                 # sorted distinct label tokens
+        self._token_symbols: Dict[str, Set[str]] = {}
+        self._trigram_labels: Dict[str, Set[int]] = {}  # trigram -> indexes into _labels
+        self._dirty = False
+
+    def load(self, path: str = SYMBOL_DIRECTORY_PATH) -> int:
+        """Load listings from a CSV file. Returns the number of symbols loaded."""
+        if not path or not os.path.exists(path):
+            return 0
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                symbol = (row.get("symbol") or "").strip().upper()
+                name = (row.get("name") or "").strip()
+                if not symbol or not name:
+                    continue
+                aliases = [a.strip() for a in (row.get("aliases") or "").split("|") if a.strip()]
+                self.add(symbol, name, aliases)
+        self._build_index()
+        return len(self.listings)
+
+    def add(self, symbol: str, name: str, aliases: Optional[list] = None):
+        self.listings[symbol] = {"symbol": symbol, "name": name, "aliases": aliases or []}
+        for label in [name] + (aliases or []):
+            self.by_name.setdefault(normalize_company_name(label), symbol)
+        self._dirty = True
+
+    def has_symbol(self, symbol: str) -> bool:
+        return symbol.upper() in self.listings
+
+    def lookup_name(self, name: str) -> Optional[str]:
+        return self.by_name.get(normalize_company_name(name))
+
+    def get(self, symbol: str) -> Optional[Dict[str, Any]]:
+        return self.listings.get(symbol.upper())
+
+    # ---------------------- SEARCH INDEX ------------------------ #
+    def _build_index(self):
+        self._symbols = sorted(self.listings)
+        self._labels = sorted(self.by_name.items())
+        self._token_symbols = {}
+        self._trigram_labels = {}
+        for i, (label, symbol) in enumerate(self._labels):
+            for token in label.split():
+                self._token_symbols.setdefault(token, set()).add(symbol)
+            for gram in _trigrams(label):
+                self._trigram_labels.setdefault(gram, set()).add(i)
+        self._tokens = sorted(self._token_symbols)
+        self._dirty = False
+
+    @staticmethod
+    def _prefix_range(items: list, prefix, key=None) -> range:
+        """Index range of sorted items starting with prefix."""
+        lo = bisect.bisect_left(items, prefix, key=key)
+        hi = bisect.bisect_left(items, prefix + "\uffff", key=key)
+        return range(lo, hi)
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Ranked candidates for a query. Scores (0-1): exact symbol 1.0, exact name 0.95,
+        symbol prefix ~0.85, name prefix ~0.75, token prefix up to 0.65, fuzzy up to 0.5.
+        """
+        if self._dirty:
+            self._build_index()
+        raw = query.strip().upper()
+        norm = normalize_company_name(query)
+        if not raw:
+            return []
+        scores: Dict[str, tuple] = {}
+
+        def offer(symbol: str, score: float, match: str):
+            if score > scores.get(symbol, (0.0, ""))[0]:
+                scores[symbol] = (score, match)
+
+        if raw in self.listings:
+            offer(raw, 1.0, "symbol")
+        for i in self._prefix_range(self._symbols, raw):
+            symbol = self._symbols[i]
+            offer(symbol, 0.85 - 0.02 * (len(symbol) - len(raw)), "symbol_prefix")
+
+        if norm:
+            exact = self.by_name.get(norm)
+            if exact:
+                offer(exact, 0.95, "name")
+            for i in self._prefix_range(self._labels, norm, key=lambda item: item[0]):
+                label, symbol = self._labels[i]
+                offer(symbol, 0.75 - 0.1 * (1 - len(norm) / len(label)), "name_prefix")
+
+            # Every query token must prefix-match some token of the listing
+            query_tokens = norm.split()
+            matched: Optional[Set[str]] = None
+            for qt in query_tokens:
+                hits = set()
+                for i in self._prefix_range(self._tokens, qt):
+                    hits |= self._token_symbols[self._tokens[i]]
+                matched = hits if matched is None else matched & hits
+                if not matched:
+                    break
+            for symbol in matched or ():
+                offer(symbol, 0.65, "token")
+
+            # Fuzzy: trigram similarity, only if nothing better was found
+            if len(scores) < limit and len(norm) >= 3:
+                query_grams = _trigrams(norm)
+                counts: Dict[int, int] = {}
+                for gram in query_grams:
+                    for i in self._trigram_labels.get(gram, ()):
+                        counts[i] = counts.get(i, 0) + 1
+                for i, shared in counts.items():
+                    label, symbol = self._labels[i]
+                    similarity = 2 * shared / (len(query_grams) + len(_trigrams(label)))
+                    if similarity >= self.FUZZY_THRESHOLD:
+                        offer(symbol, 0.5 * similarity, "fuzzy")
+
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1][0], kv[0]))[:limit]
+        return [
+            {
+                "symbol": symbol,
+                "name": self.listings[symbol]["name"],
+                "score": round(score, 3),
+                "match": match,
+            }
+            for symbol, (score, match) in ranked
+        ]
+
+
+# ---------------------- PERSISTENT RESOLUTION CACHE ------------------------ #
+class TickerCache:
+    """
+    Normalized company name -> symbol mappings persisted in SQLite. Lookups and
+    set() only touch memory; new mappings are written every `flush_interval`
+    seconds by a background thread.
+    """
+
+    name = "ticker_resolutions"
+
+    def __init__(self, db_path: str = settings.PLUTUS_DB_PATH, flush_interval: float = 1.0):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()     # guards _pending
+        self._db_lock = threading.Lock()  # guards _conn
+        self._pending: Dict[str, tuple] = {}  # name -> (symbol, source, updated_at) to write
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ticker_resolutions (
+                name TEXT PRIMARY KEY,
+                symbol TEXT NOT NULL,
+                source TEXT,
+                updated_at TEXT
+            )
+        """)
+        self._conn.commit()
+        self._mappings: Dict[str, str] = dict(
+            self._conn.execute("SELECT name, symbol FROM ticker_resolutions").fetchall()
+        )
+        self.hits = 0
+        self.misses = 0
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._run_flusher, name="ticker-cache-flusher", daemon=True)
+        self._flusher.start()
+
+    def get(self, company_name: str) -> Optional[str]:
+        symbol = self._mappings.get(normalize_company_name(company_name))
+        if symbol is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return symbol
+
+    def set(self, company_name: str, symbol: str, source: str = "llm"):
+        key = normalize_company_name(company_name)
+        if not key:
+            return
+        self._mappings[key] = symbol
+        with self._lock:
+            self._pending[key] = (symbol, source, datetime.now().isoformat())
+
+    def flush(self):
+        """Write buffered mappings."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            with self._db_lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO ticker_resolutions (name, symbol, source, updated_at) VALUES (?, ?, ?, ?)",
+                    [(key, *row) for key, row in pending.items()],
+                )
+                self._conn.commit()
+        except sqlite3.Error:
+            with self._db_lock:
+                self._conn.rollback()
+            with self._lock:  # keep the writes for the next attempt unless superseded
+                for key, row in pending.items():
+                    self._pending.setdefault(key, row)
+            raise
+
+    def _run_flusher(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"Ticker cache flush error: {e}")
+
+    def close(self):
+        self._stop.set()
+        self._flusher.join(timeout=5)
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._mappings),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
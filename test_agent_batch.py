@@ -0,0 +1,63 @@
+"""
+Offline tests for server.run_agent_batch: tickers are analyzed concurrently up
+to AGENT_CONCURRENCY, results come back in input order with failures and
+per-ticker timeouts as exceptions, and a client disconnect cancels the rest.
+super_agent is replaced with a coroutine.
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+
+class Disconnected:
+    """Stand-in for a Request whose client has gone away."""
+
+    async def is_disconnected(self):
+        return True
+
+
+@pytest.fixture
+def agent(server, monkeypatch):
+    state = {"active": 0, "peak": 0, "started": []}
+
+    async def super_agent(ticker):
+        state["started"].append(ticker)
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        try:
+            if ticker == "FAIL":
+                raise HTTPException(status_code=404, detail="Symbol not found")
+            await asyncio.sleep(1.0 if ticker == "SLOW" else 0.05)
+            return {"ticker": ticker}
+        finally:
+            state["active"] -= 1
+
+    monkeypatch.setattr(server, "super_agent", super_agent)
+    return state
+
+
+def test_concurrency_is_bounded(server, agent, monkeypatch):
+    monkeypatch.setattr(server, "AGENT_CONCURRENCY", 3)
+    tickers = [f"T{i}" for i in range(10)]
+    results = asyncio.run(server.run_agent_batch(tickers))
+    assert agent["peak"] == 3
+    assert [ticker for ticker, _ in results] == tickers
+    assert all(result == {"ticker": ticker} for ticker, result in results)
+
+
+def test_failures_and_timeouts_are_returned_per_ticker(server, agent, monkeypatch):
+    monkeypatch.setattr(server, "AGENT_TICKER_TIMEOUT", 0.3)
+    results = dict(asyncio.run(server.run_agent_batch(["AAPL", "FAIL", "SLOW", "MSFT"])))
+    assert results["AAPL"] == {"ticker": "AAPL"} and results["MSFT"] == {"ticker": "MSFT"}
+    assert isinstance(results["FAIL"], HTTPException)
+    assert isinstance(results["SLOW"], asyncio.TimeoutError)
+
+
+def test_disconnect_cancels_outstanding_tickers(server, agent, monkeypatch):
+    monkeypatch.setattr(server, "AGENT_CONCURRENCY", 1)
+    tickers = ["SLOW"] * 5
+    results = asyncio.run(asyncio.wait_for(server.run_agent_batch(tickers, Disconnected()), 2))
+    assert all(isinstance(result, asyncio.CancelledError) for _, result in results)
+    assert len(agent["started"]) == 1  # the queued tickers never started
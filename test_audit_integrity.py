@@ -0,0 +1,168 @@
+"""
+Offline tests for audit_integrity.AuditVerifier: checkpoint sealing, incremental
+and full verification, and detection of tampered entries and checkpoints. Each
+test uses a temporary SQLite file.
+"""
+
+import sqlite3
+
+import pytest
+
+import audit_integrity
+from audit_integrity import AuditVerifier
+from audit_store import AuditStore
+
+BLOCK = 8
+
+
+@pytest.fixture
+def db_path(tmp_path, make_entry):
+    path = str(tmp_path / "audit.db")
+    store = AuditStore(path)
+    store.seed([make_entry(i) for i in range(3 * BLOCK + 3)])  # three complete blocks and a partial one
+    store.close()
+    return path
+
+
+def verifier(db_path: str, key: str = "test-key") -> AuditVerifier:
+    return AuditVerifier(db_path, block_size=BLOCK, workers=1, key=key)
+
+
+def execute(db_path: str, sql: str, params: tuple = ()):
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute(sql, params)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_intact_log_verifies_and_seals_complete_blocks(db_path):
+    result = verifier(db_path).verify()
+    assert result["valid"]
+    assert result["first_broken"] is None
+    assert result["entries_checked"] == 3 * BLOCK + 3
+    assert result["checkpoints_created"] == 3  # the partial block is not sealed
+
+
+def test_incremental_run_only_replays_entries_after_the_last_checkpoint(db_path, make_entry):
+    verifier(db_path).verify()
+    store = AuditStore(db_path)
+    for i in range(3 * BLOCK + 3, 4 * BLOCK + 1):
+        store.append(make_entry(i))
+    assert store.flush()
+    store.close()
+
+    result = verifier(db_path).verify()
+    assert result["valid"]
+    assert result["entries_checked"] == BLOCK + 1
+    assert result["checkpoints_created"] == 1
+    assert result["checkpoints"] == 4
+
+
+def test_full_run_detects_an_edited_entry_inside_a_sealed_block(db_path):
+    verifier(db_path).verify()
+    execute(db_path, "UPDATE audit_entries SET details = 'edited' WHERE seq = 5")
+
+    assert verifier(db_path).verify()["valid"]  # incremental mode trusts the sealed block
+    result = verifier(db_path).verify(full=True)
+    assert not result["valid"]
+    assert result["first_broken"]["seq"] == 5
+    assert result["first_broken"]["reason"] == "audit_hash does not match the entry contents"
+
+
+def test_detects_an_edited_entry_after_the_last_checkpoint(db_path):
+    verifier(db_path).verify()
+    execute(db_path, "UPDATE audit_entries SET actor = 'mallory' WHERE seq = ?", (3 * BLOCK + 2,))
+    result = verifier(db_path).verify()
+    assert not result["valid"]
+    assert result["first_broken"]["seq"] == 3 * BLOCK + 2
+
+
+def test_detects_a_deleted_entry(db_path):
+    execute(db_path, "DELETE FROM audit_entries WHERE seq = 10")
+    result = verifier(db_path).verify(full=True)
+    assert not result["valid"]
+    assert result["first_broken"]["seq"] == 11
+    assert "missing" in result["first_broken"]["reason"]
+
+
+def test_detects_a_rewritten_boundary_entry(db_path):
+    verifier(db_path).verify()
+    execute(db_path, "UPDATE audit_entries SET audit_hash = 'forged' WHERE seq = ?", (3 * BLOCK,))
+    result = verifier(db_path).verify()
+    assert not result["valid"]
+    assert result["first_broken"]["reason"] == "entry sealed by checkpoint 2 was modified or removed"
+
+
+@pytest.mark.parametrize("column, value", [("signature", "00" * 32), ("merkle_root", "ab" * 32),
+                                           ("last_hash", "forged")])
+def test_detects_a_tampered_checkpoint(db_path, column, value):
+    verifier(db_path).verify()
+    execute(db_path, f"UPDATE audit_checkpoints SET {column} = ? WHERE block = 1", (value,))
+    result = verifier(db_path).verify()
+    assert not result["valid"]
+    assert result["first_broken"]["reason"] == "checkpoint 1 has an invalid signature"
+
+
+def test_writers_are_not_blocked_while_a_run_is_in_progress(db_path, monkeypatch):
+    verify_block = audit_integrity.verify_block
+    acquired = []
+
+    def verify_then_write(*args):
+        # Mid-run, after earlier blocks may have been sealed: another writer must get the lock at once
+        conn = sqlite3.connect(db_path, timeout=0)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("ROLLBACK")
+            acquired.append(True)
+        finally:
+            conn.close()
+        return verify_block(*args)
+
+    monkeypatch.setattr(audit_integrity, "verify_block", verify_then_write)
+    result = verifier(db_path).verify()
+    assert result["valid"] and result["checkpoints_created"] == 3
+    assert len(acquired) == 4
+
+
+def test_checkpoints_signed_with_another_key_are_rejected(db_path):
+    verifier(db_path, key="test-key").verify()
+    result = verifier(db_path, key="other-key").verify()
+    assert not result["valid"]
+    assert result["first_broken"]["reason"] == "checkpoint 0 has an invalid signature"
+
+
+def test_resealed_block_that_no_longer_matches_is_reported(db_path):
+    verifier(db_path).verify()
+    v = verifier(db_path)
+    # Re-sign checkpoint 1 over a different root, as if the key had leaked and the block was rewritten
+    conn = sqlite3.connect(db_path)
+    block, first_seq, last_seq, last_hash = conn.execute(
+        "SELECT block, first_seq, last_seq, last_hash FROM audit_checkpoints WHERE block = 1").fetchone()
+    conn.close()
+    root = "cd" * 32
+    execute(db_path, "UPDATE audit_checkpoints SET merkle_root = ?, signature = ? WHERE block = 1",
+            (root, v.sign(block, first_seq, last_seq, last_hash, root)))
+    result = v.verify(full=True)
+    assert not result["valid"]
+    assert result["first_broken"]["reason"] == "block 1 no longer matches its signed checkpoint"
+
+
+def test_local_key_is_kept_in_the_database(db_path):
+    verifier(db_path, key="").verify()
+    assert verifier(db_path, key="").verify()["valid"]
+
+
+def test_worker_processes_agree_with_inline_verification(db_path):
+    execute(db_path, "UPDATE audit_entries SET details = 'edited' WHERE seq = ?", (2 * BLOCK + 1,))
+    v = AuditVerifier(db_path, block_size=BLOCK, workers=2, key="test-key")
+    try:
+        result = v.verify(full=True)
+    finally:
+        v.close()
+    assert not result["valid"]
+    assert result["first_broken"]["seq"] == 2 * BLOCK + 1
+    assert result["entries_checked"] == 2 * BLOCK
+    assert result["checkpoints_created"] == 2  # blocks before the broken one are still sealed
+    assert verifier(db_path).verify(full=True)["first_broken"] == result["first_broken"]
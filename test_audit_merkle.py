@@ -0,0 +1,166 @@
+"""
+Offline tests for audit Merkle inclusion proofs: the stored tree against the
+RFC 6962 definition, proofs from AuditStore.inclusion_proof, and
+audit_integrity.verify_entry_proof rejecting tampered documents. Each test uses
+a temporary SQLite file.
+"""
+
+import copy
+import json
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from audit_integrity import verify_entry_proof
+from audit_merkle import leaf_hash, merkle_root, node_hash, verify_inclusion
+from audit_store import AuditStore, generate_audit_hash, hashed_fields
+
+def reference_root(leaves: list) -> bytes:
+    """MTH from RFC 6962 section 2.1, written out recursively."""
+    if len(leaves) == 1:
+        return leaves[0]
+    k = 1 << ((len(leaves) - 1).bit_length() - 1)
+    return node_hash(reference_root(leaves[:k]), reference_root(leaves[k:]))
+
+
+def as_json(document: dict) -> dict:
+    """The document as a client receives it from /api/audit/proof."""
+    return json.loads(json.dumps(document, default=lambda value: value.isoformat()))
+
+
+@pytest.fixture
+def build_store(make_entry):
+    def build_store(path: str, count: int, batch_size: int = 3) -> AuditStore:
+        store = AuditStore(path, batch_size=batch_size)
+        for i in range(count):
+            store.append(make_entry(i))
+        assert store.flush()
+        return store
+
+    return build_store
+
+
+@pytest.mark.parametrize("size", range(1, 18))
+def test_merkle_root_matches_rfc_6962(size):
+    leaves = [leaf_hash(f"hash-{i}") for i in range(size)]
+    assert merkle_root(leaves) == reference_root(leaves)
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 4, 5, 7, 8, 9, 16, 17, 33])
+def test_every_entry_has_a_valid_proof(tmp_path, build_store, size):
+    store = build_store(str(tmp_path / "audit.db"), size)
+    try:
+        leaves = [leaf_hash(e["audit_hash"]) for e in store.query(limit=size, newest_first=False)]
+        root = reference_root(leaves).hex()
+        for i in range(size):
+            document = store.inclusion_proof(f"entry-{i}")
+            assert document["leaf_index"] == i
+            assert document["tree_size"] == size
+            assert document["root"] == root
+            assert verify_entry_proof(document, trusted_root=root)
+            assert verify_entry_proof(as_json(document))
+    finally:
+        store.close()
+
+
+def test_unknown_entry_has_no_proof(tmp_path, build_store):
+    store = build_store(str(tmp_path / "audit.db"), 3)
+    try:
+        assert store.inclusion_proof("missing") is None
+    finally:
+        store.close()
+
+
+@pytest.fixture
+def document(tmp_path, build_store):
+    store = build_store(str(tmp_path / "audit.db"), 11)
+    try:
+        yield as_json(store.inclusion_proof("entry-6"))
+    finally:
+        store.close()
+
+
+@pytest.mark.parametrize("field, value", [("details", "edited"), ("actor", "mallory"), ("action", "LOGIN"),
+                                          ("timestamp", "2026-01-05T10:00:00"), ("prev_hash", "0" * 16)])
+def test_modified_entry_fails(document, field, value):
+    document["entry"][field] = value
+    assert not verify_entry_proof(document)
+
+
+def test_entry_with_recomputed_hash_fails(document):
+    # Rewriting the entry and its audit_hash consistently still changes the leaf
+    document["entry"]["details"] = "edited"
+    entry = dict(document["entry"], timestamp=datetime.fromisoformat(document["entry"]["timestamp"]))
+    document["entry"]["audit_hash"] = generate_audit_hash(hashed_fields(entry), entry["prev_hash"])
+    assert not verify_entry_proof(document)
+
+
+@pytest.mark.parametrize("position", [0, -1])
+def test_modified_proof_node_fails(document, position):
+    node = bytearray.fromhex(document["proof"][position])
+    node[0] ^= 1
+    document["proof"][position] = node.hex()
+    assert not verify_entry_proof(document)
+
+
+def test_truncated_or_extended_proof_fails(document):
+    shorter = copy.deepcopy(document)
+    shorter["proof"].pop()
+    assert not verify_entry_proof(shorter)
+    longer = copy.deepcopy(document)
+    longer["proof"].append("00" * 32)
+    assert not verify_entry_proof(longer)
+
+
+@pytest.mark.parametrize("field, value", [("leaf_index", 5), ("leaf_index", 11), ("tree_size", 32),
+                                          ("tree_size", 7)])
+def test_wrong_position_fails(document, field, value):
+    document[field] = value
+    assert not verify_entry_proof(document)
+
+
+def test_trusted_root_is_enforced(document):
+    assert verify_entry_proof(document, trusted_root=document["root"])
+    assert not verify_entry_proof(document, trusted_root="ab" * 32)
+    forged = dict(document, root="ab" * 32)
+    assert not verify_entry_proof(forged)
+
+
+def test_old_proof_does_not_verify_against_a_newer_root(tmp_path, build_store, make_entry):
+    path = str(tmp_path / "audit.db")
+    store = build_store(path, 6)
+    try:
+        old = store.inclusion_proof("entry-2")
+        store.append(make_entry(6))
+        assert store.flush()
+        new = store.inclusion_proof("entry-2")
+        assert new["root"] != old["root"]
+        assert verify_entry_proof(old) and verify_entry_proof(new)
+        assert not verify_entry_proof(old, trusted_root=new["root"])
+    finally:
+        store.close()
+
+
+def test_tree_is_backfilled_for_entries_written_before_it(tmp_path, build_store):
+    path = str(tmp_path / "audit.db")
+    build_store(path, 9).close()
+    conn = sqlite3.connect(path)
+    conn.execute("DELETE FROM audit_merkle_nodes")
+    conn.commit()
+    conn.close()
+
+    store = AuditStore(path)
+    try:
+        for i in range(9):
+            assert verify_entry_proof(store.inclusion_proof(f"entry-{i}"))
+    finally:
+        store.close()
+
+
+def test_verify_inclusion_rejects_index_outside_the_tree():
+    leaves = [leaf_hash(f"hash-{i}") for i in range(4)]
+    root = merkle_root(leaves)
+    path = [leaves[1], node_hash(leaves[2], leaves[3])]
+    assert verify_inclusion(leaves[0], 0, 4, path, root)
+    assert not verify_inclusion(leaves[0], 4, 4, path, root)
@@ -0,0 +1,154 @@
+"""
+Offline tests for audit_store.AuditStore: hash chain linkage, durability across
+reopen, seeding and cursor pagination. Each test uses a temporary SQLite file.
+"""
+
+import sqlite3
+
+import pytest
+
+from audit_store import GENESIS_HASH, AuditStore, generate_audit_hash, hashed_fields
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = AuditStore(str(tmp_path / "audit.db"), batch_size=7)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def fill(make_entry):
+    def fill(store: AuditStore, count: int, **kwargs) -> None:
+        for i in range(count):
+            store.append(make_entry(i, **kwargs))
+        assert store.flush()
+
+    return fill
+
+
+def test_chain_links_every_entry_to_the_previous_one(store, fill):
+    fill(store, 30)  # several group commits of batch_size 7
+    entries = store.query(limit=100, newest_first=False)
+    assert [e["seq"] for e in entries] == list(range(1, 31))
+    prev_hash = GENESIS_HASH
+    for entry in entries:
+        assert entry["prev_hash"] == prev_hash
+        assert entry["audit_hash"] == generate_audit_hash(hashed_fields(entry), prev_hash)
+        prev_hash = entry["audit_hash"]
+    assert store.latest_hash() == prev_hash
+
+
+def test_append_fills_in_hashes_on_the_entry(store, make_entry):
+    entry = store.append(make_entry(0))
+    assert store.flush()
+    assert entry["prev_hash"] == GENESIS_HASH
+    assert entry["audit_hash"] == store.latest_hash()
+
+
+def test_entries_survive_reopen_and_the_chain_continues(tmp_path, fill, make_entry):
+    path = str(tmp_path / "audit.db")
+    first = AuditStore(path)
+    fill(first, 5)
+    first.close()
+
+    second = AuditStore(path)
+    try:
+        assert second.count() == 5
+        tail = second.latest_hash()
+        second.append(make_entry(5))
+        assert second.flush()
+        newest = second.query(limit=1)[0]
+        assert newest["seq"] == 6
+        assert newest["prev_hash"] == tail
+    finally:
+        second.close()
+
+
+def test_seed_only_writes_to_an_empty_log(store, make_entry):
+    assert store.seed([make_entry(0), make_entry(1)])
+    assert not store.seed([make_entry(2)])
+    assert store.count() == 2
+
+
+def test_rejected_entry_is_reported_and_the_rest_of_its_batch_committed(store, fill, make_entry):
+    fill(store, 3)
+    tail = store.latest_hash()
+    store.append(make_entry(3))
+    store.append(make_entry(1))  # duplicate id
+    store.append(make_entry(4))
+    assert not store.flush()
+    assert store.rejected == 1
+    assert [e["id"] for e in store.query(limit=2)] == ["entry-4", "entry-3"]
+    assert store.query(limit=2, newest_first=False, after=3)[0]["prev_hash"] == tail
+
+    store.append(make_entry(5))
+    assert store.flush()  # the rejection was reported once
+
+
+def test_locked_database_is_retried_in_order(store, fill, monkeypatch):
+    commit = store._commit
+    failures = []
+
+    def flaky_commit(conn, batch, only_if_empty=False):
+        if len(failures) < 2:
+            failures.append([e["id"] for e in batch])
+            raise sqlite3.OperationalError("database is locked")
+        return commit(conn, batch, only_if_empty)
+
+    monkeypatch.setattr(store, "_commit", flaky_commit)
+    fill(store, 5)
+    assert store.retries == 2
+    assert store.last_error == "database is locked"
+    assert [e["id"] for e in store.query(limit=10, newest_first=False)] == [f"entry-{i}" for i in range(5)]
+
+
+def test_flush_times_out_while_the_database_stays_unavailable(store, make_entry, monkeypatch):
+    def locked(conn, batch, only_if_empty=False):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(store, "_commit", locked)
+    store.append(make_entry(0))
+    assert not store.flush(timeout=0.3)
+    assert store.pending == 1
+
+
+def test_cursor_pages_cover_every_entry_once(store, fill):
+    fill(store, 23)
+
+    seen, before = [], None
+    while True:
+        page = store.query(limit=5, before=before)
+        if not page:
+            break
+        seen.extend(e["seq"] for e in page)
+        before = page[-1]["seq"]
+    assert seen == list(range(23, 0, -1))
+
+    seen, after = [], None
+    while True:
+        page = store.query(limit=5, after=after, newest_first=False)
+        if not page:
+            break
+        seen.extend(e["seq"] for e in page)
+        after = page[-1]["seq"]
+    assert seen == list(range(1, 24))
+
+
+def test_filters_combine_with_cursors(store, make_entry):
+    for i in range(20):
+        store.append(make_entry(i, action="TRADE" if i % 2 else "LOGIN", actor="alice" if i < 10 else "bob"))
+    assert store.flush()
+
+    trades = store.query(limit=100, action="TRADE")
+    assert len(trades) == 10 and all(e["action"] == "TRADE" for e in trades)
+
+    bob_trades = store.query(limit=100, action="TRADE", actor="bob")
+    assert [e["id"] for e in bob_trades] == [f"entry-{i}" for i in (19, 17, 15, 13, 11)]
+
+    older = store.query(limit=2, action="TRADE", before=bob_trades[1]["seq"])
+    assert [e["id"] for e in older] == ["entry-15", "entry-13"]
+
+    window = store.query(limit=100, since=make_entry(5)["timestamp"], until=make_entry(8)["timestamp"],
+                         newest_first=False)
+    assert [e["id"] for e in window] == ["entry-5", "entry-6", "entry-7"]
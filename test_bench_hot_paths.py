@@ -0,0 +1,75 @@
+"""
+Offline tests for the bench_hot_paths.py regression gate: --save writes a
+baseline, and --compare fails only when a benchmark is slower than the
+baseline scaled by the reference workload. The script runs in a subprocess
+(it imports server.py against its own scratch database) on the small news
+suite with short rounds.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_hot_paths.py")
+QUICK = ["--filter", "news", "--rounds", "2", "--min-time", "0.01"]
+
+
+def bench(*args: str, cwd) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, SCRIPT, *QUICK, *args], cwd=cwd,
+                          capture_output=True, text=True, timeout=300)
+
+
+@pytest.fixture(scope="module")
+def saved(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("bench")
+    result = bench("--save", str(directory / "baseline.json"), cwd=directory)
+    assert result.returncode == 0, result.stdout + result.stderr
+    with open(directory / "baseline.json") as f:
+        return directory, json.load(f)
+
+
+def doctored(directory, baseline: dict, name: str, scale_min: float, scale_reference: float = 1.0) -> str:
+    """A copy of the baseline with every benchmark's figures scaled."""
+    copy = json.loads(json.dumps(baseline))
+    for figures in copy["benchmarks"].values():
+        for stat in ("min", "median", "mean"):
+            figures[stat] *= scale_min
+        figures["reference"] *= scale_reference
+    path = directory / name
+    path.write_text(json.dumps(copy))
+    return str(path)
+
+
+def test_baseline_records_each_benchmark(saved):
+    _, baseline = saved
+    assert set(baseline["benchmarks"]) == {"news.decode_200", "news.analysis_request_200", "news.verdict_key_200"}
+    for figures in baseline["benchmarks"].values():
+        assert 0 < figures["min"] <= figures["median"]
+        assert figures["reference"] > 0 and figures["rounds"] == 2
+    assert baseline["machine"]["python"]
+
+
+def test_slower_runs_fail_the_gate(saved):
+    directory, baseline = saved
+    result = bench("--compare", doctored(directory, baseline, "fast.json", 0.1), cwd=directory)
+    assert result.returncode == 1
+    assert result.stdout.count("REGRESSION news.") == 3
+
+
+def test_comparable_runs_pass_the_gate(saved):
+    directory, baseline = saved
+    result = bench("--compare", doctored(directory, baseline, "slow.json", 10), cwd=directory)
+    assert result.returncode == 0, result.stdout
+    assert "No regressions" in result.stdout
+
+
+def test_baseline_is_scaled_by_machine_speed(saved):
+    # Same code, but the baseline's machine ran the reference workload 20x faster:
+    # its figures are scaled up by 20 before comparing, so nothing is flagged
+    directory, baseline = saved
+    result = bench("--compare", doctored(directory, baseline, "faster-machine.json", 0.1, 0.05), cwd=directory)
+    assert result.returncode == 0, result.stdout
+    assert "No regressions" in result.stdout
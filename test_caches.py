@@ -0,0 +1,133 @@
+"""
+Offline tests for caches.TTLCache: single-flight loading, expiry and stale
+reads, LRU eviction by entry count and by bytes, and the snapshot cache in
+front of Alpaca (server.get_market_data) against an httpx.MockTransport.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+import http_clients
+from caches import TTLCache, estimate_size
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache("test", ttl=60)
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"price": 1.0}
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_load_status("AAPL", load) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert [status for _, status in results] == ["miss"] + ["coalesced"] * 4
+    assert all(value is results[0][0] for value, _ in results)
+    assert asyncio.run(cache.get_or_load_status("AAPL", load))[1] == "hit"
+    assert cache.stats()["hit_ratio"] == round(5 / 6, 4)
+
+
+def test_failed_load_is_not_cached():
+    cache = TTLCache("test", ttl=60)
+
+    async def fail():
+        raise RuntimeError("upstream down")
+
+    async def ok():
+        return "value"
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await cache.get_or_load("key", fail)
+        return await cache.get_or_load("key", ok)
+
+    assert asyncio.run(scenario()) == "value"
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_load():
+    cache = TTLCache("test", ttl=60)
+
+    async def load():
+        await asyncio.sleep(0.05)
+        return "value"
+
+    async def scenario():
+        impatient = asyncio.create_task(cache.get_or_load("key", load))
+        patient = asyncio.create_task(cache.get_or_load("key", load))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        return await patient
+
+    assert asyncio.run(scenario()) == "value"
+    assert cache.get("key") == "value"
+
+
+def test_expired_entries_are_kept_for_stale_reads():
+    cache = TTLCache("test", ttl=60)
+    cache.set("AAPL", {"price": 1.0}, ttl=-1)
+    assert cache.get("AAPL") is None
+    assert cache.lookup("AAPL") is None and cache.misses == 1
+    assert cache.get_stale("AAPL") == {"price": 1.0}
+    cache.invalidate("AAPL")
+    assert cache.get_stale("AAPL") is None
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = TTLCache("test", ttl=60, max_entries=3)
+    for key in "abc":
+        cache.set(key, key)
+    cache.get("a")  # now most recently used
+    cache.set("d", "d")
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == ["a", "c", "d"]
+    assert cache.evictions == 1
+
+
+def test_byte_budget_bounds_the_cache():
+    value = {"bars": list(range(100))}
+    size = estimate_size(value)
+    cache = TTLCache("test", ttl=60, max_entries=100, max_bytes=3 * size)
+    for i in range(5):
+        cache.set(str(i), value)
+    assert cache.stats()["entries"] == 3
+    assert cache.stats()["bytes"] == 3 * size
+    cache.set("0", value)
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_replacing_an_entry_does_not_leak_bytes():
+    cache = TTLCache("test", ttl=60)
+    cache.set("a", "x" * 100)
+    cache.set("a", "y")
+    assert cache.stats()["bytes"] == estimate_size("y")
+
+
+# ---------------------- SNAPSHOT CACHE ------------------------ #
+def test_snapshots_are_fetched_once_per_ttl(server, monkeypatch, make_snapshot):
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(200, json=make_snapshot("AAPL"))
+
+    async def scenario():
+        client = http_clients.get_client(http_clients.ALPACA_DATA)
+        monkeypatch.setattr(client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        try:
+            first = await asyncio.gather(*(server.get_market_data("AAPL") for _ in range(10)))
+            again = await server.get_market_data("AAPL")
+            return first, again
+        finally:
+            await client.close()
+
+    server.SNAPSHOT_CACHE.clear()
+    first, again = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert calls[0].endswith("/AAPL/snapshot")
+    assert all(snapshot is first[0] for snapshot in first) and again is first[0]
@@ -0,0 +1,182 @@
+"""
+Offline tests for compression and etags: encoding negotiation, the size and
+content-type thresholds of CompressionMiddleware, ETag encoding suffixes on
+200s and 304s, and revalidation of /api/portfolio/ (304 while positions are
+cached, a new ETag once an order invalidates them). Brotli is treated as not
+installed, so gzip is the only encoding.
+"""
+
+import asyncio
+import gzip
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+import compression
+import etags
+import http_clients
+import serialization
+
+LARGE = {"rows": [{"symbol": "AAPL", "price": i} for i in range(200)]}
+SMALL = {"symbol": "AAPL"}
+
+
+@pytest.fixture(autouse=True)
+def gzip_only(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+
+
+@pytest.mark.parametrize("accept_encoding, encoding", [
+    ("gzip, deflate", "gzip"),
+    ("br;q=1.0, gzip;q=0.5", "gzip"),
+    ("gzip;q=0", None),
+    ("*", "gzip"),
+    ("*, gzip;q=0", None),
+    ("identity", None),
+    ("", None),
+])
+def test_choose_encoding(accept_encoding, encoding):
+    assert compression.choose_encoding(accept_encoding) == encoding
+
+
+def test_compressible_types():
+    assert compression.compressible("application/json")
+    assert compression.compressible("text/html; charset=utf-8")
+    assert compression.compressible("application/problem+json")
+    assert not compression.compressible("text/event-stream; charset=utf-8")
+    assert not compression.compressible("image/png")
+
+
+# ---------------------- MIDDLEWARE ------------------------ #
+def make_client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(compression.CompressionMiddleware)
+
+    @app.get("/large")
+    async def large(request: Request):
+        return etags.conditional_json(request, LARGE)
+
+    @app.get("/small")
+    async def small(request: Request):
+        return etags.conditional_json(request, SMALL)
+
+    @app.get("/events")
+    async def events():
+        return PlainTextResponse("data: x\n\n" * 500, media_type="text/event-stream")
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            yield b'{"n":1}\n'
+            yield b'{"n":2}\n'
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    return TestClient(app)
+
+
+def test_large_bodies_are_gzipped():
+    client = make_client()
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json() == LARGE  # httpx decodes the body
+    assert int(response.headers["content-length"]) < len(serialization.dumps(LARGE))
+
+    identity = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    assert identity.headers["vary"] == "Accept-Encoding"
+
+
+def test_small_bodies_and_events_are_sent_as_is():
+    client = make_client()
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    events = client.get("/events", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in events.headers and "vary" not in events.headers
+
+
+def test_streamed_bodies_are_compressed_per_chunk(monkeypatch):
+    monkeypatch.setattr(compression, "COMPRESSION_MIN_SIZE", 1)
+    response = make_client().get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text == '{"n":1}\n{"n":2}\n'
+
+    compressor = compression._Compressor("gzip")
+    raw = compressor.compress(b"a" * 10, final=False) + compressor.compress(b"b" * 10, final=True)
+    assert gzip.decompress(raw) == b"a" * 10 + b"b" * 10
+
+
+# ---------------------- ETAGS ------------------------ #
+def test_etags_match_any_encoding_of_the_body():
+    assert etags.matched_encoding('"abc-gzip"', '"abc"') == "gzip"
+    assert etags.matched_encoding('W/"abc-br", "other"', '"abc"') == "br"
+    assert etags.matched_encoding('"abc"', '"abc"') is None
+    assert etags.matched_encoding('"other-gzip"', '"abc"') is None
+
+
+def test_compressed_etags_are_suffixed_and_revalidated():
+    client = make_client()
+    first = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    tagged = first.headers["etag"]
+    opaque = etags.make_etag(serialization.dumps(LARGE))
+    assert tagged == opaque[:-1] + '-gzip"'
+
+    revalidated = client.get("/large", headers={"Accept-Encoding": "gzip", "If-None-Match": tagged})
+    assert revalidated.status_code == 304 and revalidated.headers["etag"] == tagged
+    # A client holding the identity copy is told about that copy, not the gzip one
+    identity = client.get("/large", headers={"Accept-Encoding": "gzip", "If-None-Match": opaque})
+    assert identity.status_code == 304 and identity.headers["etag"] == opaque
+
+
+def test_uncompressed_etags_keep_their_value():
+    client = make_client()
+    first = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    etag = first.headers["etag"]
+    assert not etag.endswith('-gzip"')
+    revalidated = client.get("/small", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert revalidated.status_code == 304 and revalidated.headers["etag"] == etag
+    assert client.get("/small", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+# ---------------------- PORTFOLIO ------------------------ #
+@pytest.fixture
+def alpaca_trading(server, monkeypatch, make_positions):
+    """Patched trading client: positions come from `held`, orders are recorded."""
+    state = {"held": ["AAPL", "MSFT"], "gets": 0, "orders": []}
+    client = http_clients.get_client(server.ALPACA_TRADING)
+
+    async def get(url, headers=None, params=None, timeout=None):
+        state["gets"] += 1
+        return make_positions(state["held"])
+
+    async def post(url, headers=None, json_data=None, timeout=None):
+        state["orders"].append(json_data)
+        state["held"] = state["held"] + [json_data["symbol"]]
+        return {"id": "order-1", "status": "accepted", **json_data}
+
+    monkeypatch.setattr(client, "get", get)
+    monkeypatch.setattr(client, "post", post)
+    for key in ("positions", "portfolio"):
+        server.POSITIONS_CACHE.invalidate(key)
+    yield state
+    for key in ("positions", "portfolio"):
+        server.POSITIONS_CACHE.invalidate(key)
+
+
+def test_portfolio_revalidation_and_invalidation(server, client, alpaca_trading):
+    first = client.get("/api/portfolio/")
+    assert first.status_code == 200
+    assert [p["symbol"] for p in first.json()["positions"]] == ["AAPL", "MSFT"]
+    etag = first.headers["etag"]
+
+    again = client.get("/api/portfolio/", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.headers["etag"] == etag
+    assert alpaca_trading["gets"] == 1
+
+    asyncio.run(server.place_order({"symbol": "NVDA", "qty": 1, "side": "buy"}))
+    changed = client.get("/api/portfolio/", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    assert [p["symbol"] for p in changed.json()["positions"]] == ["AAPL", "MSFT", "NVDA"]
+    assert alpaca_trading["gets"] == 2
@@ -0,0 +1,95 @@
+"""
+Offline tests for http_clients.UpstreamClient: one pooled AsyncClient reused
+across calls, the per-upstream concurrency cap, timeouts, and the shared
+client registry. Upstreams are httpx.MockTransport handlers.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+import http_clients
+from http_clients import UpstreamClient
+
+
+def make_client(handler, **kwargs) -> UpstreamClient:
+    client = UpstreamClient("pool-test", timeout=5.0, **kwargs)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def test_calls_share_one_pooled_client():
+    seen = []
+
+    def handler(request):
+        seen.append((request.method, request.url.params.get("symbols"), request.headers.get("X-Key")))
+        return httpx.Response(200, json={"ok": len(seen)})
+
+    client = make_client(handler)
+    pooled = client.client
+
+    async def scenario():
+        try:
+            first = await client.get("https://upstream.test/snapshots", {"X-Key": "k"}, {"symbols": "AAPL"})
+            second = await client.post("https://upstream.test/orders", {"X-Key": "k"}, {"qty": 1})
+            return first, second
+        finally:
+            await client.close()
+
+    assert asyncio.run(scenario()) == ({"ok": 1}, {"ok": 2})
+    assert client.client is not pooled  # closed, so a new pool is opened on next use
+    assert seen == [("GET", "AAPL", "k"), ("POST", None, "k")]
+
+
+def test_concurrency_is_capped_per_upstream():
+    active, peak = 0, 0
+
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return httpx.Response(200, json={})
+
+    client = make_client(handler, concurrency=2)
+
+    async def scenario():
+        try:
+            await asyncio.gather(*(client.get("https://upstream.test/quote") for _ in range(8)))
+        finally:
+            await client.close()
+
+    asyncio.run(scenario())
+    assert peak == 2
+    assert client.in_flight == 0
+
+
+def test_connect_timeout_is_capped(monkeypatch):
+    monkeypatch.setattr(http_clients, "HTTP_CONNECT_TIMEOUT", 2.0)
+    client = UpstreamClient("pool-test", timeout=30.0)
+    assert client._timeout(None).connect == 2.0
+    assert client._timeout(None).read == 30.0
+    assert client._timeout(1.0).connect == 1.0
+
+
+def test_http_errors_raise():
+    client = make_client(lambda request: httpx.Response(404, json={"message": "not found"}))
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(client.get("https://upstream.test/missing"))
+
+
+def test_registry_shares_clients_until_closed():
+    async def scenario():
+        await http_clients.start_clients()
+        client = http_clients.get_client(http_clients.ALPACA_DATA)
+        assert http_clients.get_client(http_clients.ALPACA_DATA) is client
+        assert client.stats()["open"]
+        assert client.timeout == http_clients.UPSTREAM_TIMEOUTS[http_clients.ALPACA_DATA]
+        await http_clients.close_clients()
+        return client
+
+    client = asyncio.run(scenario())
+    assert not client.stats()["open"]
+    assert http_clients.get_client(http_clients.ALPACA_DATA) is not client
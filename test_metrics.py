@@ -0,0 +1,143 @@
+"""
+Offline tests for metrics: Prometheus text rendering of counters, gauges and
+histograms, the timed() decorator's outcomes, merging worker snapshot files
+in multi-worker mode, and per-route request metrics at GET /metrics. Each
+test starts from an empty registry unless it scrapes the app.
+"""
+
+import asyncio
+import json
+import os
+
+import pytest
+
+import metrics
+
+DEAD_PID = 4194305  # above the largest possible pid_max, so never alive
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(metrics, "REGISTRY", [])
+    monkeypatch.setattr(metrics, "_COLLECTORS", [])
+    monkeypatch.setattr(metrics, "METRICS_DIR", None)
+
+
+def test_metrics_are_rendered_in_text_format(registry):
+    requests = metrics.Counter("requests_total", "Requests", ("route",))
+    in_flight = metrics.Gauge("in_flight", "In flight")
+    latency = metrics.Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    requests.inc(("/a",))
+    requests.inc(("/a",), 2)
+    in_flight.inc()
+    in_flight.dec(amount=0.5)
+    for value in (0.05, 0.1, 0.5, 5.0):
+        latency.observe(("/a",), value)
+
+    assert metrics.render().splitlines() == [
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{route="/a"} 3',
+        "# HELP in_flight In flight",
+        "# TYPE in_flight gauge",
+        "in_flight 0.5",
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a",le="0.1"} 2',
+        'latency_seconds_bucket{route="/a",le="1"} 3',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 4',
+        'latency_seconds_sum{route="/a"} 5.65',
+        'latency_seconds_count{route="/a"} 4',
+    ]
+
+
+def test_label_values_are_escaped(registry):
+    metrics.Counter("errors_total", "Errors", ("detail",)).inc(('say "hi"\\\n',))
+    assert 'errors_total{detail="say \\"hi\\"\\\\\\n"} 1' in metrics.render()
+
+
+def test_collectors_run_before_each_scrape(registry):
+    gauge = metrics.Gauge("queue_depth", "Queue depth")
+    depth = iter([3, 7])
+    metrics.collector(lambda: gauge.set((), next(depth)))
+    assert "queue_depth 3" in metrics.render()
+    assert "queue_depth 7" in metrics.render()
+
+
+def test_timed_records_outcomes(registry, monkeypatch):
+    operations = metrics.Counter("operation_total", "Calls", ("operation", "outcome"))
+    monkeypatch.setattr(metrics, "OPERATIONS", operations)
+    monkeypatch.setattr(metrics, "OPERATION_DURATION", metrics.Histogram("operation_seconds", "Latency", ("operation",)))
+    monkeypatch.setattr(metrics, "OPERATIONS_IN_FLIGHT", metrics.Gauge("operations_in_flight", "Running", ("operation",)))
+
+    @metrics.timed("fetch")
+    async def fetch(fail=False):
+        if fail:
+            raise ValueError("boom")
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    @metrics.timed("stream")
+    async def stream():
+        yield 1
+        yield 2
+
+    async def scenario():
+        assert await fetch() == "ok"
+        with pytest.raises(ValueError):
+            await fetch(fail=True)
+        slow = asyncio.create_task(fetch())
+        await asyncio.sleep(0)
+        slow.cancel()
+        await asyncio.gather(slow, return_exceptions=True)
+        assert [item async for item in stream()] == [1, 2]
+
+    asyncio.run(scenario())
+    assert operations.values == {
+        ("fetch", "ok"): 1, ("fetch", "error"): 1, ("fetch", "cancelled"): 1, ("stream", "ok"): 1,
+    }
+    assert metrics.OPERATION_DURATION.values[("fetch",)][2] == 3
+    assert metrics.OPERATIONS_IN_FLIGHT.values == {("fetch",): 0, ("stream",): 0}
+
+
+# ---------------------- MULTI-WORKER ------------------------ #
+def test_worker_snapshots_are_merged(registry, monkeypatch, tmp_path):
+    requests = metrics.Counter("requests_total", "Requests", ("route",))
+    in_flight = metrics.Gauge("in_flight", "In flight")
+    latency = metrics.Histogram("latency_seconds", "Latency", buckets=(1.0,))
+    requests.inc(("/a",), 2)
+    in_flight.set((), 1)
+    latency.observe((), 0.5)
+
+    # A worker that has since exited: its counters still count, its gauges do not
+    dead = metrics._snapshot()
+    dead["requests_total"]["values"] = [[["/a"], 5], [["/b"], 1]]
+    dead["in_flight"]["values"] = [[[], 9]]
+    dead["latency_seconds"]["values"] = [[[], [[0, 1], 2.0, 1]]]
+    (tmp_path / f"{DEAD_PID}.json").write_text(json.dumps(dead))
+    (tmp_path / "broken.json").write_text("{")
+
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    lines = metrics.render().splitlines()
+    assert 'requests_total{route="/a"} 7' in lines
+    assert 'requests_total{route="/b"} 1' in lines
+    assert lines.count(f'in_flight{{worker="{os.getpid()}"}} 1') == 1
+    assert not any(line.startswith("in_flight{") and str(DEAD_PID) in line for line in lines)
+    assert 'latency_seconds_bucket{le="1"} 1' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in lines
+    assert "latency_seconds_sum 2.5" in lines
+
+    metrics.clear_dir(str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == []
+
+
+# ---------------------- ROUTE METRICS ------------------------ #
+def test_requests_are_counted_by_route_template(client):
+    client.get("/api/search/suggest", params={"q": "apple"})
+    client.get("/api/no/such/route")
+    body = client.get("/metrics").text
+    assert 'http_requests_total{method="GET",route="/api/search/suggest",status="200"}' in body
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"}' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/api/search/suggest",le="+Inf"}' in body
+    assert "# TYPE cache_hits_total counter" in body
+    assert "# TYPE audit_commit_retries_total counter" in body
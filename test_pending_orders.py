@@ -0,0 +1,230 @@
+"""
+Offline tests for the pending-order stores (orders.PendingOrderStore and
+storage.SQLitePendingOrders): atomic claims, release/complete, expiry, cursor
+paging by symbol and user, and reclaiming abandoned SQLite claims. SQLite
+tests use a temporary database file.
+"""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import storage
+from orders import OrderClaimedError, PendingOrderStore
+from storage import SQLitePendingOrders, SQLitePool
+
+
+def make_order(i: int, symbol: str = "AAPL", user_id: str = "alice") -> dict:
+    return {"order_id": f"order-{i}", "symbol": symbol, "user_id": user_id, "action": "BUY", "quantity": i + 1}
+
+
+def ids(orders: list) -> list:
+    return [order["order_id"] for order in orders]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    pools = []
+
+    def make(ttl: float = 3600):
+        if request.param == "memory":
+            return PendingOrderStore(ttl=ttl)
+        pool = SQLitePool(str(tmp_path / "orders.db"), size=4)
+        pools.append(pool)
+        return SQLitePendingOrders(pool, ttl=ttl)
+
+    yield make
+    for pool in pools:
+        pool.close()
+
+
+@pytest.fixture
+def orders(make_store):
+    store = make_store()
+    for i in range(5):
+        store.add(make_order(i))
+    return store
+
+
+def test_claim_takes_the_order_out_of_the_pending_set(orders):
+    claimed = orders.claim("order-2")
+    assert claimed["order_id"] == "order-2" and claimed["quantity"] == 3
+    assert orders.get("order-2") is None
+    assert "order-2" not in ids(orders.page()[0])
+    assert len(orders) == 4
+    assert orders.stats()["claimed"] == 1
+
+
+def test_second_claim_is_refused(orders):
+    orders.claim("order-1")
+    with pytest.raises(OrderClaimedError):
+        orders.claim("order-1")
+
+
+def test_unknown_order_cannot_be_claimed(orders):
+    assert orders.claim("order-99") is None
+
+
+def test_release_returns_the_order_in_its_original_position(orders):
+    orders.claim("order-1")
+    orders.claim("order-3")
+    orders.release("order-3")
+    orders.release("order-1")
+    assert ids(orders.page()[0]) == [f"order-{i}" for i in range(5)]
+    assert orders.claim("order-1")["order_id"] == "order-1"
+
+
+def test_completed_order_is_gone(orders):
+    orders.claim("order-0")
+    orders.complete("order-0")
+    assert orders.claim("order-0") is None
+    assert orders.get("order-0") is None
+    assert orders.stats()["claimed"] == 0
+    assert len(orders) == 4
+
+
+def test_expired_orders_cannot_be_claimed_or_listed(make_store):
+    store = make_store(ttl=-1)
+    store.add(make_order(0))
+    assert store.claim("order-0") is None
+    assert store.get("order-0") is None
+    assert store.page() == ([], None)
+    assert len(store) == 0
+
+
+def test_concurrent_claims_have_exactly_one_winner(orders):
+    barrier = threading.Barrier(8)
+    outcomes = []
+
+    def confirm():
+        barrier.wait()
+        try:
+            outcomes.append(orders.claim("order-4"))
+        except OrderClaimedError:
+            outcomes.append("refused")
+
+    threads = [threading.Thread(target=confirm) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    winners = [o for o in outcomes if isinstance(o, dict)]
+    assert len(winners) == 1 and winners[0]["order_id"] == "order-4"
+    assert outcomes.count("refused") == 7
+
+
+def test_pages_follow_the_cursor_and_filters(make_store):
+    store = make_store()
+    for i in range(12):
+        store.add(make_order(i, symbol="AAPL" if i % 3 else "MSFT", user_id="alice" if i < 6 else "bob"))
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = store.page(limit=5, after=cursor)
+        seen.extend(ids(page))
+        if cursor is None:
+            break
+    assert seen == [f"order-{i}" for i in range(12)]
+
+    assert ids(store.page(symbol="MSFT")[0]) == ["order-0", "order-3", "order-6", "order-9"]
+    assert ids(store.page(symbol="MSFT", user_id="bob")[0]) == ["order-6", "order-9"]
+    page, cursor = store.page(limit=2, user_id="bob")
+    assert ids(page) == ["order-6", "order-7"]
+    assert ids(store.page(limit=2, after=cursor, user_id="bob")[0]) == ["order-8", "order-9"]
+    assert store.page(symbol="TSLA") == ([], None)
+
+
+# ---------------------- SQLITE ONLY ------------------------ #
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "orders.db")
+
+
+def test_claim_is_exclusive_across_connections(db_path):
+    # Each thread has its own pool, as separate worker processes would
+    pools = [SQLitePool(db_path, size=1) for _ in range(6)]
+    stores = [SQLitePendingOrders(pool) for pool in pools]
+    stores[0].add(make_order(0))
+    barrier = threading.Barrier(len(stores))
+    outcomes = []
+
+    def confirm(store):
+        barrier.wait()
+        try:
+            outcomes.append(store.claim("order-0"))
+        except OrderClaimedError:
+            outcomes.append("refused")
+
+    threads = [threading.Thread(target=confirm, args=(store,)) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for pool in pools:
+        pool.close()
+    assert sum(isinstance(o, dict) for o in outcomes) == 1
+    assert outcomes.count("refused") == len(stores) - 1
+
+
+def age_claims(db_path: str, seconds: float):
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE pending_orders SET claimed_at = claimed_at - ? WHERE claimed_at IS NOT NULL", (seconds,))
+    conn.commit()
+    conn.close()
+
+
+def test_abandoned_claim_is_reclaimed(db_path):
+    pool = SQLitePool(db_path)
+    store = SQLitePendingOrders(pool)
+    try:
+        store.add(make_order(0))
+        store.add(make_order(1))
+        store.claim("order-0")
+        store.claim("order-1")
+        age_claims(db_path, storage.ORDER_CLAIM_TIMEOUT + 1)
+        store.claim("order-1")  # a fresh claim is not touched
+
+        assert store.purge_expired() == 0
+        assert store.reclaimed == 1
+        assert ids(store.page()[0]) == ["order-0"]
+        with pytest.raises(OrderClaimedError):
+            store.claim("order-1")
+    finally:
+        pool.close()
+
+
+def test_abandoned_claim_can_be_taken_over_before_purge(db_path):
+    pool = SQLitePool(db_path)
+    store = SQLitePendingOrders(pool)
+    try:
+        store.add(make_order(0))
+        store.claim("order-0")
+        age_claims(db_path, storage.ORDER_CLAIM_TIMEOUT + 1)
+        assert store.claim("order-0")["order_id"] == "order-0"
+        with pytest.raises(OrderClaimedError):
+            store.claim("order-0")
+    finally:
+        pool.close()
+
+
+def test_purge_deletes_expired_orders_but_keeps_live_claims(db_path):
+    pool = SQLitePool(db_path)
+    store = SQLitePendingOrders(pool, ttl=0.2)
+    try:
+        store.add(make_order(0))
+        store.add(make_order(1))
+        store.add(make_order(2))
+        store.claim("order-2")
+        age_claims(db_path, storage.ORDER_CLAIM_TIMEOUT + 1)  # abandoned
+        store.claim("order-1")  # being confirmed right now
+        time.sleep(0.3)
+
+        assert store.purge_expired() == 2  # order-0 expired, order-2 expired while abandoned
+        assert store.expired == 2
+        assert store.stats()["claimed"] == 1
+        store.complete("order-1")
+        assert store.stats()["claimed"] == 0
+    finally:
+        pool.close()
@@ -0,0 +1,190 @@
+"""
+Offline tests for price_hub: the feed cap derived from the upstream rate
+budget, per-subscriber coalescing of pending updates, change-only publishing,
+subscription validation and limits, one batched fetch per poll, and the
+/api/ws/prices WebSocket. Sockets and the quote fetcher are stand-ins.
+"""
+
+import asyncio
+
+import pytest
+
+import price_hub
+from price_hub import PriceHub, PriceSubscriber, feed_limit
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_json(self, message):
+        self.sent.append(message)
+
+
+class Fetcher:
+    """fetch_quotes stand-in: records the symbols of each call."""
+
+    def __init__(self, quotes=None, errors=None):
+        self.quotes = quotes or {}
+        self.errors = errors or {}
+        self.calls = []
+
+    async def __call__(self, symbols):
+        self.calls.append(symbols)
+        if isinstance(self.errors, Exception):
+            raise self.errors
+        return ({s: self.quotes[s] for s in symbols if s in self.quotes},
+                {s: self.errors[s] for s in symbols if s in self.errors})
+
+
+def run(coro_fn):
+    """Run a scenario inside an event loop (subscribe() starts the poller task)."""
+    async def scenario():
+        before = asyncio.all_tasks()
+        try:
+            return await coro_fn()
+        finally:
+            for task in asyncio.all_tasks() - before:
+                task.cancel()
+    return asyncio.run(scenario())
+
+
+def test_feed_limit_follows_the_rate_budget(monkeypatch):
+    monkeypatch.setattr(price_hub, "WS_MAX_FEEDS", 0)
+    assert feed_limit(200, 50, interval=2, share=0.25) == 50    # 1.67 requests per poll
+    assert feed_limit(1200, 50, interval=2, share=0.25) == 500  # 10 requests per poll
+    assert feed_limit(1, 50, interval=2, share=0.25) == 50      # always at least one batch
+    assert feed_limit(None, 50) == 500
+    monkeypatch.setattr(price_hub, "WS_MAX_FEEDS", 7)
+    assert feed_limit(1200, 50) == 7
+
+
+def test_pending_updates_are_coalesced():
+    socket = FakeSocket()
+    subscriber = PriceSubscriber(socket)
+
+    async def scenario():
+        subscriber.offer("AAPL", {"price": 1.0, "bid": 0.9})
+        subscriber.offer("AAPL", {"price": 1.1})
+        subscriber.offer("MSFT", {"price": 2.0})
+        subscriber.send_control({"type": "subscribed", "symbols": ["AAPL", "MSFT"]})
+        sender = asyncio.create_task(subscriber.run_sender())
+        await asyncio.sleep(0.01)
+        sender.cancel()
+
+    asyncio.run(scenario())
+    assert socket.sent == [
+        {"type": "subscribed", "symbols": ["AAPL", "MSFT"]},
+        {"type": "quote", "symbol": "AAPL", "price": 1.1, "bid": 0.9},
+        {"type": "quote", "symbol": "MSFT", "price": 2.0},
+    ]
+    assert subscriber.dropped == 1
+
+
+def test_only_changes_are_published():
+    hub = PriceHub(Fetcher(), max_feeds=10)
+    early, late = PriceSubscriber(FakeSocket()), PriceSubscriber(FakeSocket())
+
+    async def scenario():
+        hub.subscribe(early, "AAPL")
+        hub.publish("AAPL", {"price": 1.0, "bid": 0.9})
+        early._pending.clear()
+        hub.publish("AAPL", {"price": 1.1, "bid": 0.9})
+        hub.publish("MSFT", {"price": 2.0})  # nobody watching
+        hub.subscribe(late, "AAPL")
+
+    run(scenario)
+    assert early._pending == {"AAPL": {"price": 1.1}}
+    assert late._pending == {"AAPL": {"price": 1.1, "bid": 0.9}}  # full state for late joiners
+
+
+def test_subscriptions_are_validated_and_capped(monkeypatch):
+    monkeypatch.setattr(price_hub, "WS_MAX_SYMBOLS", 3)
+    hub = PriceHub(Fetcher(), max_feeds=4, is_valid=lambda symbol: symbol != "NOPE")
+    first, second = PriceSubscriber(FakeSocket()), PriceSubscriber(FakeSocket())
+
+    async def scenario():
+        with pytest.raises(ValueError, match="Unknown symbol"):
+            hub.subscribe(first, "NOPE")
+        for symbol in ("A", "B", "C"):
+            hub.subscribe(first, symbol)
+        with pytest.raises(ValueError, match="limit of 3"):
+            hub.subscribe(first, "D")
+        hub.subscribe(second, "D")
+        with pytest.raises(ValueError, match="maximum of 4"):
+            hub.subscribe(second, "E")
+        hub.subscribe(second, "A")  # already streamed: no new feed
+        hub.disconnect(first)
+        hub.subscribe(second, "E")
+        return hub.stats()
+
+    stats = run(scenario)
+    assert stats["symbols"] == 3 and stats["clients"] == 1
+    assert stats["rejected_symbols"] == 1
+
+
+def test_each_poll_fetches_all_symbols_in_one_call(capsys):
+    fetcher = Fetcher(quotes={"AAPL": {"price": 1.0}, "MSFT": {"price": 2.0}}, errors={"BAD": "not found"})
+    hub = PriceHub(fetcher, max_feeds=10, interval=3600)
+    subscriber = PriceSubscriber(FakeSocket())
+
+    async def scenario():
+        for symbol in ("MSFT", "BAD", "AAPL"):
+            hub.subscribe(subscriber, symbol)
+        await hub.poll_once()
+        await hub.poll_once()
+        return hub.stats()
+
+    stats = run(scenario)
+    assert fetcher.calls == [["AAPL", "BAD", "MSFT"]] * 2
+    assert subscriber._pending == {"AAPL": {"price": 1.0}, "MSFT": {"price": 2.0}}
+    assert stats["polls"] == 2 and stats["failing_symbols"] == ["BAD"]
+    assert capsys.readouterr().out.count("BAD: not found") == 1  # reported once, not every poll
+
+
+def test_failed_polls_are_reported_once(capsys):
+    hub = PriceHub(Fetcher(errors=RuntimeError("upstream down")), max_feeds=10, interval=3600)
+    subscriber = PriceSubscriber(FakeSocket())
+
+    async def scenario():
+        hub.subscribe(subscriber, "AAPL")
+        await hub.poll_once()
+        await hub.poll_once()
+
+    run(scenario)
+    assert hub.polls == 0
+    assert capsys.readouterr().out.count("all symbols: upstream down") == 1
+
+
+def test_poller_stops_when_nobody_is_subscribed():
+    fetcher = Fetcher(quotes={"AAPL": {"price": 1.0}})
+    hub = PriceHub(fetcher, max_feeds=10, interval=0.01)
+    subscriber = PriceSubscriber(FakeSocket())
+
+    async def scenario():
+        hub.subscribe(subscriber, "AAPL")
+        await asyncio.sleep(0.05)
+        hub.unsubscribe(subscriber, "AAPL")
+        await asyncio.sleep(0.05)
+        return hub._poller.done()
+
+    assert run(scenario)
+    assert len(fetcher.calls) >= 2
+    assert hub.stats()["symbols"] == 0 and hub._last == {}
+
+
+# ---------------------- WEBSOCKET ------------------------ #
+def test_websocket_session(server, client, monkeypatch):
+    fetcher = Fetcher(quotes={"AAPL": {"price": 1.0}, "MSFT": {"price": 2.0}})
+    monkeypatch.setattr(server.PRICE_HUB, "fetch_quotes", fetcher)
+    with client.websocket_connect("/api/ws/prices") as websocket:
+        websocket.send_json({"action": "subscribe", "symbols": ["aapl", "msft", "ZZZZ", "not a ticker"]})
+        messages = [websocket.receive_json() for _ in range(5)]
+        websocket.send_json({"action": "bogus"})
+        assert websocket.receive_json()["type"] == "error"
+    errors = [m["detail"] for m in messages if m["type"] == "error"]
+    assert errors == ["Unknown symbol: ZZZZ", "Unknown symbol: NOT A TICKER"]
+    assert {"type": "subscribed", "symbols": ["AAPL", "MSFT"]} in messages
+    quotes = {m["symbol"]: m["price"] for m in messages if m["type"] == "quote"}
+    assert quotes == {"AAPL": 1.0, "MSFT": 2.0}
+    assert fetcher.calls[0] == ["AAPL", "MSFT"]
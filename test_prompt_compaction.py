@@ -0,0 +1,93 @@
+"""
+Offline tests for prompt_compaction: snapshot field selection, near-duplicate
+headline removal, relevance ranking, summary trimming and the token budget.
+"""
+
+import json
+import time
+
+from prompt_compaction import (
+    build_prompt_payload,
+    compact_market_data,
+    compact_news,
+    estimate_tokens,
+)
+
+NOW = int(time.time())
+
+
+def article(headline: str, hours_ago: float = 1, related: str = "AAPL", summary: str = "A summary.") -> dict:
+    return {
+        "headline": headline,
+        "summary": summary,
+        "source": "Wire",
+        "related": related,
+        "datetime": int(NOW - hours_ago * 3600),
+        "url": "https://news.example.com/x",
+        "image": "",
+    }
+
+
+def test_market_data_keeps_only_used_fields(make_snapshot):
+    compact = compact_market_data(make_snapshot("AAPL"))
+    assert set(compact) == {"latestTrade", "latestQuote", "dailyBar", "prevDailyBar", "minuteBar"}
+    assert set(compact["latestTrade"]) == {"price", "time"}
+    assert set(compact["prevDailyBar"]) == {"close", "volume"}
+    assert compact_market_data({"latestTrade": {"x": "V"}, "dailyBar": None}) == {}
+
+
+def test_near_duplicate_headlines_are_dropped():
+    articles = [
+        article("Apple beats earnings estimates for the quarter"),
+        article("Apple beats earnings estimates for the quarter again", hours_ago=2),
+        article("Apple unveils a new iPhone", hours_ago=3),
+    ]
+    kept, duplicates = compact_news(articles, "AAPL")
+    assert duplicates == 1
+    assert [a["headline"] for a in kept] == [
+        "Apple beats earnings estimates for the quarter",
+        "Apple unveils a new iPhone",
+    ]
+
+
+def test_recent_and_specific_articles_rank_first():
+    articles = [
+        article("Markets drift lower", hours_ago=1, related=""),
+        article("Old AAPL guidance note", hours_ago=72),
+        article("AAPL sets record close", hours_ago=2),
+        article("Chipmakers rally", hours_ago=0.5, related="NVDA,AAPL"),
+    ]
+    kept, _ = compact_news(articles, "AAPL", max_articles=2)
+    assert [a["headline"] for a in kept] == ["AAPL sets record close", "Old AAPL guidance note"]
+
+
+def test_articles_are_stripped_and_summaries_trimmed():
+    kept, _ = compact_news([article("Headline", summary="word " * 100), {"summary": "no headline"}, "junk"],
+                           summary_chars=50)
+    assert len(kept) == 1
+    assert set(kept[0]) == {"headline", "summary", "source", "date"}
+    assert kept[0]["summary"].endswith("...") and len(kept[0]["summary"]) <= 53
+    assert kept[0]["date"] == time.strftime("%Y-%m-%d", time.gmtime(NOW - 3600))
+
+
+def test_payload_is_smaller_and_reported(make_snapshot, make_news):
+    news = make_news("AAPL", 20)
+    market_json, news_json, report = build_prompt_payload(make_snapshot("AAPL"), news, "AAPL")
+    assert json.loads(market_json)["latestTrade"]
+    assert report["articles_in"] == 20
+    assert report["articles_kept"] == len(json.loads(news_json))
+    assert report["compacted_tokens"] == estimate_tokens(market_json) + estimate_tokens(news_json)
+    assert report["tokens_saved"] == report["original_tokens"] - report["compacted_tokens"] > 0
+
+
+def test_token_budget_drops_articles_then_summaries():
+    news = [article(f"Story number {i} about a different topic {i}", hours_ago=i, summary="detail " * 40)
+            for i in range(10)]
+    market_json, news_json, report = build_prompt_payload({}, news, "AAPL", token_budget=60)
+    assert estimate_tokens(market_json) + estimate_tokens(news_json) <= 60
+    kept = json.loads(news_json)
+    assert len(kept) == 1 and kept[0]["summary"] == ""
+    assert kept[0]["headline"] == "Story number 0 about a different topic 0"
+
+    _, news_json, report = build_prompt_payload({}, news, "AAPL", token_budget=0)
+    assert json.loads(news_json) == [] and report["articles_kept"] == 0
@@ -0,0 +1,172 @@
+"""
+Offline tests for rate_limit.RateLimiter: burst tokens, grants in priority
+order once the bucket is empty, priority inherited through the contextvar,
+429 pauses, the per-credential registry split across workers, and
+http_clients re-queueing a request answered with 429 (httpx.MockTransport).
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import rate_limit
+from http_clients import UpstreamClient
+from rate_limit import BACKGROUND, INTERACTIVE, TRADE, RateLimiter
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """An empty limiter registry for one worker."""
+    monkeypatch.setattr(rate_limit, "_LIMITERS", {})
+    monkeypatch.setattr(rate_limit, "WORKER_COUNT", 1)
+
+
+def test_burst_is_granted_immediately():
+    limiter = RateLimiter("test", per_minute=60, burst=3)
+
+    async def scenario():
+        start = time.monotonic()
+        for _ in range(3):
+            await limiter.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(scenario()) < 0.05
+    stats = limiter.stats()
+    assert stats["granted"]["interactive"] == 3 and stats["waited"] == 0
+    assert stats["tokens"] < 1
+
+
+def test_queued_requests_are_granted_by_priority():
+    limiter = RateLimiter("test", per_minute=6000, burst=1)  # one token every 10 ms
+    order = []
+
+    async def request(name, level):
+        await limiter.acquire(level)
+        order.append(name)
+
+    async def scenario():
+        await limiter.acquire()  # empty the bucket
+        tasks = [asyncio.create_task(request(name, level)) for name, level in [
+            ("background-1", BACKGROUND), ("interactive-1", INTERACTIVE),
+            ("background-2", BACKGROUND), ("trade", TRADE), ("interactive-2", INTERACTIVE),
+        ]]
+        await asyncio.sleep(0)
+        queued = limiter.stats()["queued"]
+        await asyncio.gather(*tasks)
+        return queued
+
+    queued = asyncio.run(scenario())
+    assert queued == {"trade": 1, "interactive": 2, "background": 2}
+    assert order == ["trade", "interactive-1", "interactive-2", "background-1", "background-2"]
+    assert limiter.waited == 5
+
+
+def test_priority_is_inherited_by_spawned_tasks():
+    limiter = RateLimiter("test", per_minute=60, burst=10)
+
+    async def scenario():
+        with rate_limit.priority(BACKGROUND):
+            await asyncio.create_task(limiter.acquire())
+        await limiter.acquire()
+        rate_limit.set_priority(TRADE)
+        await limiter.acquire()
+
+    asyncio.run(scenario())
+    assert limiter.stats()["granted"] == {"trade": 1, "interactive": 1, "background": 1}
+    assert rate_limit.current_priority() == INTERACTIVE
+
+
+def test_cancelled_waiters_do_not_take_tokens():
+    limiter = RateLimiter("test", per_minute=6000, burst=1)
+
+    async def scenario():
+        await limiter.acquire()
+        abandoned = asyncio.create_task(limiter.acquire(TRADE))
+        await asyncio.sleep(0)
+        abandoned.cancel()
+        await limiter.acquire(BACKGROUND)
+
+    asyncio.run(asyncio.wait_for(scenario(), 1))
+    assert limiter.granted[TRADE] == 0 and limiter.granted[BACKGROUND] == 1
+
+
+def test_429_pauses_the_bucket():
+    limiter = RateLimiter("test", per_minute=60000, burst=5)
+    limiter.penalize(0.2)
+
+    async def scenario():
+        start = time.monotonic()
+        await limiter.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(scenario()) >= 0.19
+    assert limiter.stats()["throttled_429"] == 1
+
+
+def test_retry_after_parsing():
+    assert rate_limit.retry_after_seconds("3") == 3.0
+    assert rate_limit.retry_after_seconds("-1") == 0.0
+    assert rate_limit.retry_after_seconds(None) == 1.0
+    assert rate_limit.retry_after_seconds("Wed, 21 Oct 2026 07:28:00 GMT", default=2.0) == 2.0
+
+
+# ---------------------- REGISTRY ------------------------ #
+def test_upstreams_sharing_a_key_share_a_limiter(registry):
+    data = rate_limit.get_limiter("alpaca_data")
+    assert rate_limit.get_limiter("alpaca_trading") is data
+    assert rate_limit.get_limiter("finnhub") is not data
+    assert rate_limit.get_limiter("deepseek") is None  # not limited by default
+    assert data.stats()["per_minute"] == rate_limit.RATE_LIMITS["alpaca"][0]
+
+
+def test_workers_split_the_budget(registry, monkeypatch):
+    monkeypatch.setattr(rate_limit, "WORKER_COUNT", 4)
+    monkeypatch.setitem(rate_limit.RATE_LIMITS, "alpaca", (200.0, 20))
+    limiter = rate_limit.get_limiter("alpaca_data")
+    assert limiter.stats()["per_minute"] == 50.0
+    assert limiter.burst == 5
+
+
+def test_429_responses_are_queued_again(registry, monkeypatch):
+    monkeypatch.setitem(rate_limit.RATE_LIMITS, "alpaca", (60000.0, 5))
+    responses = [httpx.Response(429, headers={"Retry-After": "0.1"}), httpx.Response(200, json={"ok": True})]
+    client = UpstreamClient("alpaca_data", timeout=5.0)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: responses.pop(0)))
+
+    async def scenario():
+        try:
+            start = time.monotonic()
+            result = await client.get("https://upstream.test/snapshots")
+            return result, time.monotonic() - start
+        finally:
+            await client.close()
+
+    result, elapsed = asyncio.run(scenario())
+    assert result == {"ok": True}
+    assert elapsed >= 0.09
+    assert client.limiter.stats()["throttled_429"] == 1
+
+
+def test_429_is_raised_once_retries_run_out(registry, monkeypatch):
+    monkeypatch.setitem(rate_limit.RATE_LIMITS, "alpaca", (60000.0, 5))
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_MAX_RETRIES", 1)
+    calls = []
+
+    def handler(request):
+        calls.append(1)
+        return httpx.Response(429, headers={"Retry-After": "0"})
+
+    client = UpstreamClient("alpaca_trading", timeout=5.0)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def scenario():
+        try:
+            await client.post("https://upstream.test/orders", None, {})
+        finally:
+            await client.close()
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(scenario())
+    assert len(calls) == 2
@@ -0,0 +1,305 @@
+"""
+Offline tests for resilience.py: circuit breaker state transitions, and the
+retry policy of UpstreamClient GETs (connection errors and 502/503/504 only,
+within one deadline) against an httpx.MockTransport.
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import http_clients
+import resilience
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, Resilience
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(resilience, "RETRY_BASE_DELAY", 0.001)
+    monkeypatch.setattr(resilience, "RETRY_MAX_DELAY", 0.002)
+    monkeypatch.setattr(resilience, "RETRY_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(resilience, "HEDGE_ENABLED", False)
+
+
+def expire(breaker: CircuitBreaker):
+    """Pretend reset_timeout has passed since the circuit opened."""
+    breaker.opened_at -= breaker.reset_timeout
+
+
+def open_breaker(threshold: int = 3) -> CircuitBreaker:
+    breaker = CircuitBreaker("test", threshold=threshold, reset_timeout=30)
+    for _ in range(threshold):
+        breaker.before_call()
+        breaker.record_failure()
+    return breaker
+
+
+# ---------------------- CIRCUIT BREAKER ------------------------ #
+def test_opens_after_threshold_consecutive_failures():
+    breaker = CircuitBreaker("test", threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_success()  # resets the streak
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.times_opened == 1
+
+
+def test_open_circuit_rejects_until_reset_timeout():
+    breaker = open_breaker()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.rejected == 1
+    assert breaker.stats()["retry_in"] > 0
+    expire(breaker)
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = open_breaker()
+    expire(breaker)
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.state == HALF_OPEN
+
+
+def test_successful_trial_closes_the_circuit():
+    breaker = open_breaker()
+    expire(breaker)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.failures == 0
+    breaker.before_call()
+    breaker.before_call()  # no trial limit once closed
+
+
+def test_failed_trial_reopens_the_circuit():
+    breaker = open_breaker()
+    expire(breaker)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.times_opened == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_abandoned_trial_frees_the_slot():
+    breaker = open_breaker()
+    expire(breaker)
+    breaker.before_call()
+    breaker.abandon()
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()  # another request becomes the trial
+
+
+def test_neutral_trial_closes_the_circuit():
+    breaker = open_breaker()
+    expire(breaker)
+    breaker.before_call()
+    breaker.record_neutral()  # the upstream answered, if only with a 4xx
+    assert breaker.state == CLOSED
+
+
+def test_cancelled_call_releases_the_trial():
+    upstream = Resilience("test")
+    upstream.breaker = open_breaker()
+    expire(upstream.breaker)
+
+    async def scenario():
+        task = asyncio.create_task(upstream.call(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert upstream.breaker.state == HALF_OPEN
+    upstream.breaker.before_call()
+
+
+@pytest.mark.parametrize("exc, failure", [
+    (httpx.ConnectError("refused"), True),
+    (httpx.ReadTimeout("slow"), True),
+    (CircuitOpenError("open"), False),
+    (ValueError("bad json"), False),
+])
+def test_failure_classification(exc, failure):
+    assert resilience.is_failure(exc) is failure
+
+
+# ---------------------- UPSTREAM RETRIES ------------------------ #
+def make_client(handler, timeout: float = 1.0) -> http_clients.UpstreamClient:
+    client = http_clients.UpstreamClient("resilience-test", timeout=timeout)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def run_get(client: http_clients.UpstreamClient, **kwargs):
+    async def scenario():
+        try:
+            return await client.request("GET", "https://upstream.test/quote", **kwargs)
+        finally:
+            await client.close()
+
+    return asyncio.run(scenario())
+
+
+def counting(responses):
+    """MockTransport handler returning (or raising) the given outcomes in order, then 200."""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        outcome = responses[len(calls) - 1] if len(calls) <= len(responses) else 200
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome, json={"ok": True})
+
+    return handler, calls
+
+
+@pytest.mark.parametrize("first", [502, 503, 504, httpx.ConnectError("refused"), httpx.ConnectTimeout("slow")])
+def test_retries_connection_errors_and_gateway_statuses(first):
+    handler, calls = counting([first, first])
+    client = make_client(handler)
+    response = run_get(client)
+    assert response.status_code == 200
+    assert len(calls) == 3
+    assert client.resilience.retries == 2
+
+
+@pytest.mark.parametrize("first", [500, 404, httpx.ReadTimeout("slow"), httpx.RemoteProtocolError("reset")])
+def test_does_not_retry_other_errors(first):
+    handler, calls = counting([first])
+    client = make_client(handler)
+    with pytest.raises((httpx.HTTPStatusError, httpx.TransportError)):
+        run_get(client)
+    assert len(calls) == 1
+    assert client.resilience.retries == 0
+
+
+def test_gives_up_after_max_attempts():
+    handler, calls = counting([503] * 10)
+    client = make_client(handler)
+    with pytest.raises(httpx.HTTPStatusError):
+        run_get(client)
+    assert len(calls) == resilience.RETRY_MAX_ATTEMPTS
+    assert client.resilience.breaker.failures == resilience.RETRY_MAX_ATTEMPTS
+
+
+def test_client_errors_do_not_count_against_the_circuit():
+    handler, _ = counting([404])
+    client = make_client(handler)
+    with pytest.raises(httpx.HTTPStatusError):
+        run_get(client)
+    assert client.resilience.breaker.failures == 0
+
+
+def test_posts_are_never_retried():
+    handler, calls = counting([503])
+    client = make_client(handler)
+
+    async def scenario():
+        try:
+            await client.request("POST", "https://upstream.test/orders", json={})
+        finally:
+            await client.close()
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(scenario())
+    assert len(calls) == 1
+
+
+def test_open_circuit_fails_without_sending():
+    handler, calls = counting([])
+    client = make_client(handler)
+    client.resilience.breaker = open_breaker()
+    with pytest.raises(CircuitOpenError):
+        run_get(client)
+    assert calls == []
+
+
+def test_attempts_share_one_deadline():
+    budgets = []
+
+    async def send(timeout):
+        budgets.append(timeout)
+        await asyncio.sleep(0.05)
+        raise httpx.ConnectError("refused")
+
+    async def scenario():
+        start = time.monotonic()
+        with pytest.raises(httpx.ConnectError):
+            await Resilience("test").call_idempotent(send, deadline=0.3)
+        return time.monotonic() - start
+
+    elapsed = asyncio.run(scenario())
+    assert len(budgets) == resilience.RETRY_MAX_ATTEMPTS
+    assert budgets[0] <= 0.3
+    assert budgets == sorted(budgets, reverse=True) and budgets[-1] < budgets[0] - 0.09
+    assert elapsed < 0.3
+
+
+def test_backoff_past_the_deadline_is_not_slept(monkeypatch):
+    monkeypatch.setattr(resilience, "RETRY_BASE_DELAY", 5.0)
+    monkeypatch.setattr(resilience, "RETRY_MAX_DELAY", 5.0)
+    monkeypatch.setattr(resilience.random, "uniform", lambda low, high: high)
+    handler, calls = counting([503, 503])
+    client = make_client(handler)
+    start = time.monotonic()
+    with pytest.raises(httpx.HTTPStatusError):
+        run_get(client, timeout=0.5)
+    assert time.monotonic() - start < 0.5
+    assert len(calls) == 1
+
+
+def test_each_attempt_gets_the_remaining_budget():
+    timeouts = []
+
+    def handler(request):
+        timeouts.append(request.extensions["timeout"]["read"])
+        if len(timeouts) < 3:
+            raise httpx.ConnectError("refused")
+        return httpx.Response(200, json={})
+
+    client = make_client(handler, timeout=2.0)
+    run_get(client)
+    assert timeouts[0] <= 2.0
+    assert timeouts == sorted(timeouts, reverse=True)
+
+
+def test_cancelled_stream_releases_the_trial():
+    async def handler(request):
+        await asyncio.sleep(10)
+        return httpx.Response(200)
+
+    client = make_client(handler)
+    client.resilience.breaker = open_breaker()
+    expire(client.resilience.breaker)
+
+    async def scenario():
+        async def consume():
+            async with client.stream("GET", "https://upstream.test/stream"):
+                pass
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await client.close()
+
+    asyncio.run(scenario())
+    assert client.resilience.breaker.state == HALF_OPEN
+    assert client.in_flight == 0
+    client.resilience.breaker.before_call()
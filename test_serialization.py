@@ -0,0 +1,74 @@
+"""
+Offline tests for serialization: dumps() renders what FastAPI's JSONResponse
+would, and the FAST_SERIALIZATION paths of /api/audit and /api/get_portfolio
+return the same bytes as response_model validation, plus the NDJSON audit
+export.
+"""
+
+import json
+from datetime import date, datetime
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import serialization
+
+
+def test_dumps_matches_json_response():
+    value = {"symbol": "NESN", "name": "Nestlé", "price": 101.5, "qty": 3, "ok": True, "none": None,
+             "at": datetime(2026, 1, 5, 9, 30, 0, 123456), "day": date(2026, 1, 5), "rows": [1, 2.25]}
+    assert serialization.dumps(value) == JSONResponse(jsonable_encoder(value)).body
+
+
+def test_records_and_ndjson():
+    fields = ("id", "action")
+    rows = [("a", "TRADE"), ("b", "VIEW")]
+    assert serialization.records(fields, rows) == [{"id": "a", "action": "TRADE"}, {"id": "b", "action": "VIEW"}]
+    assert serialization.ndjson(fields, rows) == b'{"id":"a","action":"TRADE"}\n{"id":"b","action":"VIEW"}\n'
+
+
+# ---------------------- ROUTES ------------------------ #
+def both_paths(client, monkeypatch, path: str, **params):
+    """Responses for the same request with and without FAST_SERIALIZATION."""
+    responses = {}
+    for fast in (True, False):
+        monkeypatch.setattr(serialization, "FAST_SERIALIZATION", fast)
+        responses[fast] = client.get(path, params=params)
+        assert responses[fast].status_code == 200
+    return responses[True], responses[False]
+
+
+@pytest.fixture
+def audit_entries(server):
+    for i in range(5):
+        server.add_audit_entry("TRADE", f"Bought {i} shares of Nestlé \"NESN\"", "Agent")
+    server.AUDIT_STORE.flush()
+
+
+def test_audit_fast_path_matches_the_model_path(client, audit_entries, monkeypatch):
+    fast, validated = both_paths(client, monkeypatch, "/api/audit", limit=3, actor="Agent")
+    assert fast.content == validated.content
+    assert fast.headers["X-Next-Cursor"] == validated.headers["X-Next-Cursor"]
+    assert fast.headers["ETag"] == validated.headers["ETag"]
+    assert len(fast.json()) == 3
+
+
+def test_portfolio_fast_path_matches_the_model_path(server, client, monkeypatch, make_positions):
+    held = make_positions(["AAPL", "MSFT", "BRK.B"])
+
+    async def positions():
+        return held
+
+    monkeypatch.setattr(server, "fetch_positions", positions)
+    fast, validated = both_paths(client, monkeypatch, "/api/get_portfolio")
+    assert fast.content == validated.content
+    assert [p["symbol"] for p in fast.json()] == ["AAPL", "MSFT", "BRK.B"]
+
+
+def test_ndjson_export_matches_json_pages(client, audit_entries):
+    page = client.get("/api/audit", params={"limit": 1000}).json()
+    response = client.get("/api/audit", params={"limit": 100000, "format": "ndjson"})
+    assert response.headers["content-type"] == serialization.NDJSON_MEDIA_TYPE
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert exported == list(reversed(page))  # newest first
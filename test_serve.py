@@ -0,0 +1,118 @@
+"""
+Offline tests for the serving entry points: serve.py has no import side
+effects and picks uvicorn or the supervisor from --workers, and
+supervisor.Supervisor keeps answering requests through a SIGHUP rolling
+restart. The supervisor test runs a minimal ASGI app in a subprocess on a
+local port.
+"""
+
+import os
+import signal
+import socket
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+
+import httpx
+import pytest
+
+import serve
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_importing_serve_does_not_import_the_app():
+    code = "import sys, serve; print('server' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO, capture_output=True, text=True, timeout=60)
+    assert result.stdout.strip() == "False", result.stderr
+
+
+def test_single_worker_runs_uvicorn(monkeypatch):
+    calls = []
+    monkeypatch.setattr(serve.uvicorn, "run", lambda app, **kwargs: calls.append((app, kwargs)))
+    serve.main(["--port", "9001", "--workers", "1"])
+    assert calls == [("server:app", {"host": "0.0.0.0", "port": 9001})]
+
+
+def test_several_workers_run_under_the_supervisor(monkeypatch, tmp_path):
+    started = []
+
+    class Supervisor:
+        def __init__(self, app, host, port, workers):
+            started.append((app, host, port, workers))
+
+        def run(self):
+            started.append(os.environ["WEB_CONCURRENCY"])
+
+    monkeypatch.setattr(serve.supervisor, "Supervisor", Supervisor)
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    monkeypatch.setenv("METRICS_DIR", str(tmp_path))
+    (tmp_path / "stale.json").write_text("{}")
+    serve.main(["--host", "127.0.0.1", "--port", "9002", "--workers", "3"])
+    assert started == [("server:app", "127.0.0.1", 9002, 3), "3"]
+    assert not (tmp_path / "stale.json").exists()
+
+
+# ---------------------- SUPERVISOR ------------------------ #
+APP = textwrap.dedent("""
+    import os
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                await send({"type": message["type"] + ".complete"})
+                if message["type"] == "lifespan.shutdown":
+                    return
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": str(os.getpid()).encode()})
+""")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGHUP"), reason="rolling restarts need SIGHUP")
+def test_rolling_restart_keeps_serving(tmp_path):
+    (tmp_path / "tiny_app.py").write_text(APP)
+    port = free_port()
+    code = f"import sys; sys.path.insert(1, {REPO!r}); import supervisor; " \
+           f"supervisor.Supervisor('tiny_app:app', '127.0.0.1', {port}, 2, graceful_timeout=1).run()"
+    process = subprocess.Popen([sys.executable, "-u", "-c", code], cwd=tmp_path,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    output = []
+    reader = threading.Thread(target=lambda: output.extend(process.stdout), daemon=True)
+    reader.start()
+    url = f"http://127.0.0.1:{port}/"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                before = httpx.get(url, timeout=5).text
+                break
+            except httpx.TransportError:
+                assert time.monotonic() < deadline, "".join(output)
+                time.sleep(0.2)
+
+        process.send_signal(signal.SIGHUP)
+        failures = 0
+        deadline = time.monotonic() + 60
+        while sum("replaced by" in line for line in output) < 2:
+            assert time.monotonic() < deadline, "".join(output)
+            try:
+                httpx.get(url, timeout=5)
+            except httpx.TransportError:
+                failures += 1
+            time.sleep(0.05)
+        assert failures == 0
+        assert httpx.get(url, timeout=5).text != before
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=60)
+        reader.join(timeout=5)
+    assert process.returncode == 0, "".join(output)
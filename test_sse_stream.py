@@ -0,0 +1,139 @@
+"""
+Offline tests for the Server-Sent Events analysis stream: event formatting,
+token deltas parsed from a streaming completion (httpx.MockTransport), and the
+event sequences of /api/get_agent_analysis/stream and /api/agent/stream,
+including cached verdicts and failures. Upstream fetches are replaced with
+coroutines.
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+import http_clients
+
+VERDICT = {"action": "BUY", "confidence": 0.8, "drivers": ["test"], "explanation": "Looks good."}
+
+
+def parse_events(body: str) -> list:
+    events = []
+    for message in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in message.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_events_are_formatted(server):
+    message = server.sse_event("token", {"symbol": "AAPL", "delta": "{\n"})
+    assert message == 'event: token\ndata: {"symbol": "AAPL", "delta": "{\\n"}\n\n'
+    assert parse_events(message) == [("token", {"symbol": "AAPL", "delta": "{\n"})]
+
+
+def test_completion_deltas_are_streamed(server, monkeypatch, make_snapshot):
+    text = json.dumps(VERDICT)
+    pieces = [text[i:i + 10] for i in range(0, len(text), 10)]
+    body = "".join(f"data: {json.dumps({'choices': [{'delta': {'content': piece}}]})}\n\n" for piece in pieces)
+    body += ": keep-alive\n\ndata: not json\n\ndata: [DONE]\n\n"
+    requests = []
+
+    def handler(request):
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, text=body, headers={"Content-Type": "text/event-stream"})
+
+    async def scenario():
+        client = http_clients.get_client(server.DEEPSEEK)
+        monkeypatch.setattr(client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        try:
+            return [item async for item in server.analyze_stock_stream(make_snapshot("AAPL"), [], "AAPL")]
+        finally:
+            await client.close()
+
+    items = asyncio.run(scenario())
+    assert requests[0]["stream"] is True
+    assert [value for kind, value in items if kind == "token"] == pieces
+    kind, verdict = items[-1]
+    assert kind == "verdict"
+    assert {key: verdict[key] for key in VERDICT} == VERDICT
+    assert "prompt_stats" in verdict
+
+
+# ---------------------- STREAM ROUTE ------------------------ #
+@pytest.fixture
+def analyses(server, monkeypatch, make_news):
+    """Patches the fetches and the streaming LLM call; returns the tickers analyzed."""
+    calls = []
+
+    async def market_data(ticker):
+        if ticker == "MISSING":
+            raise HTTPException(status_code=404, detail="Symbol not found")
+        return {"latestTrade": {"p": 100.0}}
+
+    async def company_news(ticker):
+        return make_news(ticker, 2)
+
+    async def analyze_stock_stream(market, news, ticker=None):
+        calls.append(ticker)
+        if ticker == "BOOM":
+            raise RuntimeError("unexpected")
+        for piece in ("{", "...", "}"):
+            yield "token", piece
+        yield "verdict", dict(VERDICT)
+
+    monkeypatch.setattr(server, "get_market_data", market_data)
+    monkeypatch.setattr(server, "get_company_news", company_news)
+    monkeypatch.setattr(server, "analyze_stock_stream", analyze_stock_stream)
+    server.VERDICT_CACHE.clear()
+    return calls
+
+
+def stream(client, symbol: str) -> list:
+    response = client.get("/api/get_agent_analysis/stream", params={"symbol": symbol})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+    return parse_events(response.text)
+
+
+def test_stream_reports_each_stage(client, analyses):
+    events = stream(client, "aapl")
+    names = [name for name, _ in events]
+    assert names[0] == "start" and names[-2:] == ["verdict", "done"]
+    assert sorted(names[1:3]) == ["market_data", "news"]
+    assert names[3:-2] == ["token"] * 3
+    data = dict(events)
+    assert data["news"] == {"symbol": "AAPL", "status": "ok", "ms": data["news"]["ms"], "articles": 2}
+    assert data["verdict"]["symbol"] == "AAPL"
+    assert data["verdict"]["recommendation"] == "BUY"
+    assert data["verdict"]["cache_status"] == "fresh"
+
+
+def test_cached_verdicts_stream_without_tokens(client, analyses):
+    stream(client, "AAPL")
+    events = stream(client, "AAPL")
+    assert "token" not in [name for name, _ in events]
+    assert dict(events)["verdict"]["cache_status"] == "cached"
+    assert analyses == ["AAPL"]
+
+
+def test_failures_end_the_stream_with_an_error(client, analyses):
+    events = stream(client, "MISSING")
+    assert [name for name, _ in events][-2:] == ["error", "done"]
+    assert dict(events)["error"] == {"symbol": "MISSING", "status_code": 404, "detail": "Symbol not found"}
+    assert analyses == []
+
+
+def test_agent_stream_reports_failures_per_ticker(server, client, analyses, monkeypatch, make_positions):
+    async def positions(url, headers=None, params=None, timeout=None):
+        return make_positions(["AAPL", "MISSING", "BOOM"])
+
+    monkeypatch.setattr(http_clients.get_client(server.ALPACA_TRADING), "get", positions)
+    response = client.post("/api/agent/stream", json={"user_id": "test"})
+    events = parse_events(response.text)
+    assert events[0] == ("start", {"tickers": ["AAPL", "MISSING", "BOOM"]})
+    assert events[-1][0] == "done" and events[-1][1]["count"] == 1
+    errors = {data["symbol"]: data["status_code"] for name, data in events if name == "error"}
+    assert errors == {"MISSING": 404, "BOOM": 500}
+    assert [data["symbol"] for name, data in events if name == "recommendation"] == ["AAPL"]
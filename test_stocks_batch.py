@@ -0,0 +1,89 @@
+"""
+Offline tests for server.get_market_data_batch and /api/stocks: cached
+symbols skip the upstream, the rest are fetched in SNAPSHOT_BATCH_SIZE chunks,
+outages fall back to stale snapshots, and errors are reported per symbol. The
+Alpaca data client's get() is replaced with a coroutine.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+import http_clients
+
+
+@pytest.fixture
+def alpaca(server, monkeypatch, make_snapshot):
+    """Fake multi-symbol snapshot endpoint; returns the symbol lists requested."""
+    requested = []
+    state = {"status": None}
+
+    async def get(url, headers=None, params=None, timeout=None):
+        chunk = params["symbols"].split(",")
+        requested.append(chunk)
+        if state["status"] is not None:
+            request = httpx.Request("GET", url)
+            raise httpx.HTTPStatusError("error", request=request, response=httpx.Response(state["status"], request=request))
+        return {symbol: make_snapshot(symbol) for symbol in chunk if symbol != "NOPE"}
+
+    monkeypatch.setattr(http_clients.get_client(server.ALPACA_DATA), "get", get)
+    monkeypatch.setattr(server, "SNAPSHOT_BATCH_SIZE", 2)
+    server.SNAPSHOT_CACHE.clear()
+    yield requested, state
+    server.SNAPSHOT_CACHE.clear()
+
+
+def test_missing_symbols_are_fetched_in_chunks(server, alpaca, make_snapshot):
+    requested, _ = alpaca
+    server.SNAPSHOT_CACHE.set("MSFT", make_snapshot("MSFT"))
+    snapshots, errors = asyncio.run(server.get_market_data_batch(["AAPL", "MSFT", "GOOGL", "NOPE", "TSLA"]))
+    assert sorted(requested) == [["AAPL", "GOOGL"], ["NOPE", "TSLA"]]
+    assert sorted(snapshots) == ["AAPL", "GOOGL", "MSFT", "TSLA"]
+    assert errors == {"NOPE": "Symbol not found"}
+    assert server.SNAPSHOT_CACHE.get("TSLA") is snapshots["TSLA"]
+
+    requested.clear()
+    asyncio.run(server.get_market_data_batch(["AAPL", "TSLA"]))
+    assert requested == []
+
+
+def test_outages_fall_back_to_stale_snapshots(server, alpaca, make_snapshot):
+    _, state = alpaca
+    server.SNAPSHOT_CACHE.set("AAPL", make_snapshot("AAPL"), ttl=-1)
+    state["status"] = 503
+    snapshots, errors = asyncio.run(server.get_market_data_batch(["AAPL", "MSFT"]))
+    assert snapshots["AAPL"]["stale"] is True
+    assert errors == {"MSFT": "Alpaca API error: 503"}
+
+
+def test_client_errors_do_not_serve_stale_data(server, alpaca, make_snapshot):
+    _, state = alpaca
+    server.SNAPSHOT_CACHE.set("AAPL", make_snapshot("AAPL"), ttl=-1)
+    state["status"] = 403
+    snapshots, errors = asyncio.run(server.get_market_data_batch(["AAPL"]))
+    assert snapshots == {}
+    assert errors == {"AAPL": "Alpaca API error: 403"}
+
+
+# ---------------------- STOCKS ROUTE ------------------------ #
+def test_stocks_route(server, client, alpaca):
+    requested, _ = alpaca
+    response = client.get("/api/stocks", params=[("symbols", "aapl, msft"), ("symbols", "NOPE"), ("symbols", "AAPL")])
+    assert response.status_code == 200
+    body = response.json()
+    assert sorted(body["results"]) == ["AAPL", "MSFT"]
+    aapl = body["results"]["AAPL"]
+    snapshot = server.SNAPSHOT_CACHE.get("AAPL")
+    assert aapl["current_price"] == snapshot["latestTrade"]["p"]
+    assert aapl["change_pct"] == server.snapshot_change_pct(snapshot, aapl["current_price"])
+    assert not aapl["stale"]
+    assert body["errors"] == {"NOPE": "Symbol not found"}
+    assert sorted(symbol for chunk in requested for symbol in chunk) == ["AAPL", "MSFT", "NOPE"]
+
+
+def test_stocks_route_caps_the_symbol_count(server, client, alpaca, monkeypatch):
+    monkeypatch.setattr(server, "BATCH_MAX_SYMBOLS", 2)
+    response = client.get("/api/stocks", params={"symbols": "A,B,C"})
+    assert response.status_code == 400
+    assert alpaca[0] == []
@@ -0,0 +1,133 @@
+"""
+Offline tests for the storage backends (storage.MemoryStorage and
+storage.SQLiteStorage): seeding, points credited through the write-behind
+buffer, additive updates from several workers, lessons, and the /api/game and
+/api/learn routes. SQLite tests use a temporary database file.
+"""
+
+import threading
+
+import pytest
+
+import storage
+
+POINTS = {"demo": {"points": 150, "badges": ["Early Adopter"], "streak": 3}}
+LESSONS = [
+    {"id": "lesson_002", "title": "Two", "content": "...", "category": "Strategy", "points_reward": 15},
+    {"id": "lesson_001", "title": "One", "content": "...", "category": "Basics", "points_reward": 10},
+]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "storage.db")
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, db_path):
+    store = storage.open_storage(db_path, POINTS, LESSONS, backend=request.param)
+    yield store
+    store.close()
+
+
+def test_backends_are_seeded(store):
+    assert store.get_points("demo") == POINTS["demo"]
+    assert store.get_points("nobody") is None
+    assert sorted(lesson["id"] for lesson in store.get_lessons()) == ["lesson_001", "lesson_002"]
+    assert store.stats()["pending_orders"]["pending"] == 0
+
+
+def test_points_are_credited(store):
+    store.add_points("demo", 10)
+    store.add_points("demo", 5)
+    store.add_points("nobody", 5)
+    assert store.get_points("demo")["points"] == 165
+    store.flush()
+    assert store.get_points("demo")["points"] == 165
+    assert store.get_points("nobody") is None
+
+
+def test_unknown_backend_is_rejected(db_path):
+    with pytest.raises(ValueError, match="STORAGE_BACKEND"):
+        storage.open_storage(db_path, POINTS, LESSONS, backend="redis")
+
+
+# ---------------------- SQLITE ------------------------ #
+def test_credits_are_buffered_until_flushed(db_path):
+    store = storage.SQLiteStorage(db_path, POINTS, LESSONS, flush_interval=3600)
+    other = storage.SQLiteStorage(db_path, POINTS, LESSONS, flush_interval=3600)
+    try:
+        store.add_points("demo", 10)
+        assert store.stats()["buffered_point_updates"] == 1
+        assert other.get_points("demo")["points"] == 150  # not written yet
+        store.flush()
+        assert other.get_points("demo")["points"] == 160
+        assert store.stats()["buffered_point_updates"] == 0
+    finally:
+        store.close()
+        other.close()
+
+
+def test_workers_add_rather_than_overwrite(db_path):
+    workers = [storage.SQLiteStorage(db_path, POINTS, LESSONS, flush_interval=3600) for _ in range(4)]
+
+    def credit(worker):
+        for _ in range(25):
+            worker.add_points("demo", 1)
+            worker.flush()
+
+    threads = [threading.Thread(target=credit, args=(worker,)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for worker in workers:
+        worker.close()
+
+    reopened = storage.SQLiteStorage(db_path, POINTS, LESSONS)
+    try:
+        assert reopened.get_points("demo")["points"] == 250  # seed is not reapplied
+    finally:
+        reopened.close()
+
+
+def test_close_flushes_and_lessons_are_read_once(db_path):
+    store = storage.SQLiteStorage(db_path, POINTS, LESSONS, flush_interval=3600)
+    store.add_points("demo", 1)
+    lessons = store.get_lessons()
+    assert [lesson["id"] for lesson in lessons] == ["lesson_001", "lesson_002"]
+    assert store.get_lessons() is lessons
+    store.close()
+
+    reopened = storage.SQLiteStorage(db_path, {"demo": {"points": 0, "badges": [], "streak": 0}}, [])
+    try:
+        assert reopened.get_points("demo")["points"] == 151
+        assert len(reopened.get_lessons()) == 2
+    finally:
+        reopened.close()
+
+
+def test_pool_reuses_connections(db_path):
+    pool = storage.SQLitePool(db_path, size=2)
+    try:
+        with pool.connection() as first:
+            pass
+        with pool.connection() as again:
+            assert again is first
+        with pool.connection(), pool.connection():
+            assert pool.stats() == {"size": 2, "open": 2, "idle": 0}
+        assert pool.stats()["idle"] == 2
+    finally:
+        pool.close()
+
+
+# ---------------------- ROUTES ------------------------ #
+def test_points_and_lessons_routes(server, client):
+    response = client.get("/api/game/points")
+    assert response.status_code == 200
+    assert response.json()["points"] == server.STORAGE.get_points("demo")["points"]
+    assert client.get("/api/game/points", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+    lesson = client.get("/api/learn/daily").json()
+    assert lesson["id"] in {lesson["id"] for lesson in server.DEFAULT_LESSONS}
+    assert client.get("/api/storage/stats").json()["backend"] == "SQLiteStorage"
@@ -0,0 +1,93 @@
+"""
+Offline tests for server.super_agent's fetch stage: market data and news are
+fetched concurrently, each under its own deadline, and news degrades to an
+empty list while market data is required. Upstream calls and the LLM are
+replaced with coroutines.
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+DELAY = 0.2
+
+
+@pytest.fixture
+def agent(server, monkeypatch, make_snapshot, make_news):
+    """Patches the fetches and the LLM; returns the news lists analyze_stock was given."""
+    analyzed = []
+
+    async def market_data(ticker):
+        await asyncio.sleep(DELAY)
+        return make_snapshot(ticker)
+
+    async def company_news(ticker):
+        await asyncio.sleep(DELAY)
+        return make_news(ticker, 3)
+
+    async def analyze_stock(market, news, ticker=None):
+        analyzed.append(news)
+        return {"ticker": ticker, "action": "HOLD", "drivers": ["test"]}
+
+    monkeypatch.setattr(server, "get_market_data", market_data)
+    monkeypatch.setattr(server, "get_company_news", company_news)
+    monkeypatch.setattr(server, "analyze_stock", analyze_stock)
+    server.VERDICT_CACHE.clear()
+    return analyzed
+
+
+def test_sources_are_fetched_concurrently(server, agent):
+    result = asyncio.run(server.super_agent("AAPL"))
+    assert result["action"] == "HOLD"
+    assert not result["partial"]
+    assert result["sources"] == {"market_data": "ok", "news": "ok"}
+    assert len(agent[0]) == 3
+    timings = result["timings"]
+    assert timings["market_data_ms"] >= DELAY * 1000 and timings["news_ms"] >= DELAY * 1000
+    assert timings["fetch_ms"] < 2 * DELAY * 1000  # not one after the other
+
+
+def test_slow_news_degrades_to_a_partial_result(server, agent, monkeypatch):
+    monkeypatch.setattr(server, "NEWS_DEADLINE", DELAY / 4)
+    result = asyncio.run(server.super_agent("MSFT"))
+    assert result["partial"]
+    assert result["sources"]["news"] == "timeout"
+    assert agent == [[]]
+    assert result["timings"]["fetch_ms"] < 2 * DELAY * 1000
+
+
+def test_failed_news_degrades_to_a_partial_result(server, agent, monkeypatch):
+    async def broken_news(ticker):
+        raise HTTPException(status_code=502, detail="Finnhub API error: 500")
+
+    monkeypatch.setattr(server, "get_company_news", broken_news)
+    result = asyncio.run(server.super_agent("NVDA"))
+    assert result["sources"]["news"] == "error"
+    assert agent == [[]]
+
+
+def test_market_data_is_required(server, agent, monkeypatch):
+    monkeypatch.setattr(server, "MARKET_DATA_DEADLINE", DELAY / 4)
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.super_agent("AMZN"))
+    assert excinfo.value.status_code == 504
+    assert agent == []
+
+    async def missing(ticker):
+        raise HTTPException(status_code=404, detail="Symbol not found")
+
+    monkeypatch.setattr(server, "get_market_data", missing)
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.super_agent("AMZN"))
+    assert excinfo.value.status_code == 404
+
+
+def test_malformed_market_data_is_an_upstream_error(server, agent, monkeypatch):
+    async def malformed(ticker):
+        raise ValueError("Expecting value: line 1 column 1")
+
+    monkeypatch.setattr(server, "get_market_data", malformed)
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.super_agent("TSLA"))
+    assert excinfo.value.status_code == 502
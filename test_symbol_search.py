@@ -0,0 +1,82 @@
+"""
+Offline tests for symbols.SymbolDirectory.search: ranking of exact, prefix,
+token and fuzzy matches, index rebuilds after add(), and the
+/api/search/suggest typeahead route over the bundled symbols.csv.
+"""
+
+import pytest
+
+from symbols import SymbolDirectory
+
+
+@pytest.fixture
+def directory():
+    directory = SymbolDirectory()
+    directory.add("AAPL", "Apple Inc.", ["Apple", "iPhone"])
+    directory.add("AMD", "Advanced Micro Devices, Inc.")
+    directory.add("AMZN", "Amazon.com, Inc.", ["Amazon"])
+    directory.add("GOOGL", "Alphabet Inc.", ["Alphabet", "Google"])
+    directory.add("BAC", "Bank of America Corporation")
+    directory.add("BK", "The Bank of New York Mellon Corporation")
+    directory.add("MSFT", "Microsoft Corporation", ["Microsoft"])
+    return directory
+
+
+def symbols(results) -> list:
+    return [result["symbol"] for result in results]
+
+
+def test_exact_symbol_ranks_first(directory):
+    results = directory.search("amd")
+    assert results[0] == {"symbol": "AMD", "name": "Advanced Micro Devices, Inc.", "score": 1.0, "match": "symbol"}
+
+
+def test_symbol_prefixes_prefer_shorter_symbols(directory):
+    results = directory.search("A")
+    assert symbols(results)[:3] == ["AMD", "AAPL", "AMZN"]
+    assert {result["match"] for result in results[:3]} == {"symbol_prefix"}
+
+
+def test_names_and_aliases_resolve(directory):
+    assert directory.search("Google")[0]["symbol"] == "GOOGL"
+    assert directory.search("Google")[0]["match"] == "name"
+    assert directory.search("Microsoft Corp")[0]["symbol"] == "MSFT"
+    assert directory.search("micro")[0]["match"] == "name_prefix"
+
+
+def test_every_query_token_must_match(directory):
+    results = directory.search("bank new")
+    assert symbols(results)[0] == "BK"
+    assert results[0]["match"] == "token"
+    assert "BAC" not in [r["symbol"] for r in results if r["match"] == "token"]
+
+
+def test_typos_fall_back_to_fuzzy_matches(directory):
+    results = directory.search("Amazn")
+    assert results[0]["symbol"] == "AMZN"
+    assert results[0]["match"] == "fuzzy"
+    assert directory.search("zzzz") == []
+
+
+def test_limit_and_empty_queries(directory):
+    assert len(directory.search("a", limit=2)) == 2
+    assert directory.search("   ") == []
+
+
+def test_added_listings_are_searchable(directory):
+    directory.search("pal")
+    directory.add("PLTR", "Palantir Technologies Inc.", ["Palantir"])
+    assert directory.search("pal")[0]["symbol"] == "PLTR"
+    assert directory.lookup_name("palantir") == "PLTR"
+
+
+# ---------------------- SUGGEST ROUTE ------------------------ #
+def test_suggest_route(client):
+    response = client.get("/api/search/suggest", params={"q": "coca", "limit": 3})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["query"] == "coca"
+    assert body["results"][0]["symbol"] == "KO"
+    assert len(body["results"]) <= 3
+
+    assert client.get("/api/search/suggest", params={"q": "a", "limit": 0}).status_code == 422
@@ -0,0 +1,120 @@
+"""
+Offline tests for ticker resolution: company name normalization, the
+write-behind symbols.TickerCache, and server.resolve_ticker asking the LLM only
+when the symbol directory and the cache both miss. Each test uses a temporary
+SQLite file; the LLM call is replaced with a coroutine.
+"""
+
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from symbols import TickerCache, normalize_company_name
+
+
+@pytest.mark.parametrize("name, normalized", [
+    ("Apple Inc.", "apple"),
+    ("  APPLE  ", "apple"),
+    ("The Walt Disney Company", "walt disney"),
+    ("Johnson & Johnson", "johnson & johnson"),
+    ("Procter & Gamble Co.", "procter & gamble"),
+    ("McDonald's Corp", "mcdonalds"),
+])
+def test_company_names_are_normalized(name, normalized):
+    assert normalize_company_name(name) == normalized
+
+
+def stored(db_path: str) -> dict:
+    conn = sqlite3.connect(db_path)
+    try:
+        return dict(conn.execute("SELECT name, symbol FROM ticker_resolutions").fetchall())
+    finally:
+        conn.close()
+
+
+def test_mappings_are_written_behind_and_survive_reopen(tmp_path):
+    db_path = str(tmp_path / "tickers.db")
+    cache = TickerCache(db_path, flush_interval=3600)
+    cache.set("Palantir Technologies Inc.", "PLTR")
+    assert cache.get("palantir technologies") == "PLTR"  # visible at once
+    assert stored(db_path) == {}  # not written yet
+    cache.close()
+    assert stored(db_path) == {"palantir technologies": "PLTR"}
+
+    reopened = TickerCache(db_path)
+    try:
+        assert reopened.get("PALANTIR TECHNOLOGIES") == "PLTR"
+        assert reopened.get("unknown") is None
+        assert reopened.stats() == {"entries": 1, "hits": 1, "misses": 1, "hit_ratio": 0.5}
+    finally:
+        reopened.close()
+
+
+def test_flusher_thread_writes_periodically(tmp_path):
+    db_path = str(tmp_path / "tickers.db")
+    cache = TickerCache(db_path, flush_interval=0.05)
+    try:
+        cache.set("Snowflake", "SNOW")
+        for _ in range(100):
+            if stored(db_path):
+                break
+            time.sleep(0.02)
+        assert stored(db_path) == {"snowflake": "SNOW"}
+    finally:
+        cache.close()
+
+
+def test_names_without_content_are_ignored(tmp_path):
+    cache = TickerCache(str(tmp_path / "tickers.db"))
+    try:
+        cache.set(" ... ", "XYZ")
+        assert cache.stats()["entries"] == 0
+    finally:
+        cache.close()
+
+
+# ---------------------- RESOLVE TICKER ------------------------ #
+@pytest.fixture
+def resolver(server, tmp_path, monkeypatch):
+    """resolve_ticker with a fresh ticker cache; returns the names the LLM was asked about."""
+    if not server.SYMBOL_DIRECTORY.listings:
+        server.SYMBOL_DIRECTORY.load()
+    cache = TickerCache(str(tmp_path / "tickers.db"))
+    asked = []
+
+    async def llm(company_name):
+        asked.append(company_name)
+        return {"Rivian Automotive": "RIVN"}.get(company_name, "NOTATICKER1")
+
+    monkeypatch.setattr(server, "TICKER_CACHE", cache)
+    monkeypatch.setattr(server, "_resolve_ticker_llm", llm)
+    yield asked
+    cache.close()
+
+
+@pytest.mark.parametrize("query, ticker", [
+    ("aapl", "AAPL"),          # listed symbol in any case
+    ("Apple Inc.", "AAPL"),    # exact name
+    ("google", "GOOGL"),       # alias
+    ("FORD", "F"),             # a name that looks like a ticker
+    ("XYZW", "XYZW"),          # unlisted but written as a ticker
+])
+def test_local_lookups_skip_the_llm(server, resolver, query, ticker):
+    assert asyncio.run(server.resolve_ticker(query)) == ticker
+    assert resolver == []
+
+
+def test_llm_answers_are_cached(server, resolver):
+    assert asyncio.run(server.resolve_ticker("Rivian Automotive")) == "RIVN"
+    assert asyncio.run(server.resolve_ticker("rivian automotive inc")) == "RIVN"
+    assert resolver == ["Rivian Automotive"]
+    assert server.TICKER_CACHE.stats()["entries"] == 1
+
+
+def test_answers_that_are_not_tickers_are_not_cached(server, resolver):
+    asyncio.run(server.resolve_ticker("Some Private Company"))
+    asyncio.run(server.resolve_ticker("Some Private Company"))
+    assert len(resolver) == 2
+    assert server.TICKER_CACHE.stats()["entries"] == 0
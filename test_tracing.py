@@ -0,0 +1,137 @@
+"""
+Offline tests for tracing: spans nest through awaits, spawned tasks and
+traced async generators, W3C traceparent parsing, the per-request SERVER span
+and X-Trace-Id header, and OTLP/JSON export to TRACE_EXPORT_PATH (a temporary
+file).
+"""
+
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+import tracing
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def exported(monkeypatch, tmp_path):
+    """Turns tracing on; call the result to flush and read back the exported OTLP spans."""
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_EXPORT_PATH", str(path))
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATIO", 1.0)
+
+    def read():
+        tracing.shutdown()
+        spans = []
+        for line in path.read_text().splitlines():
+            for resource in json.loads(line)["resourceSpans"]:
+                for scope in resource["scopeSpans"]:
+                    spans.extend(scope["spans"])
+        return spans
+
+    yield read
+    tracing.shutdown()
+
+
+def by_name(spans) -> dict:
+    return {span["name"]: span for span in spans}
+
+
+def test_tracing_is_off_by_default(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_EXPORT_PATH", None)
+    with tracing.span("work") as span:
+        assert span is tracing.NOOP_SPAN
+        assert tracing.current_trace_id() is None
+
+
+def test_spans_nest_across_awaits_and_tasks(exported):
+    @tracing.traced("fetch")
+    async def fetch():
+        tracing.set_attributes(ticker="AAPL", attempts=2, cached=False, price=1.5)
+        await asyncio.sleep(0)
+
+    @tracing.traced("stream")
+    async def stream():
+        with tracing.span("chunk"):
+            yield 1
+
+    @tracing.traced("task")
+    async def fetch_in_task():
+        pass
+
+    async def scenario():
+        with tracing.span("request", tracing.SERVER):
+            await fetch()
+            await asyncio.create_task(fetch_in_task())
+            assert [item async for item in stream()] == [1]
+
+    asyncio.run(scenario())
+    spans = by_name(exported())
+    root = spans["request"]
+    assert root["parentSpanId"] == "" and root["kind"] == tracing.SERVER
+    for name in ("fetch", "task", "stream"):
+        assert spans[name]["traceId"] == root["traceId"]
+        assert spans[name]["parentSpanId"] == root["spanId"]
+    assert spans["chunk"]["parentSpanId"] == spans["stream"]["spanId"]
+    assert spans["fetch"]["attributes"] == [
+        {"key": "ticker", "value": {"stringValue": "AAPL"}},
+        {"key": "attempts", "value": {"intValue": "2"}},
+        {"key": "cached", "value": {"boolValue": False}},
+        {"key": "price", "value": {"doubleValue": 1.5}},
+    ]
+
+
+def test_failures_mark_the_span(exported):
+    with pytest.raises(ValueError):
+        with tracing.span("work"):
+            raise ValueError("boom")
+    assert by_name(exported())["work"]["status"] == {"code": tracing.STATUS_ERROR, "message": "ValueError: boom"}
+
+
+@pytest.mark.parametrize("header, parsed", [
+    (f"00-{TRACE_ID}-{PARENT_ID}-01", (TRACE_ID, PARENT_ID, True)),
+    (f"00-{TRACE_ID}-{PARENT_ID}-00", (TRACE_ID, PARENT_ID, False)),
+    (f"00-{TRACE_ID}-{PARENT_ID}", None),
+    (f"00-{'0' * 32}-{PARENT_ID}-01", None),
+    (f"00-{TRACE_ID}-xyz0000000000000-01", None),
+    ("garbage", None),
+])
+def test_traceparent_parsing(header, parsed):
+    assert tracing.parse_traceparent(header) == parsed
+
+
+# ---------------------- MIDDLEWARE ------------------------ #
+def make_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(tracing.TracingMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        if item_id == "missing":
+            raise HTTPException(status_code=404)
+        with tracing.span("lookup"):
+            return {"trace_id": tracing.current_trace_id()}
+
+    return app
+
+
+def test_requests_get_a_server_span(exported):
+    with TestClient(make_app()) as client:
+        response = client.get("/items/1", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+        missing = client.get("/items/missing")
+    assert response.headers["x-trace-id"] == TRACE_ID == response.json()["trace_id"]
+    assert missing.headers["x-trace-id"] != TRACE_ID
+
+    spans = by_name(span for span in exported() if span["traceId"] == TRACE_ID)
+    server = spans["GET /items/{item_id}"]
+    assert server["parentSpanId"] == PARENT_ID
+    assert spans["lookup"]["parentSpanId"] == server["spanId"]
+    attributes = {a["key"]: a["value"] for a in server["attributes"]}
+    assert attributes["http.route"] == {"stringValue": "/items/{item_id}"}
+    assert attributes["http.target"] == {"stringValue": "/items/1"}
+    assert attributes["http.status_code"] == {"intValue": "200"}
@@ -0,0 +1,93 @@
+"""
+Offline tests for upstream_stub: latency specs, the sliding-window rate limit,
+and the stub app's Alpaca, Finnhub and DeepSeek routes, including injected
+errors, 429s and streamed completions. The app runs in a TestClient with zero
+latency.
+"""
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import upstream_stub
+from upstream_stub import Profile, WindowLimit, create_app, parse_latency
+
+
+def make_client(error_rate: float = 0.0, limits=None) -> TestClient:
+    profiles = {name: Profile("fixed:0", error_rate) for name in upstream_stub.UPSTREAMS}
+    return TestClient(create_app(profiles, limits or {}, ["AAPL", "MSFT"], articles=3))
+
+
+def test_latency_specs():
+    assert parse_latency("fixed:250")() == 0.25
+    assert 0.1 <= parse_latency("uniform:100:200")() <= 0.2
+    assert parse_latency("lognormal:40:0")() == pytest.approx(0.04)
+    for spec in ("fixed", "uniform:1", "normal:1:2", "fixed:x"):
+        with pytest.raises(ValueError):
+            parse_latency(spec)
+
+
+def test_window_limit():
+    limit = WindowLimit(2)
+    assert limit.check() is None and limit.check() is None
+    wait = limit.check()
+    assert 59 < wait <= 60
+
+
+def test_server_env_points_every_upstream_at_the_stub():
+    env = upstream_stub.server_env("http://127.0.0.1:9100")
+    assert env["ALPACA_BASE_URL"] == "http://127.0.0.1:9100/v2/stocks"
+    assert set(env) == {"ALPACA_BASE_URL", "ALPACA_TRADING_URL", "FINNHUB_URL", "DEEPSEEK_URL"}
+
+
+def test_market_data_and_news_routes():
+    client = make_client()
+    snapshots = client.get("/v2/stocks/snapshots", params={"symbols": "aapl,MSFT"}).json()
+    assert sorted(snapshots) == ["AAPL", "MSFT"]
+    assert snapshots["AAPL"]["latestTrade"]["p"] > 0
+    assert client.get("/v2/stocks/tsla/snapshot").json()["symbol"] == "TSLA"
+    assert [p["symbol"] for p in client.get("/v2/positions").json()] == ["AAPL", "MSFT"]
+    news = client.get("/api/v1/company-news", params={"symbol": "aapl"}).json()
+    assert len(news) == 3 and all(article["related"] == "AAPL" for article in news)
+    order = client.post("/v2/orders", json={"symbol": "AAPL", "qty": 1, "side": "buy"}).json()
+    assert order["status"] == "accepted" and order["symbol"] == "AAPL"
+    stats = client.get("/_stub/stats").json()
+    assert stats["alpaca_data"]["requests"] == 2 and stats["alpaca_trading"]["requests"] == 2
+
+
+def test_errors_and_rate_limits_are_injected():
+    failing = make_client(error_rate=1.0)
+    assert failing.get("/v2/positions").status_code == 503
+    assert failing.get("/_stub/stats").json()["alpaca_trading"]["errors"] == 1
+
+    limited = make_client(limits={"alpaca": WindowLimit(1)})
+    assert limited.get("/v2/positions").status_code == 200
+    response = limited.get("/v2/stocks/AAPL/snapshot")  # same credential as trading
+    assert response.status_code == 429
+    assert 59 <= int(response.headers["Retry-After"]) <= 60
+    assert limited.get("/api/v1/company-news", params={"symbol": "AAPL"}).status_code == 200
+
+
+def test_completions():
+    client = make_client()
+    ticker = client.post("/v1/chat/completions", json={
+        "messages": [{"role": "user", "content": 'Respond with only valid stock tickers. Company name: "Nvidia Corp"'}],
+    }).json()
+    assert ticker["choices"][0]["message"]["content"] == "NVID"
+    assert ticker["usage"]["total_tokens"] > 0
+
+    verdict = client.post("/v1/chat/completions", json={"messages": [{"role": "user", "content": "Analyze"}]}).json()
+    assert json.loads(verdict["choices"][0]["message"]["content"])["action"] in ("BUY", "SELL", "HOLD")
+
+
+def test_streamed_completions():
+    client = make_client()
+    response = client.post("/v1/chat/completions", json={"stream": True, "messages": [{"content": "Analyze"}]})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [line[len("data: "):] for line in response.text.splitlines() if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(event) for event in events[:-1]]
+    content = "".join(chunk["choices"][0]["delta"]["content"] for chunk in chunks if chunk["choices"])
+    assert json.loads(content)["action"] in ("BUY", "SELL", "HOLD")
+    assert chunks[-1]["usage"]["completion_tokens"] > 0
@@ -0,0 +1,130 @@
+"""
+Offline tests for the verdict cache: server.verdict_cache_key bucketing of
+prices and news, super_agent reusing and not caching fallback verdicts, and
+caches.PersistentTTLCache writing entries behind to SQLite and reloading them.
+"""
+
+import asyncio
+import sqlite3
+
+import pytest
+
+from caches import PersistentTTLCache
+
+
+def snapshot(price: float) -> dict:
+    return {"latestTrade": {"p": price}}
+
+
+NEWS = [{"id": 1, "headline": "a"}, {"id": 2, "headline": "b"}]
+
+
+def test_nearby_prices_share_a_key(server):
+    key = server.verdict_cache_key("AAPL", snapshot(100.0), NEWS)
+    assert server.verdict_cache_key("aapl", snapshot(100.1), NEWS) == key
+    assert server.verdict_cache_key("AAPL", snapshot(101.0), NEWS) != key
+    assert server.verdict_cache_key("MSFT", snapshot(100.0), NEWS) != key
+
+
+def test_news_is_keyed_by_article_set(server):
+    key = server.verdict_cache_key("AAPL", snapshot(100.0), NEWS)
+    assert server.verdict_cache_key("AAPL", snapshot(100.0), list(reversed(NEWS))) == key
+    assert server.verdict_cache_key("AAPL", snapshot(100.0), NEWS[:1]) != key
+    assert server.verdict_cache_key("AAPL", snapshot(100.0), []) != key
+    # articles without an ID are identified by headline and time
+    unidentified = server.verdict_cache_key("AAPL", snapshot(100.0), [{"headline": "a", "datetime": 1}])
+    assert server.verdict_cache_key("AAPL", snapshot(100.0), [{"headline": "a", "datetime": 2}]) != unidentified
+
+
+@pytest.fixture
+def analyses(server, monkeypatch, make_news):
+    """Patches the fetches and the LLM; returns the tickers analyze_stock was called for."""
+    calls = []
+
+    async def market_data(ticker):
+        return {**snapshot(100.0), "symbol": ticker}
+
+    async def company_news(ticker):
+        return make_news(ticker, 2)
+
+    async def analyze_stock(market, news, ticker=None):
+        calls.append(market["symbol"])
+        drivers = ["fallback-mode"] if market["symbol"] == "BAD" else ["test"]
+        return {"ticker": market["symbol"], "action": "HOLD", "drivers": drivers}
+
+    monkeypatch.setattr(server, "get_market_data", market_data)
+    monkeypatch.setattr(server, "get_company_news", company_news)
+    monkeypatch.setattr(server, "analyze_stock", analyze_stock)
+    server.VERDICT_CACHE.clear()
+    return calls
+
+
+def test_verdicts_are_reused(server, analyses):
+    first = asyncio.run(server.super_agent("AAPL"))
+    second = asyncio.run(server.super_agent("AAPL"))
+    assert analyses == ["AAPL"]
+    assert (first["cache_status"], second["cache_status"]) == ("fresh", "cached")
+
+
+def test_fallback_verdicts_are_not_cached(server, analyses):
+    asyncio.run(server.super_agent("BAD"))
+    asyncio.run(server.super_agent("BAD"))
+    assert analyses == ["BAD", "BAD"]
+
+
+# ---------------------- PERSISTENT CACHE ------------------------ #
+def rows(db_path: str) -> list:
+    conn = sqlite3.connect(db_path)
+    try:
+        return [key for (key,) in conn.execute("SELECT key FROM cache_entries ORDER BY key")]
+    finally:
+        conn.close()
+
+
+def test_entries_are_written_behind_and_reloaded(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    cache = PersistentTTLCache("verdicts", ttl=60, db_path=db_path, flush_interval=3600)
+    cache.set("a", {"action": "BUY"})
+    cache.set("b", {"action": "SELL"})
+    cache.set("expired", {"action": "HOLD"}, ttl=-1)
+    assert rows(db_path) == []
+    cache.close()
+    assert rows(db_path) == ["a", "b"]
+
+    reopened = PersistentTTLCache("verdicts", ttl=60, db_path=db_path, flush_interval=3600)
+    try:
+        assert reopened.get("a") == {"action": "BUY"}
+        assert reopened.get("expired") is None
+        reopened.invalidate("b")
+        reopened.flush()
+        assert rows(db_path) == ["a"]
+    finally:
+        reopened.close()
+
+
+def test_rows_beyond_max_entries_are_pruned(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    cache = PersistentTTLCache("verdicts", ttl=60, max_entries=2, db_path=db_path, flush_interval=3600)
+    try:
+        for i, key in enumerate("abc"):
+            cache.set(key, i, ttl=60 + i)
+        cache.flush()
+        assert rows(db_path) == ["b", "c"]  # the two that expire last
+    finally:
+        cache.close()
+
+
+def test_caches_share_a_table_by_name(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    verdicts = PersistentTTLCache("verdicts", ttl=60, db_path=db_path)
+    other = PersistentTTLCache("other", ttl=60, db_path=db_path)
+    verdicts.set("k", "verdict")
+    other.set("k", "other")
+    verdicts.close()
+    other.close()
+
+    reopened = PersistentTTLCache("other", ttl=60, db_path=db_path)
+    try:
+        assert reopened.get("k") == "other"
+    finally:
+        reopened.close()
@@ -0,0 +1,321 @@
+"""
+Plutus - Request Tracing
+Small OpenTelemetry-style tracer. A span has a trace ID, span ID, parent, kind,
+attributes and status. The current span is carried in a contextvar, so spans
+opened in awaited calls and spawned tasks nest under the request's span.
+
+Tracing is off unless TRACE_EXPORT_PATH is set; span() then only returns a
+shared no-op span. When it is on, finished spans are queued and a background
+thread appends them to the file as OTLP/JSON lines (one
+ExportTraceServiceRequest per batch), the format read by the OpenTelemetry
+Collector's otlpjsonfile receiver. Incoming W3C `traceparent` headers are
+honoured, and every response carries an X-Trace-Id header.
+"""
+
+import contextvars
+import functools
+import inspect
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import metrics
+
+TRACE_EXPORT_PATH = os.environ.get("TRACE_EXPORT_PATH") or None
+TRACE_SAMPLE_RATIO = float(os.environ.get("TRACE_SAMPLE_RATIO", "1.0"))
+SERVICE_NAME = os.environ.get("OTEL_SERVICE_NAME", "plutus-api")
+EXPORT_BATCH_SIZE = 512
+
+# OTLP span kinds and status codes
+INTERNAL = 1
+SERVER = 2
+CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns",
+                 "attributes", "status", "message", "sampled")
+
+    def __init__(self, name: str, kind: int, trace_id: str, parent_id: Optional[str], sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes: Dict[str, Any] = {}
+        self.status = STATUS_OK
+        self.message = ""
+        self.sampled = sampled
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, exc: BaseException):
+        self.status = STATUS_ERROR
+        self.message = f"{type(exc).__name__}: {exc}"
+
+    def end(self):
+        self.end_ns = time.time_ns()
+        if self.sampled:
+            _EXPORTER.submit(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items() if v is not None],
+            "status": {"code": self.status, "message": self.message} if self.message else {"code": self.status},
+        }
+
+
+class _NoopSpan:
+    trace_id = None
+    span_id = None
+
+    def set(self, **attributes):
+        pass
+
+    def fail(self, exc: BaseException):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current.get()
+    return span.trace_id if span is not None else None
+
+
+def set_attributes(**attributes):
+    """Add attributes to the current span (no-op when tracing is off)."""
+    span = _current.get()
+    if span is not None:
+        span.set(**attributes)
+
+
+def start_span(name: str, kind: int = INTERNAL, traceparent: Optional[str] = None) -> Span:
+    """New span under the current one, or a root span (continuing `traceparent` if given)."""
+    parent = _current.get()
+    if parent is not None:
+        return Span(name, kind, parent.trace_id, parent.span_id, parent.sampled)
+    remote = parse_traceparent(traceparent) if traceparent else None
+    if remote is not None:
+        return Span(name, kind, remote[0], remote[1], remote[2])
+    return Span(name, kind, f"{random.getrandbits(128):032x}", None, random.random() < TRACE_SAMPLE_RATIO)
+
+
+@contextmanager
+def span(name: str, kind: int = INTERNAL, **attributes):
+    """Run the block in a child span of the current one."""
+    if TRACE_EXPORT_PATH is None:
+        yield NOOP_SPAN
+        return
+    current = start_span(name, kind)
+    current.set(**attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.fail(e)
+        raise
+    finally:
+        _current.reset(token)
+        current.end()
+
+
+def traced(name: str):
+    """Decorator running an async function or async generator in its own span."""
+    def decorate(fn):
+        if inspect.isasyncgenfunction(fn):
+            @functools.wraps(fn)
+            async def generator_wrapper(*args, **kwargs):
+                if TRACE_EXPORT_PATH is None:
+                    async for item in fn(*args, **kwargs):
+                        yield item
+                    return
+                # The span is current only while the generator body runs, not while the caller holds an item
+                current = start_span(name)
+                generator = fn(*args, **kwargs)
+                try:
+                    while True:
+                        token = _current.set(current)
+                        try:
+                            item = await generator.__anext__()
+                        except StopAsyncIteration:
+                            break
+                        finally:
+                            _current.reset(token)
+                        yield item
+                except BaseException as e:
+                    current.fail(e)
+                    raise
+                finally:
+                    await generator.aclose()
+                    current.end()
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
+
+# ---------------------- W3C TRACE CONTEXT ------------------------ #
+def parse_traceparent(value: str) -> Optional[tuple]:
+    """(trace_id, parent_span_id, sampled) from a `traceparent` header, or None if malformed."""
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3][:2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a SERVER span per HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or TRACE_EXPORT_PATH is None:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or ())
+        current = start_span(scope["method"], SERVER, (headers.get(b"traceparent") or b"").decode("latin-1") or None)
+        current.set(**{
+            "http.method": scope["method"],
+            "http.target": scope.get("path"),
+            "http.request_content_length": int(headers[b"content-length"]) if b"content-length" in headers else None,
+        })
+        response_bytes = 0
+
+        async def send_wrapper(message):
+            nonlocal response_bytes
+            if message["type"] == "http.response.start":
+                current.set(**{"http.status_code": message["status"]})
+                if message["status"] >= 500:
+                    current.status = STATUS_ERROR
+                message["headers"] = list(message.get("headers") or ()) + [(b"x-trace-id", current.trace_id.encode())]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body") or b"")
+            await send(message)
+
+        token = _current.set(current)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            current.fail(e)
+            raise
+        finally:
+            _current.reset(token)
+            route = metrics.route_template(scope)
+            current.name = f"{scope['method']} {route}"
+            current.set(**{"http.route": route, "http.response_content_length": response_bytes})
+            current.end()
+
+
+# ---------------------- EXPORT ------------------------ #
+class _FileExporter:
+    """Background thread appending finished spans to TRACE_EXPORT_PATH as OTLP/JSON lines."""
+
+    def __init__(self):
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, span: Span):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+        self._queue.put(span)
+
+    def _run(self):
+        while True:
+            span = self._queue.get()
+            if span is None:
+                return
+            batch, stop = [span], False
+            while len(batch) < EXPORT_BATCH_SIZE:
+                try:
+                    nxt = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch: List[Span]):
+        document = {"resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": SERVICE_NAME}},
+                {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+            ]},
+            "scopeSpans": [{"scope": {"name": "plutus"}, "spans": [s.to_otlp() for s in batch]}],
+        }]}
+        line = (json.dumps(document, separators=(",", ":")) + "\n").encode()
+        try:
+            # A single O_APPEND write per line, so lines from several worker processes do not interleave
+            fd = os.open(TRACE_EXPORT_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            print(f"Trace export failed ({len(batch)} spans dropped): {e}")
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=10)
+        self._thread = None
+
+
+_EXPORTER = _FileExporter()
+
+
+def shutdown():
+    """Write out queued spans (called on application shutdown)."""
+    _EXPORTER.close()
+
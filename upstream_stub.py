@@ -0,0 +1,324 @@
+"""
+Plutus - Upstream Stub
+Local stand-in for the Alpaca market data and trading APIs, Finnhub company
+news and DeepSeek chat completions, so load tests run without API keys or
+quota. Each upstream has a latency distribution and an error rate (injected
+503s). Each API credential can have a per-minute rate limit (429 with
+Retry-After), as the real services do.
+
+Usage:
+    python upstream_stub.py --port 9100 --latency deepseek=lognormal:800:0.4 \\
+        --error-rate finnhub=0.02 --rate-limit alpaca=200
+
+Latency specs: fixed:<ms>, uniform:<min_ms>:<max_ms>, lognormal:<median_ms>:<sigma>.
+Upstreams: alpaca_data, alpaca_trading, finnhub, deepseek; rate limits are per
+credential (alpaca, finnhub, deepseek). Point the server at the stub with the
+environment printed on startup (see server_env). Counters: GET /_stub/stats.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import math
+import random
+import re
+import time
+import uuid
+import zlib
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from rate_limit import CREDENTIALS
+from symbols import SYMBOL_DIRECTORY_PATH
+
+UPSTREAMS = ("alpaca_data", "alpaca_trading", "finnhub", "deepseek")
+
+# Roughly what the real services answer in from a nearby region
+DEFAULT_LATENCY = {
+    "alpaca_data": "lognormal:40:0.5",
+    "alpaca_trading": "lognormal:60:0.5",
+    "finnhub": "lognormal:120:0.6",
+    "deepseek": "lognormal:1500:0.5",
+}
+
+NEWS_SOURCES = ("Reuters", "Bloomberg", "MarketWatch", "CNBC", "Yahoo", "Benzinga")
+NEWS_TOPICS = ("beats earnings estimates", "announces buyback", "faces regulatory probe", "expands into new market",
+               "cuts guidance", "unveils product line", "signs supply deal", "shares slide after downgrade")
+
+
+def parse_latency(spec: str):
+    """Latency sampler (returning seconds) from a fixed/uniform/lognormal spec in milliseconds."""
+    kind, *args = spec.split(":")
+    values = [float(a) for a in args]
+    if kind == "fixed" and len(values) == 1:
+        return lambda: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal" and len(values) == 2:
+        mu = math.log(max(values[0], 0.001))
+        return lambda: random.lognormvariate(mu, values[1]) / 1000
+    raise ValueError(f"invalid latency spec: {spec!r}")
+
+
+class Profile:
+    """Latency, error rate and counters for one upstream."""
+
+    def __init__(self, latency: str, error_rate: float = 0.0):
+        self.latency = latency
+        self.sample = parse_latency(latency)
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+
+
+class WindowLimit:
+    """At most `per_minute` requests in any 60-second window."""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self._times: deque = deque()
+
+    def check(self) -> Optional[float]:
+        """None if the request is allowed, else seconds until it would be."""
+        now = time.monotonic()
+        while self._times and now - self._times[0] >= 60:
+            self._times.popleft()
+        if len(self._times) >= self.per_minute:
+            return 60 - (now - self._times[0])
+        self._times.append(now)
+        return None
+
+
+def server_env(base_url: str) -> Dict[str, str]:
+    """Environment pointing server.py's upstream URLs at a stub listening on base_url."""
+    return {
+        "ALPACA_BASE_URL": f"{base_url}/v2/stocks",
+        "ALPACA_TRADING_URL": f"{base_url}/v2",
+        "FINNHUB_URL": f"{base_url}/api/v1",
+        "DEEPSEEK_URL": f"{base_url}/v1/chat/completions",
+    }
+
+
+# ---------------------- FAKE DATA ------------------------ #
+def base_price(symbol: str) -> float:
+    return 20 + (zlib.crc32(symbol.encode()) % 48000) / 100
+
+
+def snapshot(symbol: str) -> Dict[str, Any]:
+    price = round(base_price(symbol) * random.uniform(0.99, 1.01), 2)
+    opened = round(base_price(symbol), 2)
+    now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    return {
+        "symbol": symbol,
+        "latestTrade": {"t": now, "p": price, "s": random.randint(1, 500), "x": "V"},
+        "latestQuote": {"t": now, "ap": round(price * 1.0005, 2), "as": 3, "bp": round(price * 0.9995, 2), "bs": 2},
+        "minuteBar": {"t": now, "o": price, "h": price, "l": price, "c": price, "v": random.randint(100, 10000)},
+        "dailyBar": {"t": now, "o": opened, "h": max(opened, price), "l": min(opened, price), "c": price,
+                     "v": random.randint(10 ** 5, 10 ** 7)},
+        "prevDailyBar": {"t": now, "o": opened, "h": opened, "l": opened, "c": opened, "v": random.randint(10 ** 5, 10 ** 7)},
+    }
+
+
+def positions(symbols: List[str]) -> List[Dict[str, Any]]:
+    result = []
+    for symbol in symbols:
+        qty = 1 + zlib.crc32(symbol.encode()) % 200
+        entry, current = base_price(symbol), round(base_price(symbol) * random.uniform(0.9, 1.1), 2)
+        result.append({
+            "asset_id": str(uuid.UUID(int=zlib.crc32(symbol.encode()))), "symbol": symbol, "exchange": "NASDAQ",
+            "asset_class": "us_equity", "qty": str(qty), "side": "long", "avg_entry_price": f"{entry:.2f}",
+            "current_price": f"{current:.2f}", "market_value": f"{qty * current:.2f}",
+            "cost_basis": f"{qty * entry:.2f}", "unrealized_pl": f"{qty * (current - entry):.2f}",
+        })
+    return result
+
+
+def company_news(symbol: str, count: int) -> List[Dict[str, Any]]:
+    now = int(time.time())
+    articles = []
+    for i in range(count):
+        topic = NEWS_TOPICS[(zlib.crc32(symbol.encode()) + i) % len(NEWS_TOPICS)]
+        articles.append({
+            "id": zlib.crc32(f"{symbol}-{i}".encode()),
+            "category": "company", "related": symbol, "image": "",
+            "datetime": now - i * 1800,
+            "headline": f"{symbol} {topic}",
+            "source": NEWS_SOURCES[i % len(NEWS_SOURCES)],
+            "summary": f"{symbol} {topic}. " + "Analysts weigh the impact on margins and guidance. " * 6,
+            "url": f"https://news.example.com/{symbol.lower()}/{i}",
+        })
+    return articles
+
+
+def completion_content(payload: dict) -> str:
+    messages = payload.get("messages") or []
+    prompt = " ".join(str(m.get("content", "")) for m in messages)
+    if "only valid stock tickers" in prompt:
+        name = re.search(r'Company name: "([^"]*)"', prompt)
+        return re.sub(r"[^A-Z]", "", (name.group(1) if name else "X").upper())[:4] or "X"
+    action = random.choices(("BUY", "SELL", "HOLD"), weights=(4, 2, 4))[0]
+    return json.dumps({
+        "action": action,
+        "confidence": round(random.uniform(0.55, 0.95), 2),
+        "drivers": random.sample(["momentum", "earnings", "valuation", "news-sentiment", "volume", "guidance"], 3),
+        "explanation": f"Stub verdict: {action.lower()} based on synthetic market data and news.",
+    })
+
+
+def usage(payload: dict, content: str) -> Dict[str, int]:
+    prompt_tokens = len(json.dumps(payload.get("messages") or [])) // 4
+    completion_tokens = max(1, len(content) // 4)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+# ---------------------- APP ------------------------ #
+def create_app(profiles: Dict[str, Profile], limits: Dict[str, WindowLimit],
+               portfolio: List[str], articles: int) -> FastAPI:
+    app = FastAPI(title="Plutus upstream stub", docs_url=None, redoc_url=None)
+
+    async def gate(upstream: str) -> Optional[JSONResponse]:
+        """Apply the upstream's rate limit, latency and error injection; a response means fail."""
+        profile = profiles[upstream]
+        profile.requests += 1
+        limit = limits.get(CREDENTIALS.get(upstream, upstream))
+        wait = limit.check() if limit is not None else None
+        if wait is not None:
+            profile.throttled += 1
+            return JSONResponse({"message": "too many requests"}, 429, {"Retry-After": str(math.ceil(wait))})
+        await asyncio.sleep(profile.sample())
+        if random.random() < profile.error_rate:
+            profile.errors += 1
+            return JSONResponse({"message": "stub: injected error"}, 503)
+        return None
+
+    @app.get("/v2/stocks/snapshots")
+    async def get_snapshots(symbols: str):
+        return await gate("alpaca_data") or {s: snapshot(s) for s in symbols.upper().split(",") if s}
+
+    @app.get("/v2/stocks/{symbol}/snapshot")
+    async def get_snapshot(symbol: str):
+        return await gate("alpaca_data") or snapshot(symbol.upper())
+
+    @app.get("/v2/positions")
+    async def get_positions():
+        return await gate("alpaca_trading") or positions(portfolio)
+
+    @app.post("/v2/orders")
+    async def post_order(request: Request):
+        failure = await gate("alpaca_trading")
+        if failure:
+            return failure
+        order = await request.json()
+        return {
+            "id": str(uuid.uuid4()), "client_order_id": str(uuid.uuid4()), "status": "accepted",
+            "symbol": order.get("symbol"), "qty": order.get("qty"), "side": order.get("side"),
+            "type": order.get("type"), "time_in_force": order.get("time_in_force"),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+
+    @app.get("/api/v1/company-news")
+    async def get_company_news(symbol: str):
+        return await gate("finnhub") or company_news(symbol.upper(), articles)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        if not payload.get("stream"):
+            failure = await gate("deepseek")
+            if failure:
+                return failure
+            content = completion_content(payload)
+            return {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion", "model": payload.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage(payload, content),
+            }
+
+        # Streaming: the sampled latency is spread over time-to-first-token and the chunks
+        profile = profiles["deepseek"]
+        profile.requests += 1
+        limit = limits.get("deepseek")
+        wait = limit.check() if limit is not None else None
+        if wait is not None:
+            profile.throttled += 1
+            return JSONResponse({"message": "too many requests"}, 429, {"Retry-After": str(math.ceil(wait))})
+        if random.random() < profile.error_rate:
+            profile.errors += 1
+            await asyncio.sleep(profile.sample())
+            return JSONResponse({"message": "stub: injected error"}, 503)
+        content = completion_content(payload)
+        total = profile.sample()
+        pieces = [content[i:i + 8] for i in range(0, len(content), 8)]
+
+        async def events():
+            await asyncio.sleep(total * 0.3)
+            for piece in pieces:
+                chunk = {"choices": [{"index": 0, "delta": {"content": piece}}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(total * 0.7 / len(pieces))
+            yield f"data: {json.dumps({'choices': [], 'usage': usage(payload, content)})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/_stub/stats")
+    async def stats():
+        return {
+            name: {"latency": p.latency, "error_rate": p.error_rate, "requests": p.requests,
+                   "errors": p.errors, "throttled": p.throttled}
+            for name, p in profiles.items()
+        }
+
+    return app
+
+
+def _assignments(values: List[str], allowed, convert) -> Dict[str, Any]:
+    result = {}
+    for value in values:
+        name, _, setting = value.partition("=")
+        if name not in allowed or not setting:
+            raise SystemExit(f"expected NAME=VALUE with NAME in {', '.join(allowed)}: {value!r}")
+        result[name] = convert(setting)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", action="append", default=[], help="UPSTREAM=SPEC (repeatable)")
+    parser.add_argument("--error-rate", action="append", default=[], help="UPSTREAM=FRACTION (repeatable)")
+    parser.add_argument("--rate-limit", action="append", default=[], help="CREDENTIAL=PER_MINUTE (repeatable)")
+    parser.add_argument("--positions", type=int, default=10, help="Positions in the stub portfolio")
+    parser.add_argument("--articles", type=int, default=20, help="Articles per company-news response")
+    args = parser.parse_args()
+
+    latency = {**DEFAULT_LATENCY, **_assignments(args.latency, UPSTREAMS, str)}
+    errors = _assignments(args.error_rate, UPSTREAMS, float)
+    profiles = {name: Profile(latency[name], errors.get(name, 0.0)) for name in UPSTREAMS}
+    credentials = sorted(set(CREDENTIALS.values()))
+    limits = {name: WindowLimit(n) for name, n in _assignments(args.rate_limit, credentials, int).items() if n > 0}
+
+    with open(SYMBOL_DIRECTORY_PATH, newline="") as f:
+        listed = [row["symbol"] for row in csv.DictReader(f)]
+    # Beyond the listed symbols, add numbered variants so every position is distinct
+    portfolio = [listed[i % len(listed)] + (str(i // len(listed)) if i >= len(listed) else "")
+                 for i in range(args.positions)]
+
+    base_url = f"http://{args.host}:{args.port}"
+    print(f"Upstream stub on {base_url}; point the server at it with:")
+    for key, value in server_env(base_url).items():
+        print(f"  {key}={value}")
+    uvicorn.run(create_app(profiles, limits, portfolio, args.articles), host=args.host, port=args.port,
+                log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()